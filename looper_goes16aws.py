@@ -18,16 +18,19 @@ import memory_profiler as mprof
 
 import os
 import time
+from functools import partial
 from datetime import datetime as dt
 
-from ligmos.utils import confparsers, files, logs
+from ligmos.utils import confparsers, logs
 
 from nightshift.goes import plot, aws
-from nightshift.common import maps, utils
+from nightshift.common import maps, utils, animate, manifest, cadence
 
 
 def main(outdir, creds, sleep=150., keephours=24.,
-         forceDown=False, forceRegen=False):
+         forceDown=False, forceRegen=False, nprocs=1,
+         engine='kdtree', renderer='matplotlib', rawcounts=False,
+         bands=None, tilesize=512, stream=True, adaptive=True):
     """
     'outdir' is the *base* directory for outputs, stuff will be put into
     subdirectories inside of it.
@@ -35,12 +38,50 @@ def main(outdir, creds, sleep=150., keephours=24.,
     'keephours' is the number of hours of data to keep on hand. Old stuff
     is deleted to keep things managable
 
+    'nprocs' is the number of processes used to render any backlog of
+    frames (like after an outage); 1 renders them one after another.
+
+    'engine' is the resampling engine, either 'kdtree' (pyresample) or
+    'geos' (direct calculation from the fixed grid); see plot.getCoeffs
+
+    'renderer' is how the frames are made, either 'matplotlib' or 'raster'
+    (directly as an image, much faster); see plot.renderFrame.  It can
+    also be a dict of {band: renderer}, and bands that aren't in there
+    use 'matplotlib'.
+
+    'rawcounts' colors the raw packed data with one lookup table instead of
+    unpacking it to floats first; see plot.getCountsLUT
+
     (REMOVED FROM CALLING SEQUENCE)
     'vidhours' is the number of hours of data to make into a GIF (or MP4).
-    6 hours equates to about 72 images in the video
-
-    Tailored for a single channel/band of output ONLY. To have multiple bands
-    outputting to a single directory this NEEDS some restructuring!!!
+    6 hours equates to about 72 images in the video; it's kept up to date
+    by a rolling animation that only reads each new frame once.
+
+    'bands' is the list of ABI bands to grab and plot (default is [13]).
+    They're all listed and downloaded together, and bands on the same grid
+    share the same (cached) resampling coefficients.  Each one gets its
+    own pngs/CXX/ directory, static filenames, and animation; band 13
+    keeps the original static names so nothing downstream has to change.
+    Frames left in pngs/ itself from before that are moved over at startup.
+
+    'tilesize' is the tile size (in output pixels) for resampling band 2,
+    the 0.5 km one, in tiles so it doesn't eat all of our memory.
+    None turns that off.
+
+    What's been downloaded, plotted, and expired is all tracked in a
+    manifest (see nightshift.common.manifest) in outdir, so the loop
+    never has to rescan the raw or png directories.  Input files that
+    can't be plotted are downloaded once more and then put in the
+    quarantine/ directory and skipped until they expire.
+
+    If 'stream' is True, the downloading, reprojecting, and plotting are
+    all overlapped (see plot.streamPlots) so each new frame is plotted as
+    soon as it lands.  Otherwise everything is downloaded first and then
+    plotted with plot.makePlots (using 'nprocs' processes).
+
+    If 'adaptive' is True, the wait between loops is worked out from when
+    each scan usually shows up (see common.cadence) and 'sleep' is just
+    the wait until there's enough history to do that.
     """
     vidhours = 4.
 
@@ -50,6 +91,9 @@ def main(outdir, creds, sleep=150., keephours=24.,
     dout = outdir + "/raws/"
     pout = outdir + "/pngs/"
     lout = outdir + "/nows/"
+    cout = outdir + "/cache/"
+    mfile = outdir + "/manifest.sqlite"
+    qout = outdir + "/quarantine/"
     cfiles = "./nightshift/resources/cb_2018_us_county_5m/"
 
     # in degrees; for spatially filtering map shapefiles
@@ -64,6 +108,9 @@ def main(outdir, creds, sleep=150., keephours=24.,
     staticname = 'goesEast'
     nstaticfiles = 48
 
+    if bands is None:
+        bands = [13]
+
     # Need this for parsing the filename into a dt obj
     dtfmt = "%Y%j%H%M%S%f"
 
@@ -77,8 +124,10 @@ def main(outdir, creds, sleep=150., keephours=24.,
     print("\tClasses: %s" % (rclasses))
 
     # roads will be a dict with keys of rclasses and values of geometries
+    #   The filtered results are cached in 'cout' for the next startup
     roads = maps.parseRoads(rclasses,
-                            center=mapcenter, centerRad=filterRadius)
+                            center=mapcenter, centerRad=filterRadius,
+                            cachedir=cout)
     for rkey in rclasses:
         print("%s: %d found within %d degrees of center" % (rkey,
                                                             len(roads[rkey]),
@@ -86,16 +135,78 @@ def main(outdir, creds, sleep=150., keephours=24.,
 
     print("Parsing county data...")
     counties = maps.parseCounties(cfiles + "cb_2018_us_county_5m.shp",
-                                  center=mapcenter, centerRad=filterRadius)
+                                  center=mapcenter, centerRad=filterRadius,
+                                  cachedir=cout)
     print("%d counties found within %d degrees of center" % (len(counties),
                                                              filterRadius))
 
-    # Construct/grab the color map.
-    #   Purposefully leaving this hardcoded here for now, because it's
-    #   so easy to make a god damn mess of the colormap if you don't know
-    #   what you're doing.
-    vmin, vmax = 160, 330
-    gcmap = plot.getCMap(vmin=vmin, vmax=vmax)
+    # Set up all the per-band stuff. The color maps are purposefully
+    #   hardcoded in plot.getBandCMap for now, because it's so easy to make
+    #   a god damn mess of the colormap if you don't know what you're doing.
+    bandset = {}
+    for band in bands:
+        if band == 13:
+            bstatic = staticname
+            bvid = vid1
+        else:
+            bstatic = "%s_C%02d" % (staticname, band)
+            bvid = "%s/g16aws_C%02d_latest.gif" % (lout, band)
+
+        bpout = "%s/C%02d/" % (pout, band)
+        os.makedirs(bpout, exist_ok=True)
+
+        bcmap, bvmin, bvmax = plot.getBandCMap(band)
+
+        # Band 2 is 6000x10000 for CONUS, so only ever do it in tiles
+        if band == 2:
+            btiles = tilesize
+        else:
+            btiles = None
+
+        # CONUS scans are every 5 minutes, so 12 frames an hour
+        banim = animate.rollingAnimation(int(vidhours*12))
+
+        if isinstance(renderer, dict):
+            brender = renderer.get(band, 'matplotlib')
+        else:
+            brender = renderer
+
+        bandset.update({band: {'pout': bpout,
+                               'staticname': bstatic,
+                               'vid': bvid,
+                               'cmap': bcmap,
+                               'vmin': bvmin,
+                               'vmax': bvmax,
+                               'tilesize': btiles,
+                               'renderer': brender,
+                               'anim': banim}})
+
+        # The newest frame is published as soon as it's made
+        bandset[band]['publish'] = partial(utils.publishLatest,
+                                           lout=lout, staticname=bstatic)
+
+    # Same stuff, but how plot.streamPlots wants it
+    styles = {}
+    for band in bands:
+        bset = bandset[band]
+        styles.update({"C%02d" % (band): {'outloc': bset['pout'],
+                                          'cmap': bset['cmap'],
+                                          'vmin': bset['vmin'],
+                                          'vmax': bset['vmax'],
+                                          'tilesize': bset['tilesize'],
+                                          'renderer': bset['renderer'],
+                                          'publish': bset['publish']}})
+
+    # Anything that was already on disk before the manifest existed
+    mdb = manifest.openManifest(mfile)
+    for band in bands:
+        # Frames from before each band had its own directory
+        utils.migrateFrames("%s/*_C%02d.png" % (pout, band), dout,
+                            bandset[band]['pout'])
+        manifest.syncFromDisk(mdb, "C%02d" % (band),
+                              "%s/*_C%02d.nc" % (dout, band),
+                              bandset[band]['pout'],
+                              dtfmt + "_C%02d" % (band))
 
     print("Starting infinite loop...")
     while True:
@@ -104,59 +215,98 @@ def main(outdir, creds, sleep=150., keephours=24.,
         #   If they exist, they'll be skipped unless forceDown is True
         when = dt.utcnow()
         print("Looking for files!")
-        ffiles = aws.GOESAWSgrab(aws_keyid, aws_secretkey, when, dout,
-                                 timedelta=keephours, forceDown=forceDown)
+        if stream is True:
+            # Only list them here; they're downloaded in streamPlots
+            listed = aws.GOESAWSlist(aws_keyid, aws_secretkey, when, dout,
+                                     timedelta=keephours, forceDown=forceDown,
+                                     channels=bands, manifest=mdb)
+            buck, ffiles, downloads, newframes = listed
+        else:
+            ffiles = aws.GOESAWSgrab(aws_keyid, aws_secretkey, when, dout,
+                                     timedelta=keephours, forceDown=forceDown,
+                                     channels=bands, manifest=mdb)
 
         print("Found the following files:")
         for f in ffiles:
             print(os.path.basename(f.key))
 
-        print("Making the plots...")
-        # TODO: Return the projection coordinates (and a timestamp of them)
-        #   so they can be reused between loop cycles.
-        nplots = plot.makePlots(dout, pout, mapcenter, cmap=gcmap,
-                                roads=roads, counties=counties,
-                                forceRegen=forceRegen)
-        print("%03d plots done!" % (nplots))
-
-        # ... Do what the function says! Return a list of current files
-        #   which will then be used as the input for the GIF/video
-        #
+        if stream is True:
+            print("Downloading and making the plots...")
+            nstream = plot.streamPlots(buck, downloads, newframes,
+                                       mapcenter, styles, mdb,
+                                       roads=roads, counties=counties,
+                                       cachedir=cout, engine=engine,
+                                       basemap='raster',
+                                       rawcounts=rawcounts, quarantine=qout,
+                                       forceRegen=forceRegen)
+            print("%03d plots done!" % (sum(nstream.values())))
+
         # NOTE: I'm literally adding a 'fudge' factor here because the initial
         #   AWS/data query has a resolution of 1 hour, so there can sometimes
         #   be fighting of downloading/deleting/redownloading/deleting ...
         fudge = 1.
 
-        # Now we look for old files.  Looking is ok!  We won't actually act
-        #   unless there's a valid reason to do so.
-        ofiles = dtfmt + "_C13.png"
-        curpngs, oldpngs = files.findOldFiles(pout, "*.png", when,
-                                              maxage=keephours+fudge,
-                                              dtfmt=ofiles)
-
-        ofiles = dtfmt + "_C13.nc"
-        curraws, oldraws = files.findOldFiles(dout, "*.nc", when,
-                                              maxage=keephours+fudge,
-                                              dtfmt=ofiles)
-
-        if nplots > 0:
-            # Remove the dead/old ones
-            #   BUT notice that this is only if we made new files!
-            files.deleteOldFiles(oldpngs)
-            files.deleteOldFiles(oldraws)
-
-            print("%d, %d raw and png files remain within %.1f + %.1f hours" %
-                  (len(curraws), len(curpngs), keephours, fudge))
-
-        print("Copying the latest/last files to an accessible spot...")
-        # Move our files to the set of static filenames. This will
-        #   check (cpng) to see if there are actually any files that
-        #   are new, and if so it'll shuffle the files into the correct
-        #   order of static filenames.
-        # This will stamp files that are > 4 hours old with a warning
-        utils.copyStaticFilenames(curpngs, lout,
-                                  staticname, nstaticfiles,
-                                  errorAge=2.25, errorStamp=True)
+        # Expired frames are remembered until they're too old to be in the
+        #   query (plus a bit), so they aren't just downloaded again
+        forgetAge = keephours + fudge + 1.
+
+        for band in bands:
+            bset = bandset[band]
+            bpout = bset['pout']
+
+            product = "C%02d" % (band)
+            if stream is True:
+                # Already done up above, for all of the bands together
+                nplots = nstream[product]
+            else:
+                print("Making the plots for band %02d..." % (band))
+                # The projection coefficients are cached in 'cout' so
+                #   they're reused between loop cycles (and restarts) until
+                #   the grids change, and between bands on the same grid
+                nplots = plot.makePlots(dout, bpout, mapcenter,
+                                        cmap=bset['cmap'],
+                                        roads=roads, counties=counties,
+                                        forceRegen=forceRegen, cachedir=cout,
+                                        nprocs=nprocs, engine=engine,
+                                        basemap='raster',
+                                        renderer=bset['renderer'],
+                                        rawcounts=rawcounts, band=band,
+                                        vmin=bset['vmin'], vmax=bset['vmax'],
+                                        tilesize=bset['tilesize'],
+                                        manifest=mdb, quarantine=qout,
+                                        newestFirst=True, backfillNice=10,
+                                        publish=bset['publish'])
+                print("%03d plots done!" % (nplots))
+
+            if nplots > 0:
+                # Remove the dead/old ones
+                #   BUT notice that this is only if we made new files!
+                nold = manifest.expireOld(mdb, product, when,
+                                          keephours+fudge)
+                manifest.forgetOld(mdb, product, when, forgetAge)
+                print("%d frames older than %.1f + %.1f hours removed" %
+                      (nold, keephours, fudge))
+
+            # Only the newest ones are needed for the static files and
+            #   the animation, and the manifest has them in order already
+            nlatest = max(nstaticfiles, bset['anim'].nframes)
+            curpngs = manifest.currentFrames(mdb, product, when,
+                                             limit=nlatest)
+
+            if len(curpngs) > 0:
+                print("Copying the latest/last files to an accessible spot...")
+                # Move our files to the set of static filenames. This will
+                #   check (cpng) to see if there are actually any files that
+                #   are new, and if so it'll shuffle the files into the
+                #   correct order of static filenames.
+                # This will stamp files that are > 4 hours old with a warning
+                utils.copyStaticFilenames(curpngs, lout,
+                                          bset['staticname'], nstaticfiles,
+                                          errorAge=2.25, errorStamp=True)
+
+                print("Updating the animation...")
+                if bset['anim'].update(list(curpngs.keys())) > 0:
+                    bset['anim'].write(bset['vid'])
 
         print("GARBAGE UPDATE")
         print(gc.get_stats())
@@ -164,8 +314,16 @@ def main(outdir, creds, sleep=150., keephours=24.,
         print(mprof.memory_usage(timestamps=True, include_children=True,
                                  multiprocess=True))
 
-        print("Sleeping for %03d seconds..." % (sleep))
-        time.sleep(sleep)
+        if adaptive is True:
+            # Wake up just before the next frame should show up, rather
+            #   than listing the bucket over and over in between
+            prods = ["C%02d" % (band) for band in bands]
+            nap = cadence.nextPoll(mdb, prods, default=sleep)
+        else:
+            nap = sleep
+
+        print("Sleeping for %03d seconds..." % (nap))
+        time.sleep(nap)
 
 
 if __name__ == "__main__":
@@ -173,6 +331,11 @@ if __name__ == "__main__":
     awsconf = "./config/awsCreds.conf"
     forceDownloads = False
     forceRegenPlot = False
+    renderProcs = 4
+    resampler = 'kdtree'
+    framer = 'matplotlib'
+    packedCounts = False
+    abiBands = [13]
     logname = './outputs/logs/goesmcgoesface.log'
 
     # Set up logging (using ligmos' quick 'n easy wrapper)
@@ -183,6 +346,8 @@ if __name__ == "__main__":
     creds = confparsers.rawParser(awsconf)
 
     main(outdir, creds, sleep=90.,
-         forceDown=forceDownloads, forceRegen=forceRegenPlot)
+         forceDown=forceDownloads, forceRegen=forceRegenPlot,
+         nprocs=renderProcs, engine=resampler, renderer=framer,
+         rawcounts=packedCounts, bands=abiBands)
 
     print("Exiting!")
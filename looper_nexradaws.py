@@ -15,22 +15,52 @@ from __future__ import division, print_function, absolute_import
 
 import os
 import time
+from functools import partial
 from datetime import datetime as dt
 
-from ligmos.utils import logs, files, confparsers
+from ligmos.utils import logs, confparsers
 
-from nightshift.radar import plot, aws
-from nightshift.common import maps, utils
+from nightshift.radar import plot, aws, qc, chunks
+from nightshift.common import maps, utils, animate, manifest, cadence
 
 
 def main(outdir, creds, sleep=150., keephours=24.,
-         forceDown=False, forceRegen=False):
+         forceDown=False, forceRegen=False, stream=True, adaptive=True,
+         renderer='matplotlib', qcconf=None, chunked=False, chunkdir=None,
+         chunkSleep=10.):
     """
     'outdir' is the *base* directory for outputs, stuff will be put into
     subdirectories inside of it.
 
     'keephours' is the number of hours of data to keep on hand. Old stuff
     is deleted to keep things managable
+
+    What's been downloaded, plotted, and expired is all tracked in a
+    manifest (see nightshift.common.manifest) in outdir, so the loop
+    never has to rescan the raw or png directories.  Input files that
+    can't be plotted are downloaded once more and then put in the
+    quarantine/ directory and skipped until they expire.
+
+    'renderer' is how the frames are made, either 'matplotlib' or 'raster'
+    (directly as an image, much faster); see plot.drawVolume
+
+    'qcconf' is a config file of QC filters (see radar.qc) to use instead
+    of the defaults, if it exists.
+
+    If 'stream' is True, the downloading, reading, and plotting are all
+    overlapped (see plot.streamPlots) so each new volume is plotted as
+    soon as it lands.  Otherwise everything is downloaded first and then
+    plotted with plot.makePlots.
+
+    If 'adaptive' is True, the wait between loops is worked out from when
+    each volume usually shows up (see common.cadence) and 'sleep' is just
+    the wait until there's enough history to do that.
+
+    If 'chunked' is True, volumes come from the real-time chunks bucket
+    instead (see radar.chunks), which is polled every 'chunkSleep' seconds
+    and each one is plotted as soon as its lowest sweep is in.  If
+    'chunkdir' is given, chunks are read from that local directory
+    instead of the bucket, like for testing with chunks.replayChunks.
     """
     aws_keyid = creds['s3_RO']['aws_access_key_id']
     aws_secretkey = creds['s3_RO']['aws_secret_access_key']
@@ -38,6 +68,9 @@ def main(outdir, creds, sleep=150., keephours=24.,
     dout = outdir + "/raws/"
     pout = outdir + "/pngs/"
     lout = outdir + "/nows/"
+    cout = outdir + "/cache/"
+    mfile = outdir + "/manifest.sqlite"
+    qout = outdir + "/quarantine/"
     cfiles = "./nightshift/resources/cb_2018_us_county_5m/"
 
     # in degrees; for spatially filtering map shapefiles
@@ -48,8 +81,14 @@ def main(outdir, creds, sleep=150., keephours=24.,
     staticname = 'nexrad'
     nstaticfiles = 48
 
+    # Rolling animation of the same frames as the static files
+    vid1 = "%s/nexrad_latest.gif" % (lout)
+
+    # Station ID, which is also the product in the manifest
+    station = "KFSX"
+
     # Need this for parsing the filename into a dt obj
-    dtfmt = "KFSX%Y%m%d_%H%M%S"
+    dtfmt = station + "%Y%m%d_%H%M%S"
 
     # Prepare some things for plotting so we don't have to do it
     #   forever in the main loop body
@@ -61,8 +100,10 @@ def main(outdir, creds, sleep=150., keephours=24.,
     print("\tClasses: %s" % (rclasses))
 
     # roads will be a dict with keys of rclasses and values of geometries
+    #   The filtered results are cached in 'cout' for the next startup
     roads = maps.parseRoads(rclasses,
-                            center=mapcenter, centerRad=filterRadius)
+                            center=mapcenter, centerRad=filterRadius,
+                            cachedir=cout)
     for rkey in rclasses:
         print("%s: %d found within %d degrees of center" % (rkey,
                                                             len(roads[rkey]),
@@ -70,13 +111,35 @@ def main(outdir, creds, sleep=150., keephours=24.,
 
     print("Parsing county data...")
     counties = maps.parseCounties(cfiles + "cb_2018_us_county_5m.shp",
-                                  center=mapcenter, centerRad=filterRadius)
+                                  center=mapcenter, centerRad=filterRadius,
+                                  cachedir=cout)
     print("%d counties found within %d degrees of center" % (len(counties),
                                                              filterRadius))
 
     # Construct/grab the color map
     gcmap = plot.getCMap()
 
+    qcfilters = None
+    if qcconf is not None and os.path.isfile(qcconf):
+        qcfilters = qc.parseFilters(confparsers.rawParser(qcconf))
+        print("Using QC filters: %s" % ([f['name'] for f in qcfilters]))
+
+    anim = animate.rollingAnimation(nstaticfiles)
+
+    # The newest frame is published as soon as it's made
+    publish = partial(utils.publishLatest, lout=lout, staticname=staticname)
+
+    # Anything that was already on disk before the manifest existed
+    mdb = manifest.openManifest(mfile)
+    manifest.syncFromDisk(mdb, station, dout + station + "*", pout, dtfmt)
+
+    if chunked is True:
+        if chunkdir is not None:
+            chunksrc = chunkdir
+        else:
+            chunksrc = chunks.connectChunks(aws_keyid, aws_secretkey)
+        chunkstate = chunks.newIngestState()
+
     print("Starting infinite loop...")
     while True:
         # 'keephours' is time (in hours!) to search for new files relative
@@ -84,19 +147,51 @@ def main(outdir, creds, sleep=150., keephours=24.,
         #   If they exist, they'll be skipped unless forceDown is True
         when = dt.utcnow()
         print("Looking for files!")
-        ffiles = aws.NEXRADAWSgrab(aws_keyid, aws_secretkey, when, dout,
-                                   timedelta=keephours, forceDown=forceDown)
+        # With chunked, polling and plotting are all done at once below
+        ffiles = []
+        if chunked is False and stream is True:
+            # Only list them here; they're downloaded in streamPlots
+            listed = aws.NEXRADAWSlist(aws_keyid, aws_secretkey, when, dout,
+                                       timedelta=keephours,
+                                       forceDown=forceDown, manifest=mdb,
+                                       station=station)
+            buck, ffiles, downloads, newframes = listed
+        elif chunked is False:
+            ffiles = aws.NEXRADAWSgrab(aws_keyid, aws_secretkey, when, dout,
+                                       timedelta=keephours,
+                                       forceDown=forceDown, manifest=mdb,
+                                       station=station)
 
         print("Found the following files:")
         for f in ffiles:
             print(os.path.basename(f.key))
 
         print("Making the plots...")
-        # TODO: Return the projection coordinates (and a timestamp of them)
-        #   so they can be reused between loop cycles.
-        nplots = plot.makePlots(dout, pout, mapcenter, cmap=gcmap,
-                                roads=roads, counties=counties,
-                                forceRegen=forceRegen)
+        # The static map features are rendered once and cached in 'cout'
+        if chunked is True:
+            nplots = chunks.ingestChunks(chunksrc, station, chunkstate,
+                                         dout, pout, mapcenter, mdb,
+                                         cmap=gcmap, roads=roads,
+                                         counties=counties, cachedir=cout,
+                                         basemap='raster', quarantine=qout,
+                                         publish=publish, renderer=renderer,
+                                         qcfilters=qcfilters)
+        elif stream is True:
+            nplots = plot.streamPlots(buck, downloads, newframes, pout,
+                                      mapcenter, mdb, cmap=gcmap,
+                                      roads=roads, counties=counties,
+                                      cachedir=cout, basemap='raster',
+                                      station=station, quarantine=qout,
+                                      forceRegen=forceRegen, publish=publish,
+                                      renderer=renderer, qcfilters=qcfilters)
+        else:
+            nplots = plot.makePlots(dout, pout, mapcenter, cmap=gcmap,
+                                    roads=roads, counties=counties,
+                                    forceRegen=forceRegen, cachedir=cout,
+                                    basemap='raster', manifest=mdb,
+                                    station=station, quarantine=qout,
+                                    newestFirst=True, publish=publish,
+                                    renderer=renderer, qcfilters=qcfilters)
         print("%03d plots done!" % (nplots))
 
         # NOTE: I'm literally adding a 'fudge' factor here because the initial
@@ -104,26 +199,22 @@ def main(outdir, creds, sleep=150., keephours=24.,
         #   be fighting of downloading/deleting/redownloading/deleting ...
         fudge = 1.
 
-        # Now we look for old files.  Looking is ok!  We won't actually act
-        #   unless there's a valid reason to do so.
-        ofiles = dtfmt + ".png"
-        curpngs, oldpngs = files.findOldFiles(pout, "*.png", when,
-                                              maxage=keephours+fudge,
-                                              dtfmt=ofiles)
-
-        ofiles = dtfmt
-        curraws, oldraws = files.findOldFiles(dout, "*", when,
-                                              maxage=keephours+fudge,
-                                              dtfmt=ofiles)
+        # Expired frames are remembered until they're too old to be in the
+        #   query (plus a bit), so they aren't just downloaded again
+        forgetAge = keephours + fudge + 1.
 
         if nplots > 0:
             # Remove the dead/old ones
             #   BUT notice that this is only if we made new files!
-            files.deleteOldFiles(oldpngs)
-            files.deleteOldFiles(oldraws)
+            nold = manifest.expireOld(mdb, station, when, keephours+fudge)
+            manifest.forgetOld(mdb, station, when, forgetAge)
+            print("%d frames older than %.1f + %.1f hours removed" %
+                  (nold, keephours, fudge))
 
-            print("%d, %d raw and png files remain within %.1f + %.1f hours" %
-                  (len(curraws), len(curpngs), keephours, fudge))
+        # Only the newest ones are needed for the static files and the
+        #   animation, and the manifest has them in order already
+        curpngs = manifest.currentFrames(mdb, station, when,
+                                         limit=nstaticfiles)
 
         print("Copying the latest/last files to an accessible spot...")
         # Move our files to the set of static filenames. This will
@@ -133,18 +224,34 @@ def main(outdir, creds, sleep=150., keephours=24.,
         # This will stamp files that are > 4 hours old with a warning
         if len(curpngs) > 0:
             utils.copyStaticFilenames(curpngs, lout,
-                                    staticname, nstaticfiles,
-                                    errorAge=3.5, errorStamp=True)
+                                      staticname, nstaticfiles,
+                                      errorAge=3.5, errorStamp=True)
+
+            print("Updating the animation...")
+            if anim.update(list(curpngs.keys())) > 0:
+                anim.write(vid1)
+
+        if chunked is True:
+            # Chunks show up every few seconds, so just keep checking
+            nap = chunkSleep
+        elif adaptive is True:
+            # Wake up just before the next frame should show up, rather
+            #   than listing the bucket over and over in between
+            nap = cadence.nextPoll(mdb, [station], default=sleep)
+        else:
+            nap = sleep
 
-        print("Sleeping for %03d seconds..." % (sleep))
-        time.sleep(sleep)
+        print("Sleeping for %03d seconds..." % (nap))
+        time.sleep(nap)
 
 
 if __name__ == "__main__":
     outdir = "./outputs/radar/"
     awsconf = "./config/awsCreds.conf"
+    qcconf = "./config/radarqc.conf"
     forceDownloads = False
     forceRegenPlot = False
+    framer = 'matplotlib'
     logname = './outputs/logs/radarlove.log'
 
     # Set up logging (using ligmos' quick 'n easy wrapper)
@@ -155,5 +262,6 @@ if __name__ == "__main__":
     creds = confparsers.rawParser(awsconf)
 
     main(outdir, creds, sleep=90.,
-         forceDown=forceDownloads, forceRegen=forceRegenPlot)
+         forceDown=forceDownloads, forceRegen=forceRegenPlot,
+         renderer=framer, qcconf=qcconf)
     print("Exiting!")
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Main loop for the multi-station NEXRAD mosaic service.
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import os
+import time
+from functools import partial
+from datetime import datetime as dt
+
+from ligmos.utils import logs, confparsers
+
+from nightshift.radar import plot, mosaic, qc
+from nightshift.common import maps, utils, animate, manifest, cadence
+
+
+def main(outdir, creds, stations, sleep=150., keephours=24.,
+         forceDown=False, forceRegen=False, adaptive=True,
+         tolerance=300., wait=600., method='max', qcconf=None):
+    """
+    'outdir' is the *base* directory for outputs, stuff will be put into
+    subdirectories inside of it.
+
+    'stations' is the list of station IDs to put together; the first one
+    sets the frame times, and the others are matched up to it if they're
+    within 'tolerance' seconds.  Frames that are still missing stations
+    are held back until they're 'wait' seconds old.  'method' is how
+    overlapping stations are combined, see radar.mosaic.composite.
+
+    'keephours' is the number of hours of data to keep on hand. Old stuff
+    is deleted to keep things managable
+
+    Everything else is just like looper_nexradaws.py; the volumes of each
+    station and the mosaic frames are all tracked in the same manifest.
+    """
+    aws_keyid = creds['s3_RO']['aws_access_key_id']
+    aws_secretkey = creds['s3_RO']['aws_secret_access_key']
+
+    dout = outdir + "/raws/"
+    pout = outdir + "/pngs/"
+    lout = outdir + "/nows/"
+    cout = outdir + "/cache/"
+    mfile = outdir + "/manifest.sqlite"
+    qout = outdir + "/quarantine/"
+    cfiles = "./nightshift/resources/cb_2018_us_county_5m/"
+
+    # in degrees; for spatially filtering map shapefiles
+    mapcenter = [-111.4223, 34.7443]
+    filterRadius = 7.
+
+    # What the base/first part of the output filename will be
+    staticname = 'mosaic'
+    nstaticfiles = 48
+
+    # Rolling animation of the same frames as the static files
+    vid1 = "%s/mosaic_latest.gif" % (lout)
+
+    # Product of the mosaic frames in the manifest
+    product = "MOSAIC"
+
+    rclasses = ["Interstate", "Federal"]
+
+    print("Parsing road data...")
+    print("\tClasses: %s" % (rclasses))
+    roads = maps.parseRoads(rclasses,
+                            center=mapcenter, centerRad=filterRadius,
+                            cachedir=cout)
+    for rkey in rclasses:
+        print("%s: %d found within %d degrees of center" % (rkey,
+                                                            len(roads[rkey]),
+                                                            filterRadius))
+
+    print("Parsing county data...")
+    counties = maps.parseCounties(cfiles + "cb_2018_us_county_5m.shp",
+                                  center=mapcenter, centerRad=filterRadius,
+                                  cachedir=cout)
+    print("%d counties found within %d degrees of center" % (len(counties),
+                                                             filterRadius))
+
+    gcmap = plot.getCMap()
+
+    qcfilters = None
+    if qcconf is not None and os.path.isfile(qcconf):
+        qcfilters = qc.parseFilters(confparsers.rawParser(qcconf))
+        print("Using QC filters: %s" % ([f['name'] for f in qcfilters]))
+
+    anim = animate.rollingAnimation(nstaticfiles)
+
+    publish = partial(utils.publishLatest, lout=lout, staticname=staticname)
+
+    mdb = manifest.openManifest(mfile)
+    for station in stations:
+        dtfmt = station + "%Y%m%d_%H%M%S"
+        manifest.syncFromDisk(mdb, station, dout + station + "*", pout,
+                              dtfmt)
+
+    print("Starting infinite loop...")
+    while True:
+        when = dt.utcnow()
+        print("Looking for files!")
+        ngot = mosaic.grabStations(aws_keyid, aws_secretkey, when, dout,
+                                   stations, timedelta=keephours,
+                                   forceDown=forceDown, manifest=mdb)
+        print("%d new volumes downloaded" % (ngot))
+
+        print("Making the mosaics...")
+        nplots = mosaic.makeMosaics(mdb, stations, pout, mapcenter,
+                                    tolerance=tolerance, wait=wait,
+                                    method=method, roads=roads,
+                                    counties=counties, cmap=gcmap,
+                                    cachedir=cout, quarantine=qout,
+                                    qcfilters=qcfilters,
+                                    forceRegen=forceRegen, publish=publish,
+                                    product=product)
+        print("%03d plots done!" % (nplots))
+
+        # Same fudge as in looper_nexradaws.py, for the hourly queries
+        fudge = 1.
+        forgetAge = keephours + fudge + 1.
+
+        if nplots > 0:
+            for prod in stations + [product]:
+                nold = manifest.expireOld(mdb, prod, when, keephours+fudge)
+                manifest.forgetOld(mdb, prod, when, forgetAge)
+                print("%s: %d frames older than %.1f + %.1f hours removed" %
+                      (prod, nold, keephours, fudge))
+
+        curpngs = manifest.currentFrames(mdb, product, when,
+                                         limit=nstaticfiles)
+
+        print("Copying the latest/last files to an accessible spot...")
+        if len(curpngs) > 0:
+            utils.copyStaticFilenames(curpngs, lout,
+                                      staticname, nstaticfiles,
+                                      errorAge=3.5, errorStamp=True)
+
+            print("Updating the animation...")
+            if anim.update(list(curpngs.keys())) > 0:
+                anim.write(vid1)
+
+        if adaptive is True:
+            nap = cadence.nextPoll(mdb, stations, default=sleep)
+        else:
+            nap = sleep
+
+        print("Sleeping for %03d seconds..." % (nap))
+        time.sleep(nap)
+
+
+if __name__ == "__main__":
+    outdir = "./outputs/mosaic/"
+    awsconf = "./config/awsCreds.conf"
+    qcconf = "./config/radarqc.conf"
+    forceDownloads = False
+    forceRegenPlot = False
+    logname = './outputs/logs/mosaic.log'
+
+    # Flagstaff, Phoenix, Tucson, and Cedar City
+    stations = ["KFSX", "KIWA", "KEMX", "KICX"]
+
+    logs.setup_logging(logName=logname, nLogs=30)
+
+    creds = confparsers.rawParser(awsconf)
+
+    main(outdir, creds, stations, sleep=90.,
+         forceDown=forceDownloads, forceRegen=forceRegenPlot,
+         qcconf=qcconf)
+    print("Exiting!")
@@ -1,4 +1,11 @@
 from . import aws
 from . import maps
 from . import utils
+from . import animate
+from . import cache
+from . import listings
+from . import pipeline
+from . import manifest
+from . import cadence
+from . import raster
 from . import images
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Rolling animations of the last N frames of a product.
+
+Frames are palettized once when they show up and kept in a ring buffer,
+so each new frame means decoding exactly one image; the oldest one just
+falls off the other end.  Only that part is incremental, though; the
+whole animation is still encoded again every time it's written, which
+is the cheap part next to reading and palettizing every frame again.
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import os
+from collections import deque
+
+import numpy as np
+from PIL import Image
+
+
+class rollingAnimation():
+    def __init__(self, nframes, duration=100, lastHold=1000):
+        """
+        'nframes' is the number of frames to keep in the animation.
+        'duration' is the time (ms) each frame is shown, except for the
+        latest one which is held for 'lastHold' ms so it stands out.
+        """
+        self.nframes = int(nframes)
+        self.duration = duration
+        self.lastHold = lastHold
+
+        # (name, palettized image) pairs, oldest first
+        self.frames = deque(maxlen=self.nframes)
+
+        self.changed = False
+
+    def newest(self):
+        """
+        """
+        if len(self.frames) == 0:
+            return None
+        else:
+            return self.frames[-1][0]
+
+    def palettize(self, img):
+        """
+        Each frame gets its own palette, since whatever colors the first
+        one happened to have (like a clear air radar frame, or a GOES
+        frame at night) are no good for the ones that come after it.
+        """
+        return img.convert("RGB").quantize(colors=256,
+                                           method=Image.MEDIANCUT)
+
+    def addFrame(self, name, img):
+        """
+        Palettize img and push it on the end of the buffer.
+        """
+        self.frames.append((name, self.palettize(img)))
+        self.changed = True
+
+    def update(self, framefiles):
+        """
+        'framefiles' is the list of frame filenames that should be in the
+        animation, oldest to newest (like manifest.currentFrames gives).
+        The buffer is made to match the newest 'nframes' of them; only
+        the ones it doesn't already have are actually read, wherever they
+        land (like a frame that was rendered late), and any that aren't
+        in the list anymore are dropped.
+
+        Returns the number of frames that were added or dropped, so 0
+        means the animation is the same as before.
+        """
+        # Don't bother reading what would just fall off the end
+        framefiles = framefiles[-self.nframes:]
+
+        have = dict(self.frames)
+        frames = []
+        nadded = 0
+        for fname in framefiles:
+            name = os.path.basename(fname)
+            if name in have:
+                frames.append((name, have[name]))
+                continue
+
+            try:
+                with Image.open(fname) as img:
+                    frames.append((name, self.palettize(img)))
+                nadded += 1
+            except OSError as err:
+                print("Failed to read frame %s!" % (fname))
+                print(str(err))
+
+        ndropped = len(set(have) - set([f[0] for f in frames]))
+
+        self.frames = deque(frames, maxlen=self.nframes)
+        if nadded + ndropped > 0:
+            self.changed = True
+
+        return nadded + ndropped
+
+    def write(self, outname, fps=10):
+        """
+        Write out the animation; the format depends on the extension of
+        outname (.gif, .webp, or .mp4).  Written to a temporary file first
+        and then moved into place so nobody ever sees half of one.
+
+        'fps' is only used for MP4 output, which can't vary frame timing.
+        """
+        if len(self.frames) == 0:
+            print("No frames to animate yet!")
+            return
+
+        ext = os.path.splitext(outname)[1].lower()
+        tmpname = "%s.tmp%s" % (outname[:-len(ext)], ext)
+
+        imgs = [f[1] for f in self.frames]
+        durations = [self.duration]*(len(imgs) - 1) + [self.lastHold]
+
+        try:
+            if ext == ".mp4":
+                self._writeMP4(tmpname, imgs, fps)
+            elif ext == ".webp":
+                imgs[0].save(tmpname, format="WEBP", save_all=True,
+                             append_images=imgs[1:], duration=durations,
+                             loop=0, lossless=True)
+            else:
+                imgs[0].save(tmpname, format="GIF", save_all=True,
+                             append_images=imgs[1:], duration=durations,
+                             loop=0, optimize=False)
+            os.replace(tmpname, outname)
+            print("Wrote %d frame animation %s" % (len(imgs), outname))
+            self.changed = False
+        except (OSError, ValueError, ImportError) as err:
+            print("Failed to write animation %s!" % (outname))
+            print(str(err))
+
+    def _writeMP4(self, outname, imgs, fps):
+        """
+        """
+        # Only needed for this, so don't make it a hard requirement
+        import imageio
+
+        with imageio.get_writer(outname, format="FFMPEG", fps=fps,
+                                macro_block_size=1) as writer:
+            for img in imgs:
+                writer.append_data(np.asarray(img.convert("RGB")))
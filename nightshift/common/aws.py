@@ -13,19 +13,45 @@
 
 from __future__ import division, print_function, absolute_import
 
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
 import botocore
+from botocore.config import Config
+from boto3.s3.transfer import TransferConfig
+
+
+# Bucket resources we've already made, keyed by (pid, bucket, zone, keyid,
+#   endpoint) so the underlying connection pool is reused from loop to
+#   loop.  The pid is in there because boto3 stuff is NOT safe to share
+#   across a fork.
+_buckets = {}
 
 
-def connectS3(bucket, zone, keyid, secretkey):
+def connectS3(bucket, zone, keyid, secretkey, maxconns=10, endpoint=None):
     """
+    Returns the (cached) bucket resource; 'maxconns' is the size of the
+    connection pool, which needs to be at least as big as the number of
+    concurrent downloads that are going to be using it.
+
+    'endpoint' is the URL of something other than AWS itself that speaks
+    S3, like a local stand-in for testing.
     """
+    ckey = (os.getpid(), bucket, zone, keyid, endpoint)
+    if ckey in _buckets:
+        return _buckets[ckey]
+
     s3 = boto3.resource('s3', zone,
                         aws_access_key_id=keyid,
-                        aws_secret_access_key=secretkey)
+                        aws_secret_access_key=secretkey,
+                        endpoint_url=endpoint,
+                        config=Config(max_pool_connections=maxconns))
     buck = None
     try:
         buck = s3.Bucket(bucket)
+        _buckets.update({ckey: buck})
     except botocore.exceptions.ClientError as e:
         # NOTE: Is this the correct exception?  No clue.
         if e.response['Error']['Code'] == "404":
@@ -38,12 +64,102 @@ def connectS3(bucket, zone, keyid, secretkey):
 
 def downloadFromS3(buck, objs, oname):
     """
+    Returns True if the download worked, False otherwise.
+
+    Goes through the bucket's client directly, which (unlike the
+    resource) is safe to share between the threads in downloadManyFromS3.
     """
+    # Concurrency is handled one level up, one object per thread
+    tconf = TransferConfig(use_threads=False)
+
+    success = False
     try:
-        buck.download_file(objs.key, oname)
+        buck.meta.client.download_file(buck.name, objs.key, oname,
+                                       Config=tconf)
         print("Downloaded: %s" % (oname))
+        success = True
+    except botocore.exceptions.ClientError as e:
+        if e.response['Error']['Code'] == "404":
+            print("The object does not exist.")
+        else:
+            raise
+    except botocore.exceptions.EndpointConnectionError:
+        print("DOWNLOAD FAILURE! EndpointConnectionError")
+    except botocore.exceptions.ReadTimeoutError:
+        print("DOWNLOAD FAILURE! ReadTimeoutError")
+    except ConnectionError:
+        print("DOWNLOAD FAILURE!")
+        print("ConnectionError or subclass of it.")
+
+    return success
+
+
+def fetchToMemory(buck, objs):
+    """
+    Like downloadFromS3(), but into memory instead of a file, so whatever
+    is reading it doesn't have to wait for it to be written and then read
+    back off the disk.  Returns the contents (bytes), or None if it failed.
+    """
+    tconf = TransferConfig(use_threads=False)
+
+    data = None
+    try:
+        buf = io.BytesIO()
+        buck.meta.client.download_fileobj(buck.name, objs.key, buf,
+                                          Config=tconf)
+        data = buf.getvalue()
+        print("Fetched: %s (%d bytes)" % (objs.key, len(data)))
+    except botocore.exceptions.ClientError as e:
+        if e.response['Error']['Code'] == "404":
+            print("The object does not exist.")
+        else:
+            raise
+    except botocore.exceptions.EndpointConnectionError:
+        print("DOWNLOAD FAILURE! EndpointConnectionError")
     except botocore.exceptions.ReadTimeoutError:
         print("DOWNLOAD FAILURE! ReadTimeoutError")
     except ConnectionError:
         print("DOWNLOAD FAILURE!")
         print("ConnectionError or subclass of it.")
+
+    return data
+
+
+def saveToDisk(data, oname):
+    """
+    Write out something from fetchToMemory() as oname.  It's written to a
+    temporary file first and then moved into place, so a half written
+    file never shows up under the real name.  Returns True if it worked.
+    """
+    # Hidden, so nothing globbing for raw files ever picks it up
+    tmpname = os.path.join(os.path.dirname(oname),
+                           ".%s.part" % (os.path.basename(oname)))
+    try:
+        with open(tmpname, 'wb') as f:
+            f.write(data)
+        os.replace(tmpname, oname)
+        print("Saved: %s" % (oname))
+        success = True
+    except OSError as err:
+        print("Failed to save %s!" % (oname))
+        print(str(err))
+        success = False
+
+    return success
+
+
+def downloadManyFromS3(buck, jobs, nconcurrent=4):
+    """
+    'jobs' is a list of (objs, oname) tuples.  Up to 'nconcurrent' of them
+    are downloaded at once using the bucket's shared client; the results
+    (True/False, see downloadFromS3) come back in the same order as jobs.
+    """
+    if nconcurrent <= 1 or len(jobs) <= 1:
+        return [downloadFromS3(buck, objs, oname) for objs, oname in jobs]
+
+    print("Downloading %d files, %d at a time..." % (len(jobs), nconcurrent))
+    with ThreadPoolExecutor(max_workers=nconcurrent) as pool:
+        results = list(pool.map(lambda job: downloadFromS3(buck, *job),
+                                jobs))
+
+    return results
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Simple on-disk cache for precomputed numpy arrays.
+
+Each cache entry is a directory of plain .npy files named by a fingerprint
+of whatever went into computing them, so they can be memory-mapped straight
+back in after a restart instead of being recalculated.  Small things that
+are just a handful of parameters are kept as a single JSON file instead.
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+import numpy as np
+
+
+def fingerprint(*parts):
+    """
+    Return a stable hex digest of the repr() of all of the given parts.
+    Anything that should invalidate a cache entry when it changes MUST
+    be one of the parts!
+    """
+    hasher = hashlib.sha1()
+    for part in parts:
+        hasher.update(repr(part).encode("utf-8"))
+
+    return hasher.hexdigest()
+
+
+def saveArrays(cachedir, key, arrays):
+    """
+    'arrays' is a dict whose keys are the array names and whose values
+    are the arrays themselves.  They're written to a temporary directory
+    first and then moved into place, so a reader never sees half of a set.
+    """
+    try:
+        os.makedirs(cachedir, exist_ok=True)
+        tdir = tempfile.mkdtemp(prefix=".%s_" % (key), dir=cachedir)
+        for name in arrays:
+            np.save(os.path.join(tdir, "%s.npy" % (name)),
+                    np.asarray(arrays[name]))
+
+        odir = os.path.join(cachedir, key)
+        if os.path.isdir(odir):
+            shutil.rmtree(odir)
+        os.rename(tdir, odir)
+        print("Cached %s in %s" % (list(arrays.keys()), odir))
+    except OSError as err:
+        # Not being able to cache isn't fatal, it just costs us later
+        print("Failed to write cache entry %s!" % (key))
+        print(str(err))
+
+
+def loadArrays(cachedir, key, names, mmap=True):
+    """
+    Returns a dict of the requested arrays, memory-mapped (read only) by
+    default, or None if any of them aren't in the cache.
+    """
+    if cachedir is None:
+        return None
+
+    if mmap is True:
+        mode = 'r'
+    else:
+        mode = None
+
+    arrays = {}
+    for name in names:
+        fname = os.path.join(cachedir, key, "%s.npy" % (name))
+        try:
+            arrays.update({name: np.load(fname, mmap_mode=mode)})
+        except (OSError, ValueError):
+            return None
+
+    return arrays
+
+
+def saveParams(cachedir, key, params):
+    """
+    Cache a (JSON-able) dict of parameters as cachedir/key.json, again
+    via a temporary file so a reader never sees half of it.
+    """
+    try:
+        os.makedirs(cachedir, exist_ok=True)
+        fd, tname = tempfile.mkstemp(prefix=".%s_" % (key), dir=cachedir)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(params, f, default=str)
+
+        oname = os.path.join(cachedir, "%s.json" % (key))
+        os.replace(tname, oname)
+        print("Cached %s in %s" % (list(params.keys()), oname))
+    except (OSError, TypeError, ValueError) as err:
+        print("Failed to write cache entry %s!" % (key))
+        print(str(err))
+
+
+def loadParams(cachedir, key):
+    """
+    Returns the dict saved by saveParams, or None if it's not cached.
+    """
+    if cachedir is None:
+        return None
+
+    fname = os.path.join(cachedir, "%s.json" % (key))
+    try:
+        with open(fname, 'r') as f:
+            params = json.load(f)
+    except (OSError, ValueError):
+        params = None
+
+    return params
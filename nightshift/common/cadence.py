@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Poll for new data around when it's actually expected to show up.
+
+ABI CONUS scans come every 5 minutes and NEXRAD volumes every 4-10
+minutes (depending on the VCP), and both land in their buckets a pretty
+consistent time after that.  Both the interval and that latency are
+learned for each product from the arrival times in the manifest, so the
+loopers can sleep until just before the next frame is due and then check
+more often until it's in, instead of listing the buckets on a fixed timer.
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import math
+import time
+
+from . import manifest
+
+
+def learnCadence(db, product, limit=12):
+    """
+    Learn (latest, interval, latency) for product from its newest 'limit'
+    frames in the manifest, all in seconds; latest is the observation
+    time of the newest frame.  Returns None if there isn't enough history.
+
+    The interval is the median time between frames, so a missing frame or
+    two doesn't throw it off, and it follows changes (like a new VCP)
+    within a few frames.  The latency is the smallest delay between a
+    frame's observation time and its arrival; things can only ever be
+    seen late, never early, so that's the closest to when the data
+    actually become available.
+    """
+    rows = manifest.arrivals(db, product, limit=limit)
+    if len(rows) < 3:
+        return None
+
+    obstimes = [r[0] for r in rows]
+    steps = sorted([a - b for a, b in zip(obstimes[:-1], obstimes[1:])
+                    if a > b])
+    if len(steps) == 0:
+        return None
+    interval = steps[len(steps)//2]
+
+    latency = max(0., min([arrived - obstime for obstime, arrived in rows]))
+
+    return obstimes[0], interval, latency
+
+
+def nextPoll(db, products, now=None, default=90., early=15., retry=20.,
+             minSleep=10., maxSleep=600.):
+    """
+    Seconds to wait before listing the buckets again, so that it happens
+    'early' seconds before the next frame of any of products is due.
+    Once one is due, it's every 'retry' seconds until it shows up; if it's
+    more than half an interval late it's assumed to have been skipped and
+    the one after it is waited for instead.
+
+    Products without enough history yet get the 'default' wait, and the
+    result is always between minSleep and maxSleep.
+    """
+    if now is None:
+        now = time.time()
+
+    delays = []
+    for product in products:
+        cadence = learnCadence(db, product)
+        if cadence is None:
+            delays.append(default)
+            continue
+
+        latest, interval, latency = cadence
+        due = latest + interval + latency
+
+        slack = interval/2.
+        if now > due + slack:
+            due += interval*math.ceil((now - due - slack)/interval)
+
+        if now < due - early:
+            delays.append(due - early - now)
+        else:
+            delays.append(retry)
+
+        print("%s: every %.0f s, %.0f s behind; next due in %.0f s" %
+              (product, interval, latency, due - now))
+
+    if len(delays) == 0:
+        return default
+
+    return min(max(min(delays), minSleep), maxSleep)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Persistent index of S3 bucket listings.
+
+Both the GOES and NEXRAD buckets are organized by time, so once a prefix
+(an hour or a day) is in the past nothing new will ever show up in it.
+Those get listed one last time and are then marked as complete; only the
+live prefix is re-listed each time.  Where the keys sort by time (NEXRAD)
+that starts after the last key we saw, but the GOES hours have every
+channel in them and sort by channel first, so a late scan can land well
+before the last key; those are listed in full and checked against what's
+already in the index.
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import os
+import sqlite3
+
+
+def openListingIndex(dbfile):
+    """
+    Open (and create, if needed) the SQLite listing index at dbfile.
+    """
+    dbdir = os.path.dirname(dbfile)
+    if dbdir != '':
+        os.makedirs(dbdir, exist_ok=True)
+
+    db = sqlite3.connect(dbfile)
+    db.execute("CREATE TABLE IF NOT EXISTS prefixes ("
+               "prefix TEXT PRIMARY KEY, "
+               "complete INTEGER NOT NULL DEFAULT 0, "
+               "lastkey TEXT)")
+    db.execute("CREATE TABLE IF NOT EXISTS objects ("
+               "key TEXT PRIMARY KEY, "
+               "prefix TEXT NOT NULL, "
+               "size INTEGER)")
+    db.execute("CREATE INDEX IF NOT EXISTS objects_prefix "
+               "ON objects (prefix)")
+    db.commit()
+
+    return db
+
+
+def listPrefix(buck, db, prefix, complete=False, keysByTime=False):
+    """
+    Return the objects under prefix, sorted by key, hitting S3 only if the
+    prefix isn't already known to be complete.  If 'keysByTime' is True,
+    new keys can only ever sort after the ones already there, so only
+    keys after the last one seen are requested (StartAfter) and
+    re-listing the live prefix is usually a single small request;
+    otherwise the whole prefix is listed again.
+
+    'complete' says that nothing new can show up in the prefix anymore;
+    it's stored after this last listing so it's never listed again.
+    """
+    row = db.execute("SELECT complete, lastkey FROM prefixes "
+                     "WHERE prefix = ?", (prefix,)).fetchone()
+
+    if row is not None and row[0] == 1:
+        print("Using cached listing for %s" % (prefix))
+    else:
+        query = {'Bucket': buck.name, 'Prefix': prefix}
+        lastkey = None
+        if row is not None and row[1] is not None:
+            lastkey = row[1]
+            if keysByTime is True:
+                query.update({'StartAfter': lastkey})
+
+        listed = []
+        paginator = buck.meta.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(**query):
+            for obj in page.get('Contents', []):
+                listed.append((obj['Key'], prefix, obj['Size']))
+
+        known = db.execute("SELECT key FROM objects WHERE prefix = ?",
+                           (prefix,)).fetchall()
+        known = set([k[0] for k in known])
+        newobjs = [obj for obj in listed if obj[0] not in known]
+
+        # Listings come back in key order, so this is the last one
+        if len(listed) > 0:
+            lastkey = listed[-1][0]
+
+        print("%d new keys in %s" % (len(newobjs), prefix))
+        db.executemany("INSERT OR REPLACE INTO objects (key, prefix, size) "
+                       "VALUES (?, ?, ?)", newobjs)
+        db.execute("INSERT OR REPLACE INTO prefixes "
+                   "(prefix, complete, lastkey) VALUES (?, ?, ?)",
+                   (prefix, int(complete), lastkey))
+        db.commit()
+
+    rows = db.execute("SELECT key FROM objects WHERE prefix = ? "
+                      "ORDER BY key", (prefix,)).fetchall()
+
+    # These are lazy, so no requests are made until they're downloaded
+    return [buck.Object(r[0]) for r in rows]
+
+
+def pruneListings(db, keep):
+    """
+    Forget about any prefixes (and their keys) that aren't in keep,
+    which is usually just the current list of query prefixes.
+    """
+    keep = list(keep)
+    marks = ", ".join(["?"]*len(keep))
+    if len(keep) == 0:
+        db.execute("DELETE FROM objects")
+        db.execute("DELETE FROM prefixes")
+    else:
+        db.execute("DELETE FROM objects WHERE prefix NOT IN (%s)" % (marks),
+                   keep)
+        db.execute("DELETE FROM prefixes WHERE prefix NOT IN (%s)" % (marks),
+                   keep)
+    db.commit()
@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Persistent manifest of the raw files and frames we've dealt with.
+
+Instead of globbing, stat'ing, and parsing every filename on disk every
+loop to figure out what's been downloaded, what still needs plotting, and
+what's too old, each frame gets a row here that's updated as it moves along:
+    downloaded -> rendered -> expired
+or 'bad' if it couldn't be plotted, even after being downloaded again
+('retry'); see markFailed.  Bad frames are then just skipped until they
+expire, rather than being read (and failing) again every single loop.
+All of the per-loop bookkeeping is then just a few indexed queries.
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import os
+import glob
+import shutil
+import time
+import sqlite3
+import calendar
+from datetime import datetime as dt
+
+
+def openManifest(dbfile):
+    """
+    Open (and create, if needed) the SQLite manifest at dbfile.
+    """
+    dbdir = os.path.dirname(dbfile)
+    if dbdir != '':
+        os.makedirs(dbdir, exist_ok=True)
+
+    db = sqlite3.connect(dbfile)
+    db.execute("CREATE TABLE IF NOT EXISTS frames ("
+               "name TEXT PRIMARY KEY, "
+               "product TEXT NOT NULL, "
+               "obstime REAL NOT NULL, "
+               "rawpath TEXT, "
+               "pngpath TEXT, "
+               "state TEXT NOT NULL, "
+               "reason TEXT, "
+               "attempts INTEGER NOT NULL DEFAULT 0, "
+               "updated REAL, "
+               "arrived REAL)")
+    db.execute("CREATE INDEX IF NOT EXISTS frames_product "
+               "ON frames (product, state, obstime)")
+
+    # Manifests from before the arrival times were kept
+    cols = [r[1] for r in db.execute("PRAGMA table_info(frames)")]
+    if 'arrived' not in cols:
+        db.execute("ALTER TABLE frames ADD COLUMN arrived REAL")
+    db.commit()
+
+    return db
+
+
+def timestamp(when):
+    """
+    Naive UTC datetime to seconds since the epoch, which is what's stored.
+    """
+    return calendar.timegm(when.timetuple()) + when.microsecond/1e6
+
+
+def addDownloaded(db, name, product, obstime, rawpath, arrived=None):
+    """
+    Record that the raw file for frame 'name' (observed at the datetime
+    obstime) is now at rawpath.  Frames that are already known keep their
+    state, unless they'd already been expired or are waiting for a retry.
+
+    'arrived' is when (seconds since the epoch) the raw file showed up
+    here, which defaults to now; it's only recorded the first time the
+    frame is seen, and is what common.cadence learns from.
+    """
+    now = time.time()
+    if arrived is None:
+        arrived = now
+
+    db.execute("INSERT OR IGNORE INTO frames "
+               "(name, product, obstime, rawpath, state, updated, arrived) "
+               "VALUES (?, ?, ?, ?, 'downloaded', ?, ?)",
+               (name, product, timestamp(obstime), rawpath, now, arrived))
+    db.execute("UPDATE frames SET rawpath = ?, state = 'downloaded', "
+               "pngpath = NULL, updated = ? "
+               "WHERE name = ? AND state IN ('expired', 'retry')",
+               (rawpath, now, name))
+    db.commit()
+
+
+def knownNames(db, products=None):
+    """
+    Set of the names of every frame we already have (or gave up on) for
+    the given list of products, or all of them if products is None.
+    Expired ones count too, so they aren't downloaded all over again;
+    only the ones waiting to be retried don't.
+    """
+    if products is None:
+        rows = db.execute("SELECT name FROM frames "
+                          "WHERE state != 'retry'").fetchall()
+    else:
+        products = list(products)
+        marks = ", ".join(["?"]*len(products))
+        rows = db.execute("SELECT name FROM frames "
+                          "WHERE state != 'retry' "
+                          "AND product IN (%s)" % (marks),
+                          products).fetchall()
+
+    return set([r[0] for r in rows])
+
+
+def toRender(db, product, force=False, newestFirst=False):
+    """
+    List of (name, rawpath, obstime) of the frames that still need to be
+    plotted, oldest first (or newest first if 'newestFirst' is True).
+    If 'force' is True, that's everything that still has its raw file
+    instead.  Frames without a raw file (like ones that were only ever
+    in memory) are never in there, since they can't be plotted again.
+    The obstime is in seconds since the epoch.
+    """
+    if newestFirst is True:
+        order = "DESC"
+    else:
+        order = "ASC"
+
+    if force is True:
+        rows = db.execute("SELECT name, rawpath, obstime FROM frames "
+                          "WHERE product = ? AND state IN "
+                          "('downloaded', 'rendered') "
+                          "AND rawpath IS NOT NULL "
+                          "ORDER BY obstime %s" % (order),
+                          (product,)).fetchall()
+    else:
+        rows = db.execute("SELECT name, rawpath, obstime FROM frames "
+                          "WHERE product = ? AND state = 'downloaded' "
+                          "AND rawpath IS NOT NULL "
+                          "ORDER BY obstime %s" % (order),
+                          (product,)).fetchall()
+
+    return rows
+
+
+def newestRendered(db, product):
+    """
+    Observation time (seconds since the epoch) of the newest rendered
+    frame of product, or None if there aren't any.
+    """
+    row = db.execute("SELECT MAX(obstime) FROM frames "
+                     "WHERE product = ? AND state = 'rendered'",
+                     (product,)).fetchone()
+
+    return row[0]
+
+
+def markRendered(db, name, pngpath):
+    """
+    """
+    db.execute("UPDATE frames SET state = 'rendered', pngpath = ?, "
+               "reason = NULL, updated = ? WHERE name = ?",
+               (pngpath, time.time(), name))
+    db.commit()
+
+
+def markBad(db, name, reason):
+    """
+    Give up on frame 'name', for the given reason (a string).
+    """
+    db.execute("UPDATE frames SET state = 'bad', reason = ?, "
+               "attempts = attempts + 1, updated = ? WHERE name = ?",
+               (reason, time.time(), name))
+    db.commit()
+
+
+def markFailed(db, name, reason, retries=1, quarantine=None):
+    """
+    Frame 'name' couldn't be read or plotted, for the given reason.
+
+    The first 'retries' times, its raw file is deleted and the frame is
+    put in the 'retry' state so the grabbers download it again, since
+    it's usually just a truncated download.  After that it's marked bad
+    and skipped until it expires; if 'quarantine' is a directory, the
+    raw file is moved there (for a post-mortem) instead of left in place.
+
+    Returns the new state of the frame.
+    """
+    row = db.execute("SELECT rawpath, attempts FROM frames "
+                     "WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        return None
+
+    rawpath, attempts = row
+    print("Frame %s failed (attempt %d): %s" % (name, attempts + 1, reason))
+
+    if attempts < retries:
+        if rawpath is not None:
+            try:
+                os.remove(rawpath)
+            except OSError as err:
+                print(str(err))
+
+        db.execute("UPDATE frames SET state = 'retry', rawpath = NULL, "
+                   "reason = ?, attempts = attempts + 1, updated = ? "
+                   "WHERE name = ?", (reason, time.time(), name))
+        db.commit()
+        state = 'retry'
+    else:
+        if quarantine is not None and rawpath is not None:
+            try:
+                os.makedirs(quarantine, exist_ok=True)
+                qpath = os.path.join(quarantine, os.path.basename(rawpath))
+                shutil.move(rawpath, qpath)
+                db.execute("UPDATE frames SET rawpath = ? WHERE name = ?",
+                           (qpath, name))
+                print("Quarantined %s" % (qpath))
+            except OSError as err:
+                print(str(err))
+
+        markBad(db, name, reason)
+        state = 'bad'
+
+    return state
+
+
+def arrivals(db, product, limit=12):
+    """
+    (obstime, arrived) of the newest 'limit' frames of product, newest
+    first, both in seconds since the epoch.  Frames that were never
+    downloaded (or are from before arrivals were kept) aren't included.
+    """
+    rows = db.execute("SELECT obstime, arrived FROM frames "
+                      "WHERE product = ? AND arrived IS NOT NULL "
+                      "ORDER BY obstime DESC LIMIT ?",
+                      (product, limit)).fetchall()
+
+    return rows
+
+
+def currentFrames(db, product, now, limit=None):
+    """
+    The newest 'limit' (or all) rendered frames as a dict of
+    {pngpath: age in seconds relative to the datetime now}, oldest first,
+    which is exactly what utils.copyStaticFilenames wants.
+    """
+    if limit is None:
+        limit = -1
+
+    rows = db.execute("SELECT pngpath, obstime FROM frames "
+                      "WHERE product = ? AND state = 'rendered' "
+                      "ORDER BY obstime DESC LIMIT ?",
+                      (product, limit)).fetchall()
+
+    tnow = timestamp(now)
+    frames = {}
+    for pngpath, obstime in reversed(rows):
+        frames.update({pngpath: tnow - obstime})
+
+    return frames
+
+
+def expireOld(db, product, now, maxage):
+    """
+    Delete the raw files and frames for the given product that are older
+    than maxage hours (relative to the datetime now) and mark them as
+    expired.  Returns the number of frames that were expired.
+    """
+    cutoff = timestamp(now) - maxage*60.*60.
+
+    rows = db.execute("SELECT name, rawpath, pngpath FROM frames "
+                      "WHERE product = ? AND state != 'expired' "
+                      "AND obstime < ?", (product, cutoff)).fetchall()
+
+    for name, rawpath, pngpath in rows:
+        for fname in [rawpath, pngpath]:
+            if fname is not None:
+                try:
+                    os.remove(fname)
+                    print("Removed %s" % (fname))
+                except FileNotFoundError:
+                    pass
+                except OSError as err:
+                    print("Failed to remove %s!" % (fname))
+                    print(str(err))
+
+    db.execute("UPDATE frames SET state = 'expired', rawpath = NULL, "
+               "pngpath = NULL, updated = ? WHERE product = ? "
+               "AND state != 'expired' AND obstime < ?",
+               (time.time(), product, cutoff))
+    db.commit()
+
+    return len(rows)
+
+
+def forgetOld(db, product, now, maxage):
+    """
+    Actually drop the rows of expired frames older than maxage hours,
+    once they're far enough back that they can't be listed again anyway.
+    """
+    cutoff = timestamp(now) - maxage*60.*60.
+
+    db.execute("DELETE FROM frames WHERE product = ? AND state = 'expired' "
+               "AND obstime < ?", (product, cutoff))
+    db.commit()
+
+
+def syncFromDisk(db, product, rawglob, pngdir, dtfmt):
+    """
+    Add any raw files matching rawglob that the manifest doesn't know
+    about yet, like the ones from before it existed.  Their names (the
+    basename without the extension) are parsed with dtfmt, and if there's
+    already a matching .png in pngdir they're marked as rendered.
+
+    Meant to be run once at startup, not every loop.
+    """
+    known = knownNames(db, [product])
+
+    nadded = 0
+    for rawpath in sorted(glob.glob(rawglob)):
+        name = os.path.splitext(os.path.basename(rawpath))[0]
+        if name in known:
+            continue
+
+        try:
+            obstime = dt.strptime(name, dtfmt)
+        except ValueError:
+            print("Likely invalid file: %s. Skipping." % (rawpath))
+            continue
+
+        # Best guess at when it showed up is when it was written
+        addDownloaded(db, name, product, obstime, rawpath,
+                      arrived=os.path.getmtime(rawpath))
+
+        pngpath = "%s/%s.png" % (pngdir, name)
+        if os.path.isfile(pngpath):
+            markRendered(db, name, pngpath)
+        nadded += 1
+
+    if nadded > 0:
+        print("Added %d existing %s files to the manifest" % (nadded,
+                                                              product))
+
+    return nadded
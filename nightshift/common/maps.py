@@ -13,12 +13,30 @@
 
 from __future__ import division, print_function, absolute_import
 
+import os
+
 import numpy as np
 
+import matplotlib.pyplot as plt
+
 import cartopy.crs as ccrs
 import cartopy.feature as cfeat
 from cartopy.feature import sgeom
 import cartopy.io.shapereader as cshape
+from shapely import wkb as swkb
+
+# What shapely raises for WKB it can't read, which changed in 2.0
+#   (where the old one is deprecated, so only fall back to it)
+try:
+    from shapely.errors import GEOSException as BadWKB
+except ImportError:
+    from shapely.errors import WKBReadingError as BadWKB
+
+from . import cache
+
+
+# Rendered basemap layers, keyed by their fingerprint; see getBasemapLayer
+_basemaps = {}
 
 
 def set_plot_extent(clat, clon, radius=200., fudge=0.053):
@@ -121,6 +139,16 @@ def checkGeomDistance(centerPt, rec, centerRad):
     #   corresponding 'dist' will be too; therefore we filter
     #   based on a radius of N degrees from the center
     # centerRad == 7 covers a big area so we'll roll with that
+
+    # The bounding box is never farther away than the geometry itself,
+    #   and it's known without having to parse the whole shape, so most
+    #   records can be thrown out without ever looking at the geometry
+    x0, y0, x1, y1 = rec.bounds
+    dx = max(x0 - centerPt.x, 0., centerPt.x - x1)
+    dy = max(y0 - centerPt.y, 0., centerPt.y - y1)
+    if np.hypot(dx, dy) > centerRad:
+        return False
+
     dist = rec.geometry.distance(centerPt)
     if dist <= centerRad:
         store = True
@@ -130,9 +158,83 @@ def checkGeomDistance(centerPt, rec, centerRad):
     return store
 
 
-def parseCounties(shpfile, center=None, centerRad=7.):
+def packGeoms(geoms):
     """
+    Pack a list of geometries into a flat uint8 array of their WKB,
+    and the (N + 1) offsets of where each one starts and stops in it.
     """
+    blobs = [swkb.dumps(geom) for geom in geoms]
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(blob) for blob in blobs])
+
+    packed = np.frombuffer(b"".join(blobs), dtype=np.uint8)
+
+    return packed, offsets
+
+
+def unpackGeoms(packed, offsets):
+    """
+    Opposite of packGeoms; fine to use on memory-mapped arrays.
+    """
+    return [swkb.loads(bytes(packed[offsets[i]:offsets[i + 1]]))
+            for i in range(len(offsets) - 1)]
+
+
+def geomCacheKey(srcfile, center, centerRad, classes=None):
+    """
+    Anything that changes what parseCounties/parseRoads would give back;
+    the modification time of the shapefile catches new versions of it.
+    """
+    try:
+        mtime = os.path.getmtime(srcfile)
+    except OSError:
+        mtime = None
+
+    return cache.fingerprint("geoms", os.path.abspath(srcfile), mtime,
+                             center, centerRad, classes)
+
+
+def loadGeoms(cachedir, key):
+    """
+    Returns the geometries and their labels (an index into whatever list
+    of classes they were saved with) from the cache, or None if they
+    aren't in there.
+    """
+    arrs = cache.loadArrays(cachedir, key, ['wkb', 'offsets', 'labels'])
+    if arrs is None:
+        return None
+
+    try:
+        geoms = unpackGeoms(arrs['wkb'], arrs['offsets'])
+    except (BadWKB, OSError, ValueError) as err:
+        # Garbage (or a truncated file) in the cache; just redo it
+        print("Bad geometry cache entry %s!" % (key))
+        print(str(err))
+        return None
+
+    return geoms, np.asarray(arrs['labels'])
+
+
+def saveGeoms(cachedir, key, geoms, labels):
+    """
+    """
+    packed, offsets = packGeoms(geoms)
+    cache.saveArrays(cachedir, key, {'wkb': packed, 'offsets': offsets,
+                                     'labels': np.asarray(labels,
+                                                          dtype=np.int32)})
+
+
+def parseCounties(shpfile, center=None, centerRad=7., cachedir=None):
+    """
+    If 'cachedir' is given, the filtered counties are kept in there (see
+    saveGeoms) and just loaded back in on the next startup.
+    """
+    ckey = geomCacheKey(shpfile, center, centerRad)
+    cached = loadGeoms(cachedir, ckey)
+    if cached is not None:
+        print("Using cached counties")
+        return cached[0]
+
     counties = cshape.Reader(shpfile)
 
     # If we have coordinates of the center of the map, enable
@@ -153,10 +255,13 @@ def parseCounties(shpfile, center=None, centerRad=7.):
         if store is True:
             clist.append(rec.geometry)
 
+    if cachedir is not None:
+        saveGeoms(cachedir, ckey, clist, [0]*len(clist))
+
     return clist
 
 
-def parseRoads(rclasses, center=None, centerRad=7.):
+def parseRoads(rclasses, center=None, centerRad=7., cachedir=None):
     """
     See https://www.naturalearthdata.com/downloads/10m-cultural-vectors/roads/
     for field information; below is just a quick summary.
@@ -178,11 +283,24 @@ def parseRoads(rclasses, center=None, centerRad=7.):
         Winter (ice road, open winter only)
         Trail
         Ferry
+
+    If 'cachedir' is given, the filtered roads are kept in there (see
+    saveGeoms) and just loaded back in on the next startup.
     """
     rds = cshape.natural_earth(resolution='10m',
                                category='cultural',
                                name='roads_north_america')
 
+    ckey = geomCacheKey(rds, center, centerRad, classes=list(rclasses))
+    cached = loadGeoms(cachedir, ckey)
+    if cached is not None:
+        print("Using cached roads")
+        # Every class is there, even if none of its roads are nearby
+        rdict = {c: [] for c in rclasses}
+        for geom, label in zip(*cached):
+            rdict.setdefault(rclasses[label], []).append(geom)
+        return rdict
+
     rdsrec = cshape.Reader(rds)
 
     # If we have coordinates of the center of the map, spatially filter
@@ -211,6 +329,14 @@ def parseRoads(rclasses, center=None, centerRad=7.):
                         #   It should then work fine the next time
                         rdict.update({key: [rec.geometry]})
 
+    if cachedir is not None:
+        geoms = []
+        labels = []
+        for i, key in enumerate(rclasses):
+            geoms += rdict.get(key, [])
+            labels += [i]*len(rdict.get(key, []))
+        saveGeoms(cachedir, ckey, geoms, labels)
+
     return rdict
 
 
@@ -246,3 +372,132 @@ def add_AZObs(ax):
             markersize=5, alpha=0.95, transform=ccrs.Geodetic())
 
     return ax
+
+
+def geomTag(geoms):
+    """
+    Short summary of a bunch of geometries (how many, and where) that
+    changes if they change; used as part of the basemap layer fingerprint.
+    """
+    if geoms is None:
+        return None
+
+    bsum = np.zeros(4)
+    for geom in geoms:
+        bsum += geom.bounds
+
+    return len(geoms), tuple(np.round(bsum, decimals=4))
+
+
+def getBasemapLayer(crs, extent, extentcrs=None, figsize=(5.80, 5.80),
+                    dpi=100, counties=None, roads=None, cachedir=None):
+    """
+    The static map overlay (everything in add_map_features and add_AZObs)
+    never changes for a given map, so this draws it exactly once into an
+    RGBA image and then just hands that back, from memory or from the
+    disk cache in cachedir (if given) after a restart.
+
+    'extent' is (x0, x1, y0, y1) in 'extentcrs' coordinates, or in the
+    coordinates of 'crs' itself if extentcrs is None; it should be the
+    same extent that the actual plot will end up with.
+
+    Returns a dict with:
+        'image': RGBA (uint8) image of just the axes area, which is
+                 transparent everywhere except for the map stuff
+        'bbox': (x0, y0, x1, y1) pixel box of the axes within the figure,
+                measured from the upper left
+        'extent': (x0, x1, y0, y1) of the axes in 'crs' coordinates
+        'size': (width, height) of the whole figure in pixels
+    """
+    if extentcrs is None:
+        extentcrs = crs
+
+    rtags = None
+    if roads is not None:
+        rtags = sorted([(rtype, geomTag(roads[rtype])) for rtype in roads])
+
+    key = cache.fingerprint(crs.proj4_init, extentcrs.proj4_init,
+                            tuple(np.round(extent, decimals=6)),
+                            tuple(figsize), dpi,
+                            geomTag(counties), rtags)
+
+    if key in _basemaps:
+        return _basemaps[key]
+
+    cached = cache.loadArrays(cachedir, key, ['image', 'meta'])
+    if cached is not None:
+        print("Loaded cached basemap layer %s" % (key))
+        meta = np.asarray(cached['meta'])
+        layer = {'image': cached['image'],
+                 'bbox': tuple(meta[0:4].astype(int)),
+                 'extent': tuple(meta[4:8]),
+                 'size': tuple(meta[8:10].astype(int))}
+        _basemaps.update({key: layer})
+        return layer
+
+    print("Rendering basemap layer...")
+    # Same figure/axes setup as the actual plots so it all lines up
+    fig = plt.figure(figsize=figsize, dpi=dpi)
+    plt.subplots_adjust(left=0., right=1., top=1., bottom=0.)
+    ax = plt.axes(projection=crs)
+    ax.set_extent(extent, crs=extentcrs)
+
+    # Nothing but the map stuff itself should be drawn
+    fig.patch.set_alpha(0.)
+    ax.set_axis_off()
+
+    ax = add_map_features(ax, counties=counties, roads=roads)
+    ax = add_AZObs(ax)
+
+    # Adding things can poke the limits, so put them back
+    ax.set_extent(extent, crs=extentcrs)
+
+    fig.canvas.draw()
+    full = np.array(fig.canvas.buffer_rgba(), dtype=np.uint8)
+
+    # Display coordinates start at the bottom left, image ones at top left
+    height, width = full.shape[0:2]
+    bb = ax.get_window_extent()
+    bbox = (int(round(bb.x0)), int(round(height - bb.y1)),
+            int(round(bb.x1)), int(round(height - bb.y0)))
+    axext = ax.get_xlim() + ax.get_ylim()
+
+    plt.close(fig)
+
+    layer = {'image': full[bbox[1]:bbox[3], bbox[0]:bbox[2], :],
+             'bbox': bbox,
+             'extent': tuple(axext),
+             'size': (width, height)}
+
+    if cachedir is not None:
+        meta = np.array(layer['bbox'] + layer['extent'] + layer['size'],
+                        dtype=np.float64)
+        cache.saveArrays(cachedir, key, {'image': layer['image'],
+                                         'meta': meta})
+
+    _basemaps.update({key: layer})
+
+    return layer
+
+
+def add_basemap_layer(ax, layer, zorder=50):
+    """
+    Put a layer from getBasemapLayer on top of whatever's already in ax.
+    Do this *after* the data are plotted, so the axes limits are final.
+    """
+    xlim = ax.get_xlim()
+    ylim = ax.get_ylim()
+
+    if not np.allclose(xlim + ylim, layer['extent']):
+        print("WARNING: Basemap layer extent doesn't match the axes!")
+
+    ax.imshow(layer['image'], origin='upper',
+              extent=(xlim[0], xlim[1], ylim[0], ylim[1]),
+              transform=ax.projection, interpolation='none',
+              zorder=zorder)
+
+    # imshow can mess with the limits, so make sure they stay put
+    ax.set_xlim(xlim)
+    ax.set_ylim(ylim)
+
+    return ax
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Simple threaded pipeline, for overlapping fetching/decoding/rendering.
+
+Each stage is a function run on its own thread(s), and the stages are
+connected by bounded queues so that a fast stage can only get a few items
+ahead of a slow one.  The output of the last stage comes back out in the
+calling thread, which is where anything that isn't thread safe (like
+matplotlib, or an SQLite connection) should be done.
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import queue
+import threading
+
+
+# Marks the end of the items in a queue
+_finished = object()
+
+# How often (s) anything blocked on a queue checks if it should give up
+_patience = 0.1
+
+
+class failedItem():
+    def __init__(self, item, reason):
+        """
+        What comes out of the pipeline instead of a result when a stage
+        raised an exception; 'item' is what that stage was given, and
+        'reason' is a string saying what went wrong.  The stages after
+        that one just pass it along without doing anything with it.
+        """
+        self.item = item
+        self.reason = reason
+
+
+def _put(outq, item, stop):
+    """
+    Put item on outq, unless stop gets set while waiting for room.
+    Returns True if it made it on there.
+    """
+    while not stop.is_set():
+        try:
+            outq.put(item, timeout=_patience)
+            return True
+        except queue.Full:
+            pass
+
+    return False
+
+
+def _get(inq, stop):
+    """
+    Next thing from inq, or the end marker if stop gets set first.
+    """
+    while not stop.is_set():
+        try:
+            return inq.get(timeout=_patience)
+        except queue.Empty:
+            pass
+
+    return _finished
+
+
+def _feeder(items, outq, nworkers, stop):
+    """
+    """
+    for item in items:
+        if _put(outq, item, stop) is False:
+            return
+
+    for _ in range(nworkers):
+        _put(outq, _finished, stop)
+
+
+def _stageWorker(func, inq, outq, state, nnext, stop):
+    """
+    Run func on everything that comes in on inq and put the results on
+    outq, dropping any that come back as None.  If func raises, a
+    failedItem goes on instead so whatever is at the end can still deal
+    with it (like marking it as failed in the manifest).  The last worker
+    of a stage to finish passes the end marker along to each of the next
+    stage's workers.
+    """
+    while True:
+        item = _get(inq, stop)
+        if item is _finished:
+            break
+
+        if isinstance(item, failedItem):
+            result = item
+        else:
+            try:
+                result = func(item)
+            except Exception as err:
+                # Anything at all, since otherwise the item would just
+                #   silently vanish and be tried (and fail) forever
+                print("Pipeline stage %s failed!" % (func.__name__))
+                print(str(err))
+                result = failedItem(item, "%s failed: %s: %s" %
+                                    (func.__name__, type(err).__name__,
+                                     str(err)))
+
+        if result is not None:
+            if _put(outq, result, stop) is False:
+                break
+
+    with state['lock']:
+        state['running'] -= 1
+        last = state['running'] == 0
+
+    if last is True:
+        for _ in range(nnext):
+            _put(outq, _finished, stop)
+
+
+def _drain(q):
+    """
+    """
+    while True:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            break
+
+
+def runPipeline(items, stages, qsize=4):
+    """
+    Push items through stages, a list of (function, nworkers) pairs.
+    Each function gets the output of the one before it (the first gets
+    the items themselves); returning None drops that item, and raising
+    turns it into a failedItem.  The queues in between hold at most qsize
+    items.
+
+    This is a generator that yields the output of the last stage (or a
+    failedItem), in the calling thread, as soon as each one is done.
+    Items can come out in a different order than they went in if a stage
+    has more than one worker.  If whoever is iterating stops early (or
+    raises), all of the threads are told to stop and are cleaned up.
+    """
+    queues = [queue.Queue(maxsize=qsize) for _ in range(len(stages) + 1)]
+    stop = threading.Event()
+
+    # The last stage hands its output to just us
+    nworkers = [n for _, n in stages] + [1]
+
+    threads = [threading.Thread(target=_feeder,
+                                args=(items, queues[0], nworkers[0], stop),
+                                daemon=True)]
+    for i, (func, nwork) in enumerate(stages):
+        state = {'lock': threading.Lock(), 'running': nwork}
+        for _ in range(nwork):
+            threads.append(threading.Thread(target=_stageWorker,
+                                            args=(func, queues[i],
+                                                  queues[i + 1], state,
+                                                  nworkers[i + 1], stop),
+                                            daemon=True))
+
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            result = queues[-1].get()
+            if result is _finished:
+                break
+            yield result
+    finally:
+        stop.set()
+        # Nothing's going to use these, so don't hang on to them either
+        for q in queues:
+            _drain(q)
+
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Build output frames directly as images, without matplotlib figures.
+
+Meant to give the same result as the matplotlib/cartopy plots, which for
+our maps are really just: data image + static map overlay + label bar.
+The map overlay comes from common.maps.getBasemapLayer.
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from matplotlib import font_manager
+
+
+# Label fonts, keyed by size, since they're a little slow to load
+_fonts = {}
+
+
+def colormapLUT(cmap):
+    """
+    Turn a matplotlib colormap into an (N + 3, 4) uint8 RGBA lookup table;
+    the last three entries are the under, over, and bad colors, in the
+    same way that matplotlib itself does it.
+    """
+    lut = np.zeros((cmap.N + 3, 4), dtype=np.uint8)
+    lut[0:cmap.N] = cmap(np.arange(cmap.N), bytes=True)
+
+    for i, color in enumerate([cmap.get_under(), cmap.get_over(),
+                               cmap.get_bad()]):
+        # Truncated, not rounded, to match matplotlib's bytes=True
+        lut[cmap.N + i] = (np.array(color)*255.).astype(np.uint8)
+
+    return lut
+
+
+def applyColormap(data, lut, vmin, vmax):
+    """
+    Color the (masked) data array with the LUT from colormapLUT, with
+    the same linear normalization and index math as matplotlib.
+    Returns an RGBA uint8 image array.
+    """
+    ncolors = lut.shape[0] - 3
+
+    vals = np.ma.getdata(data)
+    bad = np.ma.getmaskarray(data) | ~np.isfinite(vals)
+
+    with np.errstate(invalid='ignore'):
+        scaled = (vals - vmin)/(vmax - vmin)*ncolors
+
+        # Exactly vmax is the top color, not over
+        scaled[scaled == ncolors] = ncolors - 1
+
+        idx = np.clip(scaled, -1, ncolors)
+        idx = np.where(np.isfinite(idx), idx, 0).astype(np.int64)
+        idx[scaled < 0] = ncolors
+        idx[scaled >= ncolors] = ncolors + 1
+    idx[bad] = ncolors + 2
+
+    return np.take(lut, idx, axis=0)
+
+
+def packedLUT(lut, scale, offset, vmin, vmax, fill=None, validRange=None,
+              nbits=16):
+    """
+    Fold the unpacking of packed integer data (value = count*scale + offset)
+    into the colormap LUT from colormapLUT, so that coloring the raw counts
+    is just a single np.take() into the result.  The fill value and
+    anything outside of validRange (in counts) get the bad color.
+
+    Returns a (2**nbits, 4) uint8 RGBA lookup table.
+    """
+    counts = np.arange(2**nbits)
+    vals = counts*scale + offset
+
+    bad = np.zeros(counts.size, dtype=bool)
+    if fill is not None:
+        bad[fill] = True
+    if validRange is not None:
+        bad |= (counts < validRange[0]) | (counts > validRange[1])
+
+    return applyColormap(np.ma.masked_array(vals, mask=bad), lut, vmin, vmax)
+
+
+def getLabelFont(size):
+    """
+    Same font that matplotlib would use for a bold monospace label, so
+    the labels match those plots too.
+    """
+    if size not in _fonts:
+        try:
+            fprops = font_manager.FontProperties(family='monospace',
+                                                 weight='bold')
+            ffile = font_manager.findfont(fprops)
+            font = ImageFont.truetype(ffile, size=size)
+        except (OSError, ValueError) as err:
+            print(str(err))
+            print("Falling back to the default font!")
+            font = ImageFont.load_default()
+        _fonts.update({size: font})
+
+    return _fonts[size]
+
+
+def composeFrame(rgba, layer, labels=None, axcolor='#262629',
+                 figcolor='black', barheight=0.060, fontsize=10., dpi=100):
+    """
+    Put together a whole frame:
+        the RGBA data image, scaled (nearest neighbour) to fill the axes
+        on top of the axes background color,
+        with the basemap layer on top of that,
+        and then a black label bar at the top with the given labels.
+
+    'layer' is a basemap layer from common.maps.getBasemapLayer, which
+    also says where the axes are in the figure.
+
+    'labels' is a list of (text, y) where y is the center of the text in
+    axes fraction, just like the annotate() calls in the plots.
+
+    'fontsize' is in points, like matplotlib, so it's scaled by dpi.
+
+    Returns a PIL Image.
+    """
+    width, height = layer['size']
+    x0, y0, x1, y1 = layer['bbox']
+    axw = x1 - x0
+    axh = y1 - y0
+
+    frame = Image.new("RGBA", (width, height), figcolor)
+    axes = Image.new("RGBA", (axw, axh), axcolor)
+
+    data = Image.fromarray(np.ascontiguousarray(rgba), mode="RGBA")
+    if data.size != (axw, axh):
+        data = data.resize((axw, axh), resample=Image.NEAREST)
+    axes = Image.alpha_composite(axes, data)
+
+    overlay = Image.fromarray(np.ascontiguousarray(layer['image']),
+                              mode="RGBA")
+    axes = Image.alpha_composite(axes, overlay)
+
+    if labels is not None:
+        draw = ImageDraw.Draw(axes)
+        draw.rectangle([0, 0, axw, int(round(barheight*axh)) - 1],
+                       fill='black')
+
+        font = getLabelFont(int(round(fontsize*dpi/72.)))
+        for text, ypos in labels:
+            draw.text((axw/2., (1. - ypos)*axh), text, fill='white',
+                      font=font, anchor='mm')
+
+    frame.paste(axes, (x0, y0))
+
+    return frame
+
+
+def drawTriangle(img, layer, xy, size=8, fill='orange'):
+    """
+    Draw an upward triangle marker (like matplotlib's '^') on a frame
+    from composeFrame, centered at xy = (column, row) in axes pixels.
+    'size' is the height of the marker in pixels.
+    """
+    x = layer['bbox'][0] + xy[0]
+    y = layer['bbox'][1] + xy[1]
+    half = size/2.
+
+    draw = ImageDraw.Draw(img)
+    draw.polygon([(x, y - half), (x + half, y + half), (x - half, y + half)],
+                 fill=fill)
+
+    return img
+
+
+def savePNG(img, outname):
+    """
+    """
+    img.save(outname, format='PNG')
+    print("Saved as %s." % (outname))
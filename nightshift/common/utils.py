@@ -15,6 +15,8 @@ Further description.
 
 from __future__ import division, print_function, absolute_import
 
+import os
+import glob
 from shutil import copyfile
 
 from . import images
@@ -28,8 +30,6 @@ def copyStaticFilenames(cpng, lout, staticname, nstaticfiles,
 
     errorAge is given in hours and then converted to seconds
     """
-    latestname = '%s/%s_latest.png' % (lout, staticname)
-
     errorAge *= 60. * 60.
 
     # Since we gave it a dict we just put it into a list to make
@@ -66,9 +66,50 @@ def copyStaticFilenames(cpng, lout, staticname, nstaticfiles,
             print("WHOOPSIE! COPY FAILED")
 
     # Put the very last file in the last file slot
-    latest = clist[-1]
+    publishLatest(clist[-1], lout, staticname)
+
+
+def migrateFrames(pngglob, rawdir, newdir, rawext=".nc"):
+    """
+    Move old frames matching pngglob into newdir, as long as their raw
+    file (same name, with rawext, in rawdir) is still around so that
+    manifest.syncFromDisk can pick them both back up.  The ones without
+    a raw file are deleted, since they'd have been expired along with it.
+
+    Returns the number of frames moved and deleted.
+    """
+    nmoved = 0
+    nremoved = 0
+    for pngpath in sorted(glob.glob(pngglob)):
+        name = os.path.splitext(os.path.basename(pngpath))[0]
+        try:
+            if os.path.isfile("%s/%s%s" % (rawdir, name, rawext)):
+                os.replace(pngpath, "%s/%s.png" % (newdir, name))
+                nmoved += 1
+            else:
+                os.remove(pngpath)
+                nremoved += 1
+        except OSError as err:
+            print("Failed to migrate %s!" % (pngpath))
+            print(str(err))
+
+    if nmoved + nremoved > 0:
+        print("Moved %d old frames to %s, removed %d" % (nmoved, newdir,
+                                                         nremoved))
+
+    return nmoved, nremoved
+
+
+def publishLatest(latest, lout, staticname):
+    """
+    Copy latest into the staticname_latest.png slot in lout, via a
+    temporary file so that nobody ever grabs half of an image.
+    """
+    latestname = '%s/%s_latest.png' % (lout, staticname)
+    tmpname = '%s/.%s_latest.png.tmp' % (lout, staticname)
     try:
-        copyfile(latest, latestname)
+        copyfile(latest, tmpname)
+        os.replace(tmpname, latestname)
         print("Latest file copy done!")
     except Exception as err:
         # TODO: Figure out the proper/specific exception to catch
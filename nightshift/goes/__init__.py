@@ -1,2 +1,3 @@
 from . import aws
+from . import geos
 from . import plot
@@ -15,7 +15,8 @@ Requires AWS credentials in the awsCreds.conf file.
 
 from __future__ import division, print_function, absolute_import
 
-from os.path import basename
+from os.path import basename, splitext
+from datetime import datetime as dt
 from datetime import timedelta as td
 
 import botocore
@@ -56,13 +57,28 @@ def genQueries(timedelta, now, inst):
     return querybins
 
 
-def GOESAWSgrab(aws_keyid, aws_secretkey, now, outdir,
-                timedelta=6, forceDown=False):
+def prefixEnd(prefix):
     """
-    AWS IAM user key
-    AWS IAM user secret key
-    Time query is relative to (usually datetime.datetime.utcnow)
-    Hours to query back from above
+    Time at which the given query prefix stops getting new files, which
+    is the end of the hour that it covers.
+    """
+    # Sample prefix: ABI-L2-CMIPC/2018/319/23/
+    parts = prefix.strip("/").split("/")
+    pstart = dt.strptime("/".join(parts[-3:]), "%Y/%j/%H")
+
+    return pstart + td(hours=1)
+
+
+def GOESAWSlist(aws_keyid, aws_secretkey, now, outdir,
+                timedelta=6, forceDown=False, nconcurrent=4,
+                listcache=True, grace=20., channels=None, manifest=None):
+    """
+    Find everything that needs downloading, but don't download it; see
+    GOESAWSgrab() for the arguments, since they're the same.
+
+    Returns the bucket, the list of matching objects, and the lists of
+    downloads to do, (objs, oname), and the matching (name, product,
+    observation time) of each of those, newest first.
     """
     # AWS GOES bucket location/name
     #  https://registry.opendata.aws/noaa-goes/
@@ -75,21 +91,44 @@ def GOESAWSgrab(aws_keyid, aws_secretkey, now, outdir,
     #   these are derived products based on the "ABI-L1b-Rad*" data
     #   See also: https://www.ncdc.noaa.gov/data-access/satellite-data/goes-r-series-satellites
     inst = "ABI-L2-CMIPC"
-    channel = 13
-
-    # Check our output directory for files already downloaded
-    donelist = files.checkOutDir(outdir)
+    if channels is None:
+        channels = [13]
+    chankeys = ["C%02d" % (channel) for channel in channels]
+
+    # Check for files already downloaded; the manifest names don't have
+    #   the extension, so make the directory listing match
+    if manifest is not None:
+        donelist = com.manifest.knownNames(manifest, chankeys)
+    else:
+        donelist = files.checkOutDir(outdir)
+        donelist = [splitext(f)[0] for f in donelist]
 
     querybins = genQueries(timedelta, now, inst)
 
     # Establish the connection to the S3 bucket
-    buck = com.aws.connectS3(awsbucket, awszone, aws_keyid, aws_secretkey)
+    buck = com.aws.connectS3(awsbucket, awszone, aws_keyid, aws_secretkey,
+                             maxconns=max(10, nconcurrent))
+
+    # Prefixes that are over with are only listed once; see listPrefix
+    if listcache is True:
+        ldb = com.listings.openListingIndex(outdir + "/.listings.sqlite")
+    else:
+        ldb = None
 
     matches = []
+    # The actual downloads are queued up and done all at once at the end
+    downloads = []
+    # (name, product, observation time) of each of those, for the manifest
+    newframes = []
     for qt in querybins:
         print("Querying:", qt)
         try:
-            todaydata = buck.objects.filter(Prefix=qt)
+            if ldb is not None:
+                complete = (prefixEnd(qt) + td(minutes=grace)) < now
+                todaydata = com.listings.listPrefix(buck, ldb, qt,
+                                                    complete=complete)
+            else:
+                todaydata = buck.objects.filter(Prefix=qt)
 
             for objs in todaydata:
                 # Current filename
@@ -103,30 +142,42 @@ def GOESAWSgrab(aws_keyid, aws_secretkey, now, outdir,
                 # Backup of original query:
                 # fkey = "OR_%s-M3C%02d_G16" % (inst, channel)
                 fkey = "OR_%s-M" % (inst)
-                chankey = "C%02d" % (channel)
 
                 # Bit of hackey magic. Sorry. Needed to ignore the "mode"
                 #   parameter but still check the channel
-                keyparts = ckey.split("_")[1].split("-")[3]
-
-                # Now only select ones that match our product and our channel
-                if ckey.startswith(fkey) and keyparts.endswith(chankey):
+                try:
+                    keyparts = ckey.split("_")[1].split("-")[3]
+                except IndexError:
+                    print("Likely invalid key: %s. Skipping." % (ckey))
+                    continue
+                chankey = keyparts[-3:]
+
+                # Now only select ones that match our product and channels
+                if ckey.startswith(fkey) and chankey in chankeys:
                     # Construct the output filename to save it as
-                    oname = ckey.split("_")[4][1:]
-                    oname = "%s/%s_C%02d.nc" % (outdir, oname, channel)
-
-                    # Just basename it so we can quickly check to see if
-                    #   we already downloaded this file; if so, skip it.
-                    boname = basename(oname)
-                    if boname not in donelist:
+                    #   which is named by the scan end time
+                    try:
+                        estamp = ckey.split("_")[4][1:]
+                        obstime = dt.strptime(estamp, "%Y%j%H%M%S%f")
+                    except (IndexError, ValueError):
+                        print("Likely invalid key: %s. Skipping." % (ckey))
+                        continue
+                    fname = "%s_%s" % (estamp, chankey)
+                    oname = "%s/%s.nc" % (outdir, fname)
+
+                    # Check to see if we already downloaded this file;
+                    #   if so, skip it.
+                    if fname not in donelist:
                         matches.append(objs)
-                        # Actually attempt the download
-                        com.aws.downloadFromS3(buck, objs, oname)
+                        # Queue up the download
+                        downloads.append((objs, oname))
+                        newframes.append((fname, chankey, obstime))
                     else:
                         print(oname, "already downloaded!")
                         if forceDown is True:
                             print("Download forced.")
-                            com.aws.downloadFromS3(buck, objs, oname)
+                            downloads.append((objs, oname))
+                            newframes.append((fname, chankey, obstime))
 
         except botocore.exceptions.ClientError as e:
             # Needed for handling interrupted connections
@@ -138,4 +189,56 @@ def GOESAWSgrab(aws_keyid, aws_secretkey, now, outdir,
             # Needed for handling interrupted connections
             print("QUERY FAILURE! EndpointConnectionError")
 
+    if ldb is not None:
+        com.listings.pruneListings(ldb, querybins)
+        ldb.close()
+
+    # Newest first, so the latest frame can be made as soon as possible
+    #   instead of after the whole backlog
+    order = sorted(range(len(downloads)), key=lambda k: newframes[k][2],
+                   reverse=True)
+    downloads = [downloads[k] for k in order]
+    newframes = [newframes[k] for k in order]
+
+    return buck, matches, downloads, newframes
+
+
+def GOESAWSgrab(aws_keyid, aws_secretkey, now, outdir,
+                timedelta=6, forceDown=False, nconcurrent=4,
+                listcache=True, grace=20., channels=None, manifest=None):
+    """
+    AWS IAM user key
+    AWS IAM user secret key
+    Time query is relative to (usually datetime.datetime.utcnow)
+    Hours to query back from above
+    Number of files to download at once ('nconcurrent')
+
+    If 'listcache' is True, bucket listings are kept in an index in outdir
+    and prefixes that ended more than 'grace' minutes ago aren't re-listed.
+
+    'channels' is the list of ABI bands to grab (default is just [13]).
+    Each prefix is only listed once for all of them.
+
+    'manifest' is an open common.manifest database; if given, it's what
+    says what's already been downloaded (instead of listing outdir) and
+    new downloads are added to it.  Their product is the band, like 'C13'.
+    """
+    listed = GOESAWSlist(aws_keyid, aws_secretkey, now, outdir,
+                         timedelta=timedelta, forceDown=forceDown,
+                         nconcurrent=nconcurrent, listcache=listcache,
+                         grace=grace, channels=channels, manifest=manifest)
+    buck, matches, downloads, newframes = listed
+
+    # Now actually download everything, a few at a time
+    results = com.aws.downloadManyFromS3(buck, downloads,
+                                         nconcurrent=nconcurrent)
+
+    if manifest is not None:
+        for (_, oname), (fname, prod, obstime), ok in zip(downloads,
+                                                          newframes,
+                                                          results):
+            if ok is True:
+                com.manifest.addDownloaded(manifest, fname, prod,
+                                           obstime, oname)
+
     return matches
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Analytic resampling from the GOES-R ABI fixed grid.
+
+The ABI fixed grid is just the geostationary projection sampled at regular
+scan angles, so the source pixel for any lat/lon can be calculated directly
+instead of searching for it in a KD-tree.  The outputs are the same four
+arrays that pyresample.kd_tree.get_neighbour_info gives back, so they can
+be used in get_sample_from_neighbour_info exactly the same way.
+
+See also:
+    https://proj.org/operations/projections/geos.html
+    GOES-R Product User Guide (PUG) Volume 5, Section 4.2.8
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import numpy as np
+
+
+# Radius (meters) of the sphere that pyresample's KD-tree measures on
+EARTH_RADIUS = 6370997.0
+
+
+def lonlat2geos(lons, lats, h, a, b, lon_0, sweep='x'):
+    """
+    Forward geostationary projection, following what PROJ does for the
+    ellipsoidal case.  Returns the projection coordinates (x, y) in meters
+    (scanning angle times h) and a boolean array of which points are
+    actually visible from the satellite.
+    """
+    # Everything is done in units of the semi-major axis, like PROJ does
+    radius_g = 1. + h/a
+    radius_p = b/a
+    radius_p2 = radius_p*radius_p
+    radius_p_inv2 = 1./radius_p2
+
+    lam = np.deg2rad(lons - lon_0)
+
+    # Geodetic to geocentric latitude
+    phi = np.arctan(radius_p2*np.tan(np.deg2rad(lats)))
+
+    # Vector from the center of the earth to the point
+    r = radius_p/np.hypot(radius_p*np.cos(phi), np.sin(phi))
+    vx = r*np.cos(lam)*np.cos(phi)
+    vy = r*np.sin(lam)*np.cos(phi)
+    vz = r*np.sin(phi)
+
+    # Points on the far side of the limb aren't seen at all
+    visible = ((radius_g - vx)*vx - vy*vy - vz*vz*radius_p_inv2) >= 0.
+
+    tmp = radius_g - vx
+    if sweep == 'x':
+        # GOES-R style; the sweep is around the x axis
+        x = np.arctan(vy/np.hypot(vz, tmp))
+        y = np.arctan(vz/tmp)
+    else:
+        # Meteosat style
+        x = np.arctan(vy/tmp)
+        y = np.arctan(vz/np.hypot(vy, tmp))
+
+    # Scanning angle (radians) * h is the projection coordinate
+    return x*h, y*h, visible
+
+
+def _cartesian(lons, lats):
+    """
+    Points on the sphere that pyresample's KD-tree uses, in meters, as an
+    array of shape lons.shape + (3,); unreadable lon/lats come out as NaN.
+    """
+    bad = ~(np.isfinite(lons) & np.isfinite(lats))
+    lons = np.deg2rad(np.where(bad, np.nan, lons))
+    lats = np.deg2rad(np.where(bad, np.nan, lats))
+
+    return np.stack([EARTH_RADIUS*np.cos(lats)*np.cos(lons),
+                     EARTH_RADIUS*np.cos(lats)*np.sin(lons),
+                     EARTH_RADIUS*np.sin(lats)], axis=-1)
+
+
+def _sourcePixels(source_geo_def, target_geo_def, radius_of_influence):
+    """
+    Find the source (row, col) for every target point, along with which
+    of them are actually valid (visible, and within the radius) and how
+    far they are from the center of that source pixel.
+
+    The pixel a target falls in (in the projection plane) is just where
+    to start looking; pixel centers on the ground aren't a square grid,
+    so that one and its eight neighbours are compared using the same
+    distance as the KD-tree (see _cartesian), and the closest one wins.
+    Targets off the edge of the grid get the closest edge pixel, again
+    like the KD-tree, if it's within the radius.
+    """
+    proj = source_geo_def.proj_dict
+    h = float(proj['h'])
+    if 'a' in proj and 'b' in proj:
+        a = float(proj['a'])
+        b = float(proj['b'])
+    else:
+        # Newer pyresample gives back the ellipsoid's name instead
+        ellps = source_geo_def.crs.ellipsoid
+        a = ellps.semi_major_metre
+        b = ellps.semi_minor_metre
+    lon_0 = float(proj['lon_0'])
+    sweep = proj.get('sweep', 'y')
+
+    lons, lats = target_geo_def.get_lonlats()
+    lons = np.asarray(lons).ravel()
+    lats = np.asarray(lats).ravel()
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x, y, visible = lonlat2geos(lons, lats, h, a, b, lon_0, sweep=sweep)
+
+    visible &= np.isfinite(x) & np.isfinite(y)
+    x = np.where(visible, x, 0.)
+    y = np.where(visible, y, 0.)
+
+    # Source grid geometry; remember the extent is to the outer pixel edges
+    #   and the rows go from north to south
+    ext = source_geo_def.area_extent
+    nx = source_geo_def.width
+    ny = source_geo_def.height
+    dx = (ext[2] - ext[0])/nx
+    dy = (ext[3] - ext[1])/ny
+
+    col = np.clip(np.floor((x - ext[0])/dx), 0, nx - 1).astype(np.int64)
+    row = np.clip(np.floor((ext[3] - y)/dy), 0, ny - 1).astype(np.int64)
+
+    dist = np.full(row.size, np.inf)
+    if not visible.any():
+        return row, col, visible, dist
+
+    # Centers of just the part of the source grid that could be picked
+    r0 = max(row[visible].min() - 1, 0)
+    r1 = min(row[visible].max() + 2, ny)
+    c0 = max(col[visible].min() - 1, 0)
+    c1 = min(col[visible].max() + 2, nx)
+    slons, slats = source_geo_def.get_lonlats(data_slice=(slice(r0, r1),
+                                                          slice(c0, c1)))
+    with np.errstate(invalid='ignore'):
+        centers = _cartesian(np.asarray(slons), np.asarray(slats))
+        targets = _cartesian(lons, lats)
+
+    best = (row, col)
+    for drow, dcol in [(0, 0), (-1, -1), (-1, 0), (-1, 1), (0, -1),
+                       (0, 1), (1, -1), (1, 0), (1, 1)]:
+        crow = np.clip(row + drow, r0, r1 - 1)
+        ccol = np.clip(col + dcol, c0, c1 - 1)
+        with np.errstate(invalid='ignore'):
+            cdist = np.linalg.norm(targets - centers[crow - r0, ccol - c0],
+                                   axis=-1)
+            closer = visible & (cdist < dist)
+        best = (np.where(closer, crow, best[0]),
+                np.where(closer, ccol, best[1]))
+        dist = np.where(closer, cdist, dist)
+
+    row, col = best
+    valid = visible & (dist <= radius_of_influence)
+
+    return row, col, valid, dist
+
+
+def _neighbourArrays(row, col, valid, dist, nx, ny):
+    """
+    Turn the output of _sourcePixels into the pyresample style arrays,
+    for a source grid that's nx by ny pixels.
+    """
+    flat = row[valid]*nx + col[valid]
+
+    # Only mark the source pixels that are actually used, which also keeps
+    #   the window in coeffWindow() as small as it can be
+    valid_input_index = np.zeros(nx*ny, dtype=bool)
+    valid_input_index[flat] = True
+    used = np.flatnonzero(valid_input_index)
+
+    # pyresample convention: an index equal to the number of valid inputs
+    #   means there was no neighbour, and it'll get the fill value
+    index_array = np.full(row.size, used.size, dtype=np.int64)
+    index_array[valid] = np.searchsorted(used, flat)
+
+    distance_array = np.full(row.size, np.inf)
+    distance_array[valid] = dist[valid]
+
+    valid_output_index = np.ones(row.size, dtype=bool)
+
+    return valid_input_index, valid_output_index, index_array, distance_array
+
+
+def get_neighbour_info(source_geo_def, target_geo_def, radius_of_influence):
+    """
+    Drop-in (nearest neighbour only) replacement for
+    pyresample.kd_tree.get_neighbour_info when the source is a geos
+    AreaDefinition like the one made in G16_ABI_L2_ProjDef.
+
+    Returns valid_input_index, valid_output_index, index_array and
+    distance_array, with the same meanings as the pyresample ones.
+    The distance (in meters) is to the center of the closest source pixel,
+    measured the same way as the KD-tree does.
+    """
+    row, col, valid, dist = _sourcePixels(source_geo_def, target_geo_def,
+                                          radius_of_influence)
+
+    return _neighbourArrays(row, col, valid, dist,
+                            source_geo_def.width, source_geo_def.height)
+
+
+def get_window_info(source_geo_def, target_geo_def, radius_of_influence):
+    """
+    Same as get_neighbour_info, but everything is relative to just the
+    window = (row0, row1, col0, col1) of the source grid that's actually
+    used, so nothing the size of the whole source grid is ever made.
+    That's what keeps the memory use of the tiled resampling fixed no
+    matter how big the source image is.
+
+    Returns window, window_input_index, valid_output_index, index_array,
+    and distance_array.  If none of the target lands on the source grid,
+    the window is empty (all zeros).
+    """
+    row, col, valid, dist = _sourcePixels(source_geo_def, target_geo_def,
+                                          radius_of_influence)
+
+    if not valid.any():
+        window = np.array([0, 0, 0, 0])
+    else:
+        window = np.array([row[valid].min(), row[valid].max() + 1,
+                           col[valid].min(), col[valid].max() + 1])
+
+    wrow = row - window[0]
+    wcol = col - window[2]
+    wnx = window[3] - window[2]
+    wny = window[1] - window[0]
+
+    arrs = _neighbourArrays(wrow, wcol, valid, dist, wnx, wny)
+
+    return (window,) + arrs
@@ -15,11 +15,13 @@ from __future__ import division, print_function, absolute_import
 
 import os
 import glob
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime as dt
 
 import numpy as np
 import pyresample as pr
-import cartopy.crs as ccrs
 from netCDF4 import Dataset
 
 from matplotlib import cm
@@ -27,20 +29,38 @@ import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
 from matplotlib.colors import ListedColormap
 
+from . import geos
 from .. import common as com
 
 
-def readNC(filename):
+# Colormap lookup tables for raw CMI counts; see getCountsLUT
+_countLUTs = {}
+
+# Target grids and their cartopy CRSs, so they're only made once per process;
+#   see getTargetArea and getTargetCRS
+_targetAreas = {}
+_targetCRSs = {}
+
+# netCDF4/HDF5 isn't thread safe, so all the reads in the tiled resampling
+#   threads have to take turns
+_ncLock = threading.Lock()
+
+
+def readNC(filename, memory=None):
     """
+    If 'memory' is given it's the contents of the file (bytes), which are
+    read directly instead of the file; filename is then just a label.
     """
     print("Reading: %s" % (filename))
-    dat = Dataset(filename)
+    dat = Dataset(filename, memory=memory)
 
     return dat
 
 
-def G16_ABI_L2_ProjDef(nc):
+def G16_ABI_L2_ProjDef(nc, readData=True):
     """
+    If 'readData' is False, only the grid definition is returned (imgdata
+    will be None) so the image data can be read later with readCMI().
     """
     # The key is that the GOES-16 data are in a geostationary projection
     #   and those details are available in:
@@ -52,7 +72,10 @@ def G16_ABI_L2_ProjDef(nc):
         # print(proj_var)
 
         # Isolate just the image data for others to use
-        imgdata = nc['CMI'][:]
+        if readData is True:
+            imgdata = nc['CMI'][:]
+        else:
+            imgdata = None
 
         # Since scanning_angle (radians) = projection_coordinate / h,
         #   the projection coordinates are now easy to get.
@@ -63,11 +86,16 @@ def G16_ABI_L2_ProjDef(nc):
         semi_major = proj_var.semi_major_axis
         semi_minor = proj_var.semi_minor_axis
 
-        x = (nc.variables['x'][:])*satH
-        y = (nc.variables['y'][:])*satH
+        # The fixed grid coordinates are monotonic, so the ends are all
+        #   we need to read to get the extents
+        xvar = nc.variables['x']
+        yvar = nc.variables['y']
+
+        nx = xvar.shape[0]
+        ny = yvar.shape[0]
 
-        nx = len(x)
-        ny = len(y)
+        x = np.array([xvar[0], xvar[nx-1]])*satH
+        y = np.array([yvar[0], yvar[ny-1]])*satH
 
         min_x = x.min()
         max_x = x.max()
@@ -107,8 +135,383 @@ def G16_ABI_L2_ProjDef(nc):
     return old_grid, imgdata
 
 
-def crop_image(filename, clat, clon, pCoeff=None):
-    dat = readNC(filename)
+def readCMI(nc, window=None, raw=False):
+    """
+    Read the CMI image data, or just the hyperslab of it given by
+    window = (row0, row1, col0, col1) if it's not None.
+
+    If 'raw' is True, the packed counts are returned as a plain uint16
+    array instead of unpacking them into a masked float array; see
+    cmiPacking() for what's needed to make sense of them.
+    """
+    var = nc['CMI']
+    try:
+        if raw is True:
+            var.set_auto_maskandscale(False)
+
+        if window is None:
+            imgdata = var[:]
+        else:
+            r0, r1, c0, c1 = [int(w) for w in window]
+            imgdata = var[r0:r1, c0:c1]
+
+        if raw is True:
+            # Stored as shorts with _Unsigned = "true"
+            imgdata = np.asarray(imgdata).view(np.uint16)
+    except (RuntimeError, IndexError) as err:
+        imgdata = None
+        print(str(err))
+    finally:
+        var.set_auto_maskandscale(True)
+
+    return imgdata
+
+
+def cmiPacking(nc):
+    """
+    Everything needed to turn raw CMI counts into actual values:
+        value = count*scale + offset
+    with 'fill' and anything outside of 'valid' (both in uint16 counts)
+    being bad/missing data.
+    """
+    var = nc['CMI']
+
+    fill = np.array(var._FillValue, dtype=var.dtype).view(np.uint16)
+    valid = np.array(var.valid_range, dtype=var.dtype).view(np.uint16)
+
+    pack = {'scale': float(var.scale_factor),
+            'offset': float(var.add_offset),
+            'fill': int(fill),
+            'valid': (int(valid[0]), int(valid[1]))}
+
+    return pack
+
+
+def getCountsLUT(cmap, pack, vmin=160., vmax=330.):
+    """
+    Lookup table that takes raw CMI counts straight to RGBA colors using
+    the given colormap and the packing info from cmiPacking().  It's only
+    made once for each combination of those.
+    """
+    key = (cmap.name, cmap.N, vmin, vmax, tuple(sorted(pack.items())))
+
+    if key not in _countLUTs:
+        lut = com.raster.colormapLUT(cmap)
+        plut = com.raster.packedLUT(lut, pack['scale'], pack['offset'],
+                                    vmin, vmax, fill=pack['fill'],
+                                    validRange=pack['valid'])
+        _countLUTs.update({key: plut})
+
+    return _countLUTs[key]
+
+
+def coeffWindow(valid_input_index, shape):
+    """
+    Find the bounding box (row0, row1, col0, col1) of all the source pixels
+    that are actually used by the resampling, given the full source shape.
+
+    Also returns valid_input_index cut down to just that box; since every
+    used pixel is inside it, and the order of them doesn't change, the
+    index_array still lines up without any changes.
+    """
+    used = np.asarray(valid_input_index).reshape(shape)
+
+    rows = np.flatnonzero(used.any(axis=1))
+    cols = np.flatnonzero(used.any(axis=0))
+
+    if rows.size == 0:
+        # Nothing overlaps, which is weird, but just use the whole thing
+        window = np.array([0, shape[0], 0, shape[1]])
+    else:
+        window = np.array([rows[0], rows[-1] + 1, cols[0], cols[-1] + 1])
+
+    winindex = used[window[0]:window[1], window[2]:window[3]].ravel()
+
+    return window, winindex
+
+
+def areaFingerprint(area):
+    """
+    Pull out the bits of a pyresample AreaDefinition that define it, in a
+    form that's stable enough to hash for the coefficient cache.
+    """
+    proj = sorted([(str(k), str(v)) for k, v in area.proj_dict.items()])
+    extent = tuple([round(float(e), 3) for e in area.area_extent])
+
+    return proj, area.width, area.height, extent
+
+
+def getCoeffs(old_grid, area_def, pCoeff=None, pKey=None, cachedir=None,
+              radius=5000., engine='kdtree'):
+    """
+    Get the resampling coefficients (neighbour info) that take old_grid to
+    area_def.  In order of preference they're:
+        reused from pCoeff if pKey says they're for these same grids,
+        loaded (memory-mapped) from the on-disk cache in cachedir,
+        or actually calculated (and then stuffed into the cache).
+
+    'engine' picks how they're calculated:
+        'kdtree' uses pyresample's KD-tree search (the original way)
+        'geos' calculates the source pixels directly (see goes.geos),
+               which is much faster and needs far less memory
+    Both pick the same (nearest) source pixel for every target pixel.
+
+    Returns the coefficients and the fingerprint key they belong to.
+    """
+    # pCoeff: valid_input_index, valid_output_index,
+    #         index_array, distance_array,
+    #         window, window_input_index
+    # The last two are from coeffWindow(), for reading just the needed
+    #   part of the source image (see readCMI)
+    cnames = ['valid_input_index', 'valid_output_index',
+              'index_array', 'distance_array',
+              'window', 'window_input_index']
+
+    key = com.cache.fingerprint(areaFingerprint(old_grid),
+                                areaFingerprint(area_def), radius, engine)
+
+    if pCoeff is not None and pKey == key:
+        # The grids haven't changed since last time, so just use them again
+        print("Reusing transformation coefficients!")
+        return pCoeff, key
+
+    cached = com.cache.loadArrays(cachedir, key, cnames)
+    if cached is not None:
+        print("Loaded cached transformation coefficients %s" % (key))
+        pCoeff = tuple([cached[c] for c in cnames])
+    elif engine == 'geos':
+        print("Calculating geostationary pixel indices...")
+        pCoeff = geos.get_neighbour_info(old_grid, area_def, radius)
+    else:
+        # SC2000 FTW
+        print("Reticulating splines...")
+
+        # NOTE: On 20181120, when nprocs > 1 it never returned. Bug? Dunno.
+        pCoeff = pr.kd_tree.get_neighbour_info(old_grid, area_def, radius,
+                                               neighbours=1, epsilon=0.,
+                                               nprocs=1)
+
+    if cached is None:
+        window, winindex = coeffWindow(pCoeff[0], old_grid.shape)
+        pCoeff = tuple(pCoeff) + (window, winindex)
+
+        if cachedir is not None:
+            com.cache.saveArrays(cachedir, key, dict(zip(cnames, pCoeff)))
+
+    return pCoeff, key
+
+
+def getTargetArea(clat, clon, radius=200., gridRes=18./60./60.,
+                  proj='lcc', cachedir=None):
+    """
+    The output grid centered on clat, clon and covering radius (statute
+    miles, see common.maps.set_plot_extent) at about gridRes degrees,
+    in the given projection.  It's made once per process and, if cachedir
+    isn't None, stored there too so restarts (and pool workers) can
+    skip making it at all.
+    """
+    key = com.cache.fingerprint('targetarea', clat, clon, radius, gridRes,
+                                proj)
+
+    if key in _targetAreas:
+        return _targetAreas[key]
+
+    params = com.cache.loadParams(cachedir, key)
+    if params is None:
+        pExt = com.maps.set_plot_extent(clat, clon, radius=radius)
+        latMin, latMax, lonMin, lonMax = pExt
+
+        # Create a grid at at the specified resolution; original default was
+        #   0.005 degrees or 18 arcseconds resolution, though I don't
+        #   remember why
+        lats = np.arange(latMin, latMax, gridRes)
+        lons = np.arange(lonMin, lonMax, gridRes)
+        lons, lats = np.meshgrid(lons, lats)
+
+        swath_def = pr.geometry.SwathDefinition(lons=lons, lats=lats)
+
+        # LCC is Lambert conformal conic projection
+        area_def = swath_def.compute_optimal_bb_area({'proj': proj,
+                                                      'lon_0': clon,
+                                                      'lat_0': clat,
+                                                      'lat_1': clat,
+                                                      'lat_2': clat})
+
+        params = {'area_id': area_def.area_id,
+                  'description': area_def.description,
+                  'proj_id': area_def.proj_id,
+                  'proj_dict': dict(area_def.proj_dict),
+                  'width': int(area_def.width),
+                  'height': int(area_def.height),
+                  'extent': [float(e) for e in area_def.area_extent]}
+        if cachedir is not None:
+            com.cache.saveParams(cachedir, key, params)
+    else:
+        print("Loaded cached target grid %s" % (key))
+        area_def = pr.geometry.AreaDefinition(params['area_id'],
+                                              params['description'],
+                                              params['proj_id'],
+                                              params['proj_dict'],
+                                              params['width'],
+                                              params['height'],
+                                              tuple(params['extent']))
+
+    _targetAreas.update({key: area_def})
+
+    return area_def
+
+
+def getTargetCRS(area_def):
+    """
+    area_def.to_cartopy_crs(), but only done once for each grid.
+    """
+    key = com.cache.fingerprint(areaFingerprint(area_def))
+    if key not in _targetCRSs:
+        _targetCRSs.update({key: area_def.to_cartopy_crs()})
+
+    return _targetCRSs[key]
+
+
+def tileAreas(area_def, tilesize):
+    """
+    Split area_def up into tiles of (at most) tilesize x tilesize pixels.
+    Returns a list of ((row0, row1, col0, col1), tile AreaDefinition).
+    """
+    ext = area_def.area_extent
+    dx = (ext[2] - ext[0])/area_def.width
+    dy = (ext[3] - ext[1])/area_def.height
+
+    tiles = []
+    for r0 in range(0, area_def.height, tilesize):
+        r1 = min(r0 + tilesize, area_def.height)
+        for c0 in range(0, area_def.width, tilesize):
+            c1 = min(c0 + tilesize, area_def.width)
+
+            # Rows go from the top (max y) down
+            text = (ext[0] + c0*dx, ext[3] - r1*dy,
+                    ext[0] + c1*dx, ext[3] - r0*dy)
+            tdef = pr.geometry.AreaDefinition(area_def.area_id,
+                                              area_def.description,
+                                              area_def.proj_id,
+                                              area_def.proj_dict,
+                                              c1 - c0, r1 - r0, text)
+            tiles.append(((r0, r1, c0, c1), tdef))
+
+    return tiles
+
+
+def getTileCoeffs(old_grid, tile_def, cachedir=None, radius=5000.):
+    """
+    Windowed resampling coefficients for a single tile; see
+    geos.get_window_info.  Cached on disk just like getCoeffs().
+
+    Returns window, window_input_index, valid_output_index,
+    index_array, and distance_array.
+    """
+    cnames = ['window', 'window_input_index', 'valid_output_index',
+              'index_array', 'distance_array']
+
+    key = com.cache.fingerprint(areaFingerprint(old_grid),
+                                areaFingerprint(tile_def), radius,
+                                'geoswindow')
+
+    cached = com.cache.loadArrays(cachedir, key, cnames)
+    if cached is not None:
+        tCoeff = tuple([cached[c] for c in cnames])
+    else:
+        tCoeff = geos.get_window_info(old_grid, tile_def, radius)
+        if cachedir is not None:
+            com.cache.saveArrays(cachedir, key, dict(zip(cnames, tCoeff)))
+
+    return tCoeff
+
+
+def resampleTiled(dat, old_grid, area_def, tCoeffs=None, cachedir=None,
+                  tilesize=512, nthreads=4, rawcounts=False, fillval=None):
+    """
+    Resample the CMI data in dat onto area_def one tile at a time, reading
+    only the hyperslab of the source that each tile actually needs.
+    Tiles are done on a pool of nthreads threads; only the reads have to
+    take turns (see _ncLock), so peak memory is about nthreads tiles'
+    worth of source data plus the output, no matter the band resolution.
+
+    'tCoeffs' is the list of per-tile coefficients from a previous call
+    (for the same grids!), or None to get them via getTileCoeffs().
+
+    Returns the resampled data (None if any read failed) and the list of
+    per-tile coefficients.
+    """
+    tiles = tileAreas(area_def, tilesize)
+    if tCoeffs is None:
+        tCoeffs = [None]*len(tiles)
+
+    def resampleTile(args):
+        (tslice, tdef), tCoeff = args
+        if tCoeff is None:
+            tCoeff = getTileCoeffs(old_grid, tdef, cachedir=cachedir)
+
+        window = tCoeff[0]
+        if window[1] == window[0]:
+            # Nothing in this tile is on the source grid at all
+            return tslice, None, tCoeff, True
+
+        with _ncLock:
+            imgdata = readCMI(dat, window=window, raw=rawcounts)
+
+        if imgdata is None:
+            return tslice, None, tCoeff, False
+
+        # Flattened, since a window just one column wide, (n, 1), would
+        #   otherwise be taken as n pixels with one channel each
+        tdat = pr.kd_tree.get_sample_from_neighbour_info('nn', tdef.shape,
+                                                         imgdata.ravel(),
+                                                         tCoeff[1],
+                                                         tCoeff[2],
+                                                         tCoeff[3],
+                                                         fill_value=fillval)
+        return tslice, tdat, tCoeff, True
+
+    if rawcounts is True:
+        pData = np.full(area_def.shape, fillval, dtype=np.uint16)
+    else:
+        pData = np.ma.masked_all(area_def.shape, dtype=np.float32)
+
+    print("Resampling %d tiles with %d threads..." % (len(tiles), nthreads))
+    good = True
+    newCoeffs = []
+    with ThreadPoolExecutor(max_workers=nthreads) as pool:
+        for tslice, tdat, tCoeff, ok in pool.map(resampleTile,
+                                                 zip(tiles, tCoeffs)):
+            newCoeffs.append(tCoeff)
+            good &= ok
+            if tdat is not None:
+                r0, r1, c0, c1 = tslice
+                pData[r0:r1, c0:c1] = tdat
+
+    if good is False:
+        pData = None
+
+    return pData, newCoeffs
+
+
+def crop_image(filename, clat, clon, pCoeff=None, pKey=None, cachedir=None,
+               engine='kdtree', rawcounts=False, tilesize=None, memory=None):
+    """
+    'memory' is the contents of the file, if it's already been read into
+    memory (see readNC).
+
+    If 'rawcounts' is True, the returned data are the raw uint16 counts
+    (see readCMI) and 'pack' is the packing info needed to use them (see
+    cmiPacking); otherwise 'pack' is None and the data are the usual
+    unpacked masked array.
+
+    If 'tilesize' is not None, the resampling is done in tiles of that
+    many (target) pixels on a side; see resampleTiled().  That's meant for
+    the 0.5 km band 2, which is far too big to do in one shot.  Tiles
+    always use the 'geos' engine, and pCoeff is then the list of
+    per-tile coefficients instead.
+    """
+    dat = readNC(filename, memory=memory)
 
     # Pull out the channel/band and other identifiers
     chan = dat.variables['band_id'][0]
@@ -127,8 +530,9 @@ def crop_image(filename, clat, clon, pCoeff=None):
     line2 = "Band %02d  %s" % (chan, tendstr)
     line2 = line2.upper()
 
-    # Parse/grab the existing projection information
-    old_grid, imgdata = G16_ABI_L2_ProjDef(dat)
+    # Parse/grab the existing projection information; the image data
+    #   itself is read below once we know which part of it we need
+    old_grid, _ = G16_ABI_L2_ProjDef(dat, readData=False)
 
     # latMin, latMax, lonMin, lonMax = com.maps.set_plot_extent(clat, clon,
     #                                                           fudge=0.093)
@@ -136,51 +540,69 @@ def crop_image(filename, clat, clon, pCoeff=None):
     latMin, latMax, lonMin, lonMax = com.maps.set_plot_extent(clat, clon)
     plotExtents = (latMin, latMax, lonMin, lonMax)
 
-    # Create a grid at at the specified resolution; original default was
-    #   0.005 degrees or 18 arcseconds resolution, though I don't remember why
-    gridRes = 18./60./60.
-    lats = np.arange(latMin, latMax, gridRes)
-    lons = np.arange(lonMin, lonMax, gridRes)
-    lons, lats = np.meshgrid(lons, lats)
-
-    swath_def = pr.geometry.SwathDefinition(lons=lons, lats=lats)
-
-    # LCC is Lambert conformal conic projection
-    area_def = swath_def.compute_optimal_bb_area({'proj': 'lcc',
-                                                  'lon_0': clon,
-                                                  'lat_0': clat,
-                                                  'lat_1': clat,
-                                                  'lat_2': clat})
-
-    # If we don't have projection coefficients already, calculate 'em!
-    if pCoeff is None and old_grid is not None:
-        # SC2000 FTW
-        print("Reticulating splines...")
+    # The output grid is the same for every frame, so it's only actually
+    #   made once; see getTargetArea()
+    area_def = getTargetArea(clat, clon, cachedir=cachedir)
 
-        # NOTE: On 20181120, when nprocs > 1 it never returned. Bug? Dunno.
-        # pCoeff: valid_input_index, valid_output_index,
-        #         index_array, distance_array
-        pCoeff = pr.kd_tree.get_neighbour_info(old_grid, area_def, 5000.,
-                                               neighbours=1, epsilon=0.,
-                                               nprocs=1)
-        # print('Old projection information: {}'.format(old_grid))
-    elif old_grid is None:
+    if old_grid is not None and tilesize is not None:
+        if rawcounts is True:
+            pack = cmiPacking(dat)
+            fillval = pack['fill']
+        else:
+            pack = None
+            fillval = None
+
+        tKey = com.cache.fingerprint(areaFingerprint(old_grid),
+                                     areaFingerprint(area_def), tilesize)
+        if pKey != tKey:
+            pCoeff = None
+
+        pData, pCoeff = resampleTiled(dat, old_grid, area_def,
+                                      tCoeffs=pCoeff, cachedir=cachedir,
+                                      tilesize=tilesize, rawcounts=rawcounts,
+                                      fillval=fillval)
+        if pData is None:
+            print("Image data not found! Bad file?")
+
+        dat.close()
+        return (area_def, pData, pack, pCoeff, tKey,
+                tend, line1, line2, plotExtents)
+
+    # Get the projection coefficients; they're only recalculated if the
+    #   source or target grids actually changed, since the fingerprint
+    #   of both is what they're keyed on.
+    if old_grid is not None:
+        pCoeff, pKey = getCoeffs(old_grid, area_def, pCoeff=pCoeff,
+                                 pKey=pKey, cachedir=cachedir,
+                                 engine=engine)
+    else:
         print("Existing grid information not found! Bad file?")
         pCoeff = None
+        pKey = None
+
+    # Only read the window of the source image that actually lands in the
+    #   target area, and use the index rebased to that window to match
+    if pCoeff is not None:
+        imgdata = readCMI(dat, window=pCoeff[4], raw=rawcounts)
     else:
-        # NOTE: I'm not rechecking anything, I'm just assuming it's all good
-        #   and reusing it.  It'll probably look messed up in some obvious
-        #   way if that ever becomes a problem.
-        print("Reusing transformation coefficients!")
+        imgdata = None
+
+    if imgdata is not None and rawcounts is True:
+        pack = cmiPacking(dat)
+        fillval = pack['fill']
+    else:
+        pack = None
+        fillval = None
 
     # Now that we're guaranteed to have the projection details, actually do it
     if imgdata is not None:
         pData = pr.kd_tree.get_sample_from_neighbour_info('nn',
                                                           area_def.shape,
                                                           imgdata,
-                                                          pCoeff[0],
+                                                          pCoeff[5],
                                                           pCoeff[1],
-                                                          pCoeff[2])
+                                                          pCoeff[2],
+                                                          fill_value=fillval)
     else:
         print("Image data not found! Bad file?")
         pData = None
@@ -192,7 +614,8 @@ def crop_image(filename, clat, clon, pCoeff=None):
 
     print('Old projection information: {}'.format(old_grid))
 
-    return area_def, pData, pCoeff, tend, line1, line2, plotExtents
+    return (area_def, pData, pack, pCoeff, pKey,
+            tend, line1, line2, plotExtents)
 
 
 def getCMap(vmin=160, vmax=330, trans=None):
@@ -230,8 +653,357 @@ def getCMap(vmin=160, vmax=330, trans=None):
     return newcmp
 
 
+# Colormap name, vmin, vmax for the bands that don't use the custom IR
+#   colormap from getCMap().  Visible/near-IR bands are reflectance factor,
+#   the rest are brightness temperatures in Kelvin.
+bandStyles = {1: ('Greys_r', 0., 1.),
+              2: ('Greys_r', 0., 1.),
+              3: ('Greys_r', 0., 1.),
+              7: ('Greys', 200., 350.),
+              8: ('BrBG_r', 190., 260.),
+              9: ('BrBG_r', 190., 270.),
+              10: ('BrBG_r', 190., 280.)}
+
+
+def getBandCMap(band):
+    """
+    Returns the colormap, vmin, and vmax to use for the given ABI band.
+    """
+    if band in bandStyles:
+        cname, vmin, vmax = bandStyles[band]
+        cmap = cm.get_cmap(cname, 256)
+    else:
+        vmin, vmax = 160., 330.
+        cmap = getCMap(vmin=vmin, vmax=vmax)
+
+    return cmap, vmin, vmax
+
+
+def rasterFrame(ngrid, ndat, l1, l2, outpname, roads=None, counties=None,
+                cmap=None, cachedir=None, vmin=160., vmax=330.):
+    """
+    Make the same frame as the matplotlib path in renderFrame, but build
+    it directly as an image (see common.raster) instead of with a figure.
+    """
+    crs = getTargetCRS(ngrid)
+    layer = com.maps.getBasemapLayer(crs, crs.bounds,
+                                     figsize=(5.80, 5.80), dpi=100,
+                                     counties=counties, roads=roads,
+                                     cachedir=cachedir)
+
+    # Already colored if it came from the raw counts
+    if ndat.ndim == 3:
+        rgba = ndat
+    else:
+        rgba = com.raster.applyColormap(ndat, com.raster.colormapLUT(cmap),
+                                        vmin, vmax)
+
+    img = com.raster.composeFrame(rgba, layer,
+                                  labels=[(l1, 0.990), (l2, 0.960)])
+    com.raster.savePNG(img, outpname)
+    img.close()
+
+
+def decodeFrame(infile, cLat, cLon, cmap=None, pCoeff=None, pKey=None,
+                cachedir=None, engine='kdtree', rawcounts=False,
+                vmin=160., vmax=330., tilesize=None, memory=None):
+    """
+    The read and reproject half of renderFrame(); the arguments are the
+    same as there, plus 'memory' (see crop_image).  Nothing in here
+    touches matplotlib, so it's fine to do in a different thread than
+    drawFrame().
+
+    Returns what drawFrame() needs (the new grid, the data, and the two
+    label lines), the resampling coefficients and their key, and the
+    reason the frame can't be made (a string) or None if it can.
+    """
+    # This is the function that actually handles the reprojection
+    #   as well as actually reading in the original file.
+    #   The coefficients are only recalculated when the source
+    #   or target grids change; see getCoeffs()
+    reason = None
+    try:
+        cropped = crop_image(infile, cLat, cLon,
+                             pCoeff=pCoeff, pKey=pKey,
+                             cachedir=cachedir, engine=engine,
+                             rawcounts=rawcounts, tilesize=tilesize,
+                             memory=memory)
+        ngrid, ndat, pack, pCoeff, pKey, tend, l1, l2, pExt = cropped
+    except (OSError, RuntimeError, KeyError, AttributeError,
+            ValueError, IndexError) as err:
+        # Truncated or otherwise broken files usually blow up in here
+        print("%s is likely a bad file!" % (infile))
+        print(str(err))
+        reason = "%s: %s" % (type(err).__name__, str(err))
+        ngrid, ndat, pack, l1, l2 = None, None, None, None, None
+
+    # Straight from counts to colors; imshow() is fine with RGBA too
+    if ndat is not None and pack is not None:
+        ndat = np.take(getCountsLUT(cmap, pack, vmin=vmin, vmax=vmax),
+                       ndat, axis=0)
+
+    if ndat is None and reason is None:
+        reason = "No usable image data"
+
+    return (ngrid, ndat, l1, l2), pCoeff, pKey, reason
+
+
+def drawFrame(decoded, outpname, roads=None, counties=None, cmap=None,
+              cachedir=None, basemap='vector', renderer='matplotlib',
+              vmin=160., vmax=330.):
+    """
+    The plotting half of renderFrame(), taking what decodeFrame() gave
+    back; the rest of the arguments are the same as there.
+    """
+    ngrid, ndat, l1, l2 = decoded
+
+    print('NEW projection information: {}'.format(ngrid))
+
+    if ndat is not None and renderer == 'raster':
+        rasterFrame(ngrid, ndat, l1, l2, outpname,
+                    roads=roads, counties=counties, cmap=cmap,
+                    cachedir=cachedir, vmin=vmin, vmax=vmax)
+        crs = None
+        fig = None
+        ax = None
+    elif ndat is not None:
+        # Get the new projection/transformation info for the plot axes;
+        #   it's the same for every frame so it's only made once
+        crs = getTargetCRS(ngrid)
+
+        # Get the proper plot extents so we have no whitespace
+        prlon = (crs.x_limits[1] - crs.x_limits[0])
+        prlat = (crs.y_limits[1] - crs.y_limits[0])
+
+        # Natural image width/height
+        paspect = prlon/prlat
+
+        # figsize = (7., np.round(7./paspect, decimals=2))
+        figsize = (5.80, 5.80)
+
+        # print(prlon, prlat, paspect)
+        # print(figsize)
+
+        # Grab this before making our figure, since it might need to
+        #   make (and close) its own figure to render the layer
+        if basemap == 'raster':
+            layer = com.maps.getBasemapLayer(crs, crs.bounds,
+                                             figsize=figsize, dpi=100,
+                                             counties=counties, roads=roads,
+                                             cachedir=cachedir)
+        else:
+            layer = None
+
+        # Figure creation
+        fig = plt.figure(figsize=figsize, dpi=100)
+
+        # Needed to remove any whitespace/padding around the imshow()
+        plt.subplots_adjust(left=0., right=1., top=1., bottom=0.)
+
+        # Tell matplotlib we're using a map projection so cartopy
+        #   takes over and overloades Axes() with GeoAxes()
+        ax = plt.axes(projection=crs, facecolor='#262629')
+
+        # This actually sets the background map color so it's darker
+        #   when there's no data or missing data.
+        #ax.background_patch.set_facecolor('#262629')
+
+        # Some custom stuff
+        if layer is None:
+            ax = com.maps.add_map_features(ax, counties=counties,
+                                           roads=roads)
+            ax = com.maps.add_AZObs(ax)
+
+        # Need to replace crs.bounds with equivalent if I want to
+        #   define the same LCC for all of these things!
+
+        plt.imshow(ndat, transform=crs, extent=crs.bounds,
+                   origin='upper', vmin=vmin, vmax=vmax,
+                   interpolation='none', cmap=cmap)
+
+        # Map features go on top of the data, like they would be by default
+        if layer is not None:
+            ax = com.maps.add_basemap_layer(ax, layer)
+
+        # nextent = (ngrid.area_extent[0], ngrid.area_extent[2],
+        #            ngrid.area_extent[1], ngrid.area_extent[3])
+        # plt.imshow(ndat, transform=crs, extent=pExt,
+        #            origin='upper', vmin=160., vmax=330.,
+        #            interpolation='none', cmap=cmap)
+
+        # Black background for top label text
+        #   NOTE: Z order is important! Text should be > than trect
+        trect = mpatches.Rectangle((0.0, 0.940), width=1.0,
+                                   height=0.060, edgecolor=None,
+                                   facecolor='black',
+                                   fill=True, alpha=1.0, zorder=100,
+                                   transform=ax.transAxes)
+        ax.add_patch(trect)
+
+        # Line 1
+        plt.annotate(l1, (0.5, 0.990), xycoords='axes fraction',
+                     fontfamily='monospace',
+                     horizontalalignment='center',
+                     verticalalignment='center',
+                     color='white', fontweight='bold', zorder=200)
+        # Line 2
+        plt.annotate(l2, (0.5, 0.960), xycoords='axes fraction',
+                     fontfamily='monospace',
+                     horizontalalignment='center',
+                     verticalalignment='center',
+                     color='white', fontweight='bold', zorder=200)
+
+        # Useful for testing getCmap changes
+        # plt.colorbar()
+
+        plt.savefig(outpname, dpi=100, facecolor='black')
+        print("Saved as %s." % (outpname))
+        plt.close()
+    else:
+        print("Image data not found, skipping file.")
+        crs = None
+        fig = None
+        ax = None
+        l1 = None
+        l2 = None
+        ngrid = None
+        ndat = None
+
+    # Leak killing. Not sure which one of these is the culprit
+    #   ... but testing implies it's one (or more) or these.
+    del crs, fig, ax, l1, l2, ngrid, ndat, decoded
+
+
+def renderFrame(infile, outpname, cLat, cLon, roads=None, counties=None,
+                cmap=None, pCoeff=None, pKey=None, cachedir=None,
+                engine='kdtree', basemap='vector', renderer='matplotlib',
+                rawcounts=False, vmin=160., vmax=330., tilesize=None):
+    """
+    Read, reproject, and plot a single GOES file into outpname, with the
+    data scaled to the colormap between vmin and vmax.
+
+    'basemap' is either 'vector', which draws all the map features every
+    time, or 'raster' which pastes a pre-rendered (and cached) layer of
+    them on top instead; see common.maps.getBasemapLayer.
+
+    'renderer' is either 'matplotlib' (cartopy figure, the original way)
+    or 'raster', which skips matplotlib entirely and is much faster; see
+    rasterFrame().  The raster renderer always uses the raster basemap.
+
+    If 'rawcounts' is True, the raw packed CMI counts are read and then
+    colored with a single lookup (see getCountsLUT) into an RGBA image,
+    skipping the unpacking to floats and the masked array entirely.
+
+    'tilesize' turns on the tiled resampling; see crop_image().
+
+    Returns the (possibly new) resampling coefficients and their key so
+    they can be handed right back in for the next frame, and the reason
+    the frame couldn't be made (a string), or None if it was.
+    """
+    decoded, pCoeff, pKey, reason = decodeFrame(infile, cLat, cLon,
+                                                cmap=cmap, pCoeff=pCoeff,
+                                                pKey=pKey, cachedir=cachedir,
+                                                engine=engine,
+                                                rawcounts=rawcounts,
+                                                vmin=vmin, vmax=vmax,
+                                                tilesize=tilesize)
+
+    drawFrame(decoded, outpname, roads=roads, counties=counties, cmap=cmap,
+              cachedir=cachedir, basemap=basemap, renderer=renderer,
+              vmin=vmin, vmax=vmax)
+
+    return pCoeff, pKey, reason
+
+
+# Per-process state for the rendering pool workers; filled in once per
+#   worker by _initRenderWorker() so the big stuff isn't shipped per frame
+_workerState = {}
+
+
+def _initRenderWorker(state):
+    """
+    """
+    plt.switch_backend("Agg")
+    _workerState.update(state)
+
+    # The pool is just the backfill, so it shouldn't get in the way of
+    #   whatever the newest frame is doing
+    if state['nice'] > 0:
+        os.nice(state['nice'])
+
+
+def _renderWorker(job):
+    """
+    """
+    infile, outpname = job
+    rendered = renderFrame(infile, outpname,
+                           _workerState['cLat'], _workerState['cLon'],
+                           roads=_workerState['roads'],
+                           counties=_workerState['counties'],
+                           cmap=_workerState['cmap'],
+                           pCoeff=_workerState['pCoeff'],
+                           pKey=_workerState['pKey'],
+                           cachedir=_workerState['cachedir'],
+                           engine=_workerState['engine'],
+                           basemap=_workerState['basemap'],
+                           renderer=_workerState['renderer'],
+                           rawcounts=_workerState['rawcounts'],
+                           vmin=_workerState['vmin'],
+                           vmax=_workerState['vmax'],
+                           tilesize=_workerState['tilesize'])
+    pCoeff, pKey, reason = rendered
+
+    # Hang on to them in case the grid changed underneath us
+    _workerState.update({'pCoeff': pCoeff, 'pKey': pKey})
+
+    return outpname, reason
+
+
 def makePlots(inloc, outloc, mapCenter, roads=None, counties=None,
-              cmap=None, forceRegen=False):
+              cmap=None, forceRegen=False, cachedir=None, nprocs=1,
+              engine='kdtree', basemap='vector', renderer='matplotlib',
+              rawcounts=False, band=None, vmin=160., vmax=330.,
+              tilesize=None, manifest=None, quarantine=None,
+              newestFirst=False, publish=None, backfillNice=0):
+    """
+    'band' selects just the input files for that ABI band (by the _CXX
+    at the end of the filename); if None, every .nc file is used.
+    'cmap', 'vmin', and 'vmax' should then match that band, see
+    getBandCMap(); the defaults are the ones for band 13.
+
+    'cachedir' is where the resampling coefficients are cached on disk so
+    they survive a restart; if None, they're only kept for this call.
+
+    'nprocs' is the number of worker processes to render frames with;
+    1 is the old (serial) behavior.  With more than one, the first frame
+    is still done here to get the resampling coefficients, and the
+    rest are handed out to a pool of workers that each get the map
+    and coefficient state once, up front.  Output is the same either way.
+
+    'engine' is the resampling engine to use; see getCoeffs().
+
+    'basemap' is how the map features are drawn, and 'renderer' is how
+    the frames themselves are made; see renderFrame() for both.
+    Ditto for 'rawcounts', which colors the raw data with a lookup table.
+
+    'tilesize' turns on tiled resampling, which keeps the memory use down
+    for the high resolution bands; see crop_image().
+
+    'manifest' is an open common.manifest database; if given (along with
+    'band'), it says which frames still need plotting instead of looking
+    at what's in inloc and outloc, and each new frame is marked as
+    rendered in it.  Frames that can't be made are marked as failed, so
+    they're downloaded again once and then skipped (see
+    common.manifest.markFailed) with the bad file moved to 'quarantine'.
+
+    If 'newestFirst' is True, the newest frame is done first and, if it's
+    newer than everything already done, handed straight to 'publish'
+    (a function that takes the output filename, like a wrapper around
+    common.utils.publishLatest) so the "latest" image is fresh right away
+    even with a big backlog.  The rest is then backfilled newest to
+    oldest; with nprocs > 1, the pool doing that is niced by
+    'backfillNice' so it stays out of the way of everything else.
+    """
 
     # Warning, you may explode
     #  https://matplotlib.org/api/pyplot_api.html#matplotlib.pyplot.switch_backend
@@ -240,7 +1012,20 @@ def makePlots(inloc, outloc, mapCenter, roads=None, counties=None,
     cLon = mapCenter[0]
     cLat = mapCenter[1]
 
-    flist = sorted(glob.glob(inloc + "*.nc"))
+    # The manifest already knows exactly what's left to do, so there's
+    #   no need to look at (or for) any files at all
+    todo = []
+    newest = None
+    if manifest is not None and band is not None:
+        flist = []
+        todo = com.manifest.toRender(manifest, "C%02d" % (band),
+                                     force=forceRegen,
+                                     newestFirst=newestFirst)
+        newest = com.manifest.newestRendered(manifest, "C%02d" % (band))
+    elif band is None:
+        flist = sorted(glob.glob(inloc + "*.nc"))
+    else:
+        flist = sorted(glob.glob(inloc + "*_C%02d.nc" % (band)))
 
     if cmap is None:
         # Construct/grab the color map.
@@ -249,11 +1034,8 @@ def makePlots(inloc, outloc, mapCenter, roads=None, counties=None,
         #   what you're doing.
         cmap = getCMap(vmin=160., vmax=330.)
 
-    # i is the number-of-images processed counter
-    i = 0
-    tend = None
-    tprev = None
-
+    # Figure out what actually needs doing before doing any of it
+    jobs = []
     for each in flist:
         # Remember that the [:-3] on the basename trims off the '.nc' extension
         outpname = "%s/%s.png" % (outloc, os.path.basename(each)[:-3])
@@ -272,123 +1054,257 @@ def makePlots(inloc, outloc, mapCenter, roads=None, counties=None,
                 save = True
 
         if save is True:
-            # If it's our first time through, we definitely need to recalculate
-            #   the projection/transformation stuff
-            if i == 0:
-                pCoeff = None
-            else:
-                # Check to see if we've rolled over in day, and if so,
-                #   force recalculation of the transformation/projection stuff
-                if tend.day != tprev.day:
-                    pCoeff = None
-
-            # This is the function that actually handles the reprojection
-            #   as well as actually reading in the original file
-            ngrid, ndat, pCoeff, tend, l1, l2, pExt = crop_image(each,
-                                                                 cLat,
-                                                                 cLon,
-                                                                 pCoeff=pCoeff)
-
-            print('NEW projection information: {}'.format(ngrid))
-
-            if ndat is not None:
-                # Set the projection info for the plot axes
-                crs = ccrs.LambertConformal(central_latitude=cLat,
-                                            central_longitude=cLon)
-
-                # Get the new projection/transformation info for the plot axes
-                crs = ngrid.to_cartopy_crs()
-
-                # Get the proper plot extents so we have no whitespace
-                prlon = (crs.x_limits[1] - crs.x_limits[0])
-                prlat = (crs.y_limits[1] - crs.y_limits[0])
-
-                # Natural image width/height
-                paspect = prlon/prlat
-
-                # figsize = (7., np.round(7./paspect, decimals=2))
-                figsize = (5.80, 5.80)
-
-                # print(prlon, prlat, paspect)
-                # print(figsize)
-
-                # Figure creation
-                fig = plt.figure(figsize=figsize, dpi=100)
-
-                # Needed to remove any whitespace/padding around the imshow()
-                plt.subplots_adjust(left=0., right=1., top=1., bottom=0.)
-
-                # Tell matplotlib we're using a map projection so cartopy
-                #   takes over and overloades Axes() with GeoAxes()
-                ax = plt.axes(projection=crs, facecolor='#262629')
-
-                # This actually sets the background map color so it's darker
-                #   when there's no data or missing data.
-                #ax.background_patch.set_facecolor('#262629')
-
-                # Some custom stuff
-                ax = com.maps.add_map_features(ax, counties=counties,
-                                               roads=roads)
-                ax = com.maps.add_AZObs(ax)
-
-                # Need to replace crs.bounds with equivalent if I want to
-                #   define the same LCC for all of these things!
-
-                plt.imshow(ndat, transform=crs, extent=crs.bounds,
-                           origin='upper', vmin=160., vmax=330.,
-                           interpolation='none', cmap=cmap)
-
-                # nextent = (ngrid.area_extent[0], ngrid.area_extent[2],
-                #            ngrid.area_extent[1], ngrid.area_extent[3])
-                # plt.imshow(ndat, transform=crs, extent=pExt,
-                #            origin='upper', vmin=160., vmax=330.,
-                #            interpolation='none', cmap=cmap)
-
-                # Black background for top label text
-                #   NOTE: Z order is important! Text should be > than trect
-                trect = mpatches.Rectangle((0.0, 0.940), width=1.0,
-                                           height=0.060, edgecolor=None,
-                                           facecolor='black',
-                                           fill=True, alpha=1.0, zorder=100,
-                                           transform=ax.transAxes)
-                ax.add_patch(trect)
-
-                # Line 1
-                plt.annotate(l1, (0.5, 0.990), xycoords='axes fraction',
-                             fontfamily='monospace',
-                             horizontalalignment='center',
-                             verticalalignment='center',
-                             color='white', fontweight='bold', zorder=200)
-                # Line 2
-                plt.annotate(l2, (0.5, 0.960), xycoords='axes fraction',
-                             fontfamily='monospace',
-                             horizontalalignment='center',
-                             verticalalignment='center',
-                             color='white', fontweight='bold', zorder=200)
-
-                # Useful for testing getCmap changes
-                # plt.colorbar()
-
-                plt.savefig(outpname, dpi=100, facecolor='black')
-                print("Saved as %s." % (outpname))
-                plt.close()
+            jobs.append((each, outpname))
+
+    for name, rawpath, _ in todo:
+        jobs.append((rawpath, "%s/%s.png" % (outloc, name)))
+
+    # The globbed ones are in time order, oldest first
+    if newestFirst is True and flist != []:
+        jobs.reverse()
+
+    # Only publish the first one if it's really the newest thing around;
+    #   it might be an old frame that's being retried, for instance
+    publishFirst = newestFirst is True and publish is not None
+    if len(todo) > 0 and newest is not None:
+        publishFirst &= todo[0][2] > newest
+    elif flist != [] and len(jobs) > 0:
+        # No manifest, so compare against what's already been drawn;
+        #   the names start with the time stamp so they sort in time order
+        if band is None:
+            pngs = glob.glob("%s/*.png" % (outloc))
+        else:
+            pngs = glob.glob("%s/*_C%02d.png" % (outloc, band))
+        if pngs != []:
+            newestpng = max(os.path.basename(p) for p in pngs)
+            publishFirst &= os.path.basename(jobs[0][1]) > newestpng
+
+    def finished(job, reason, first=False):
+        if first is True and publishFirst is True and reason is None:
+            print("Publishing the newest frame early...")
+            publish(job[1])
+
+        if manifest is not None:
+            name = os.path.basename(job[1])[:-4]
+            if reason is None:
+                com.manifest.markRendered(manifest, name, job[1])
             else:
-                print("Image data not found, skipping file.")
-                crs = None
-                fig = None
-                ax = None
-                l1 = None
-                l2 = None
-                ngrid = None
-                ndat = None
-
-            # Make sure to save the current timestamp for comparison the
-            #   next time through the loop!
-            tprev = tend
-            i += 1
+                com.manifest.markFailed(manifest, name, reason,
+                                        quarantine=quarantine)
 
-            # Leak killing. Not sure which one of these is the culprit
-            #   ... but testing implies it's one (or more) or these.
-            del crs, fig, ax, l1, l2, ngrid, ndat
+    # i is the number-of-images processed counter
+    i = 0
+    pCoeff = None
+    pKey = None
+
+    if nprocs > 1 and len(jobs) > 1:
+        # Do the first one here so the pool workers all start out with
+        #   the coefficients (and the disk cache is warm) rather than
+        #   every one of them reticulating splines all at once
+        rendered = renderFrame(jobs[0][0], jobs[0][1], cLat, cLon,
+                               roads=roads, counties=counties, cmap=cmap,
+                               pCoeff=pCoeff, pKey=pKey,
+                               cachedir=cachedir, engine=engine,
+                               basemap=basemap, renderer=renderer,
+                               rawcounts=rawcounts, vmin=vmin, vmax=vmax,
+                               tilesize=tilesize)
+        pCoeff, pKey, reason = rendered
+        finished(jobs[0], reason, first=True)
+        i += 1
+
+        state = {'cLat': cLat, 'cLon': cLon,
+                 'roads': roads, 'counties': counties, 'cmap': cmap,
+                 'pCoeff': pCoeff, 'pKey': pKey, 'cachedir': cachedir,
+                 'engine': engine, 'basemap': basemap,
+                 'renderer': renderer, 'rawcounts': rawcounts,
+                 'vmin': vmin, 'vmax': vmax, 'tilesize': tilesize,
+                 'nice': backfillNice}
+
+        nworkers = min(nprocs, len(jobs) - 1)
+        print("Rendering %d frames with %d processes..." % (len(jobs) - 1,
+                                                            nworkers))
+        with ProcessPoolExecutor(max_workers=nworkers,
+                                 initializer=_initRenderWorker,
+                                 initargs=(state,)) as pool:
+            for job, result in zip(jobs[1:], pool.map(_renderWorker,
+                                                      jobs[1:])):
+                finished(job, result[1])
+                i += 1
+    else:
+        for j, (each, outpname) in enumerate(jobs):
+            rendered = renderFrame(each, outpname, cLat, cLon,
+                                   roads=roads, counties=counties,
+                                   cmap=cmap, pCoeff=pCoeff, pKey=pKey,
+                                   cachedir=cachedir, engine=engine,
+                                   basemap=basemap, renderer=renderer,
+                                   rawcounts=rawcounts, vmin=vmin,
+                                   vmax=vmax, tilesize=tilesize)
+            pCoeff, pKey, reason = rendered
+            finished((each, outpname), reason, first=(j == 0))
+            i += 1
 
     return i
+
+
+def streamPlots(buck, downloads, newframes, mapCenter, styles, manifest,
+                roads=None, counties=None, cachedir=None, engine='kdtree',
+                basemap='vector', renderer='matplotlib', rawcounts=False,
+                quarantine=None, forceRegen=False, nconcurrent=4, qsize=4,
+                inMemory=True, keepRaws=True):
+    """
+    Like makePlots(), but downloading, reading/reprojecting, and plotting
+    are done as a pipeline (see common.pipeline) so that each frame is
+    plotted as soon as it lands rather than after everything is down.
+    Downloads run on 'nconcurrent' threads, decoding on one more, and
+    plotting happens right here; at most 'qsize' items are waiting
+    between any two of those.
+
+    'buck', 'downloads', and 'newframes' are from aws.GOESAWSlist(), and
+    anything 'manifest' says was already downloaded but not plotted is
+    done too.  Everything goes newest first.
+
+    'styles' is a dict, keyed by product (like 'C13'), of dicts with
+    the 'outloc', 'cmap', 'vmin', 'vmax', 'tilesize', and 'publish'
+    (see makePlots) to use for that band.  Other products are ignored.
+    A 'renderer' in there is used for that band instead of 'renderer'.
+
+    If 'inMemory' is True, new files are fetched into memory and read
+    straight from there.  They're then only written to disk (in the
+    background, off of the critical path) if 'keepRaws' is True, which
+    is needed for re-plotting or quarantining them later.
+
+    Returns a dict of the number of frames processed for each product in
+    styles, so each band can tell if it actually got anything new.
+    """
+    plt.switch_backend("Agg")
+
+    cLon = mapCenter[0]
+    cLat = mapCenter[1]
+
+    # 'objs' is None if it's already downloaded; obstime is in seconds
+    items = []
+    for (objs, oname), (name, prod, obstime) in zip(downloads, newframes):
+        if prod in styles:
+            items.append({'objs': objs, 'rawpath': oname, 'name': name,
+                          'prod': prod,
+                          'obstime': com.manifest.timestamp(obstime)})
+
+    newest = {}
+    for prod in styles:
+        for name, rawpath, obstime in com.manifest.toRender(manifest, prod,
+                                                            force=forceRegen):
+            items.append({'objs': None, 'rawpath': rawpath, 'name': name,
+                          'prod': prod, 'obstime': obstime})
+        newest.update({prod: com.manifest.newestRendered(manifest, prod)})
+
+    items.sort(key=lambda item: item['obstime'], reverse=True)
+
+    # Only one, since this is just keeping the raw files around
+    writer = ThreadPoolExecutor(max_workers=1)
+
+    def fetch(item):
+        if item['objs'] is not None:
+            if inMemory is True:
+                data = com.aws.fetchToMemory(buck, item['objs'])
+                if data is None:
+                    return None
+                item['memory'] = data
+                if keepRaws is True:
+                    item['saved'] = writer.submit(com.aws.saveToDisk, data,
+                                                  item['rawpath'])
+                else:
+                    item['saved'] = None
+            elif com.aws.downloadFromS3(buck, item['objs'],
+                                        item['rawpath']) is False:
+                # Not in the manifest, so it'll be tried again next time
+                return None
+
+        # When it landed, for common.cadence
+        item['arrived'] = time.time()
+
+        return item
+
+    # Coefficients for each product, carried from one frame to the next
+    coeffs = {}
+
+    def decode(item):
+        style = styles[item['prod']]
+        pCoeff, pKey = coeffs.get(item['prod'], (None, None))
+        decoded, pCoeff, pKey, reason = decodeFrame(item['rawpath'],
+                                                    cLat, cLon,
+                                                    cmap=style['cmap'],
+                                                    pCoeff=pCoeff, pKey=pKey,
+                                                    cachedir=cachedir,
+                                                    engine=engine,
+                                                    rawcounts=rawcounts,
+                                                    vmin=style['vmin'],
+                                                    vmax=style['vmax'],
+                                                    tilesize=style['tilesize'],
+                                                    memory=item.pop('memory',
+                                                                    None))
+        coeffs.update({item['prod']: (pCoeff, pKey)})
+
+        return item, decoded, reason
+
+    # netCDF4 isn't thread safe, so there's only ever one decoder
+    stages = [(fetch, nconcurrent), (decode, 1)]
+
+    counts = {prod: 0 for prod in styles}
+    for result in com.pipeline.runPipeline(items, stages, qsize=qsize):
+        if isinstance(result, com.pipeline.failedItem):
+            item, decoded, reason = result.item, None, result.reason
+        else:
+            item, decoded, reason = result
+
+        name = item['name']
+        prod = item['prod']
+        obstime = item['obstime']
+        style = styles[prod]
+
+        # All of the manifest stuff has to happen in this thread
+        if item['objs'] is not None:
+            rawpath = item['rawpath']
+            if 'saved' in item:
+                # It has to actually be there before the manifest (or
+                #   markFailed) can do anything with it
+                if item['saved'] is None or item['saved'].result() is False:
+                    rawpath = None
+            elif 'arrived' not in item:
+                # Never made it down at all
+                rawpath = None
+            com.manifest.addDownloaded(manifest, name, prod,
+                                       dt.utcfromtimestamp(obstime),
+                                       rawpath, arrived=item.get('arrived'))
+
+        outpname = "%s/%s.png" % (style['outloc'], name)
+        if reason is None:
+            try:
+                drawFrame(decoded, outpname, roads=roads, counties=counties,
+                          cmap=style['cmap'], cachedir=cachedir,
+                          basemap=basemap,
+                          renderer=style.get('renderer', renderer),
+                          vmin=style['vmin'], vmax=style['vmax'])
+            except Exception as err:
+                # Anything at all, like in common.pipeline, so that it
+                #   goes through markFailed instead of the whole loop dying
+                reason = "drawFrame failed: %s: %s" % (type(err).__name__,
+                                                       str(err))
+                print(reason)
+
+        if reason is None:
+            com.manifest.markRendered(manifest, name, outpname)
+
+            if style['publish'] is not None:
+                if newest[prod] is None or obstime > newest[prod]:
+                    print("Publishing the newest frame early...")
+                    style['publish'](outpname)
+                    newest.update({prod: obstime})
+        else:
+            com.manifest.markFailed(manifest, name, reason,
+                                    quarantine=quarantine)
+
+        counts[prod] += 1
+
+    writer.shutdown(wait=True)
+
+    return counts
@@ -1,2 +1,7 @@
 from . import aws
+from . import level2
+from . import polar
+from . import qc
 from . import plot
+from . import mosaic
+from . import chunks
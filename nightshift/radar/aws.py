@@ -16,6 +16,7 @@ Requires AWS credentials in the awsCreds.conf file.
 from __future__ import division, print_function, absolute_import
 
 from os.path import basename
+from datetime import datetime as dt
 from datetime import timedelta as td
 
 import botocore
@@ -66,23 +67,40 @@ def genQueries(timedelta, now, station):
     return querybins, minmaxhour
 
 
-def NEXRADAWSgrab(aws_keyid, aws_secretkey, now, outdir,
-                  timedelta=6, forceDown=False):
+def prefixEnd(prefix):
     """
-    AWS IAM user key
-    AWS IAM user secret key
-    Time query is relative to (usually datetime.datetime.utcnow)
-    Hours to query back from above
+    Time at which the given query prefix stops getting new files, which
+    is the end of the day that it covers.
+    """
+    # Sample prefix: 2019/05/17/KFSX
+    parts = prefix.strip("/").split("/")
+    pstart = dt.strptime("/".join(parts[0:3]), "%Y/%m/%d")
+
+    return pstart + td(days=1)
+
+
+def NEXRADAWSlist(aws_keyid, aws_secretkey, now, outdir,
+                  timedelta=6, forceDown=False, nconcurrent=4,
+                  listcache=True, grace=30., manifest=None,
+                  station="KFSX"):
+    """
+    Find everything that needs downloading, but don't download it; see
+    NEXRADAWSgrab() for the arguments, since they're the same.
+
+    Returns the bucket, the list of matching objects, and the lists of
+    downloads to do, (objs, oname), and the matching (name, product,
+    observation time) of each of those, newest first.  The product is
+    the station ID.
     """
     # AWS GOES bucket location/name
     awsbucket = 'noaa-nexrad-level2'
     awszone = 'us-east-1'
 
-    # Station ID that you want to download
-    station = "KFSX"
-
-    # Check our output directory for files already downloaded
-    donelist = files.checkOutDir(outdir)
+    # Check for files already downloaded
+    if manifest is not None:
+        donelist = com.manifest.knownNames(manifest, [station])
+    else:
+        donelist = files.checkOutDir(outdir)
 
     # Sample key:
     # 2019/05/17/KFSX/KFSX20190517_000556_V06
@@ -90,9 +108,22 @@ def NEXRADAWSgrab(aws_keyid, aws_secretkey, now, outdir,
     querybins, minmaxhour = genQueries(timedelta, now, station)
 
     # Establish the connection to the S3 bucket
-    buck = com.aws.connectS3(awsbucket, awszone, aws_keyid, aws_secretkey)
+    buck = com.aws.connectS3(awsbucket, awszone, aws_keyid, aws_secretkey,
+                             maxconns=max(10, nconcurrent))
+
+    # Prefixes that are over with are only listed once; see listPrefix.
+    #   One index per station, since each one prunes everything but its own
+    if listcache is True:
+        ldb = com.listings.openListingIndex(outdir +
+                                            "/.listings.%s.sqlite" % (station))
+    else:
+        ldb = None
 
     matches = []
+    # The actual downloads are queued up and done all at once at the end
+    downloads = []
+    # (name, product, observation time) of each of those, for the manifest
+    newframes = []
     # Bit of a hack; for the first querybin, there's a hour limit that
     #   we won't want any data before because it'll be outside of our
     #   requested time range.  Ditto for the last bin, but it'll be
@@ -111,7 +142,14 @@ def NEXRADAWSgrab(aws_keyid, aws_secretkey, now, outdir,
 
         print("Querying:", qt)
         try:
-            todaydata = buck.objects.filter(Prefix=qt)
+            if ldb is not None:
+                complete = (prefixEnd(qt) + td(minutes=grace)) < now
+                # Keys are the station and then the volume time
+                todaydata = com.listings.listPrefix(buck, ldb, qt,
+                                                    complete=complete,
+                                                    keysByTime=True)
+            else:
+                todaydata = buck.objects.filter(Prefix=qt)
 
             for objs in todaydata:
                 # Current filename
@@ -126,7 +164,11 @@ def NEXRADAWSgrab(aws_keyid, aws_secretkey, now, outdir,
                 fkey = "%s%s%s%s" % (qtp[3], qtp[0], qtp[1], qtp[2])
 
                 # Bit of hackey magic. Sorry.
-                keyhour = int(ckey.split("_")[1][0:2])
+                try:
+                    keyhour = int(ckey.split("_")[1][0:2])
+                except (IndexError, ValueError):
+                    print("Likely invalid key: %s. Skipping." % (ckey))
+                    continue
 
                 skipFile = True
                 if cutOff == "min":
@@ -159,15 +201,23 @@ def NEXRADAWSgrab(aws_keyid, aws_secretkey, now, outdir,
                     # Just basename it so we can quickly check to see if
                     #   we already downloaded this file; if so, skip it.
                     boname = basename(oname)
+                    try:
+                        obstime = dt.strptime(boname[len(station):],
+                                              "%Y%m%d_%H%M%S")
+                    except ValueError:
+                        print("Likely invalid key: %s. Skipping." % (ckey))
+                        continue
                     if boname not in donelist:
                         matches.append(objs)
-                        # Actually attempt the download
-                        com.aws.downloadFromS3(buck, objs, oname)
+                        # Queue up the download
+                        downloads.append((objs, oname))
+                        newframes.append((boname, station, obstime))
                     else:
                         print(oname, "already downloaded!")
                         if forceDown is True:
                             print("Download forced.")
-                            com.aws.downloadFromS3(buck, objs, oname)
+                            downloads.append((objs, oname))
+                            newframes.append((boname, station, obstime))
 
         except botocore.exceptions.ClientError as e:
             if e.response['Error']['Code'] == "404":
@@ -177,4 +227,56 @@ def NEXRADAWSgrab(aws_keyid, aws_secretkey, now, outdir,
         except botocore.exceptions.EndpointConnectionError:
             print("QUERY FAILURE! EndpointConnectionError")
 
+    if ldb is not None:
+        com.listings.pruneListings(ldb, querybins)
+        ldb.close()
+
+    # Newest first, so the latest frame can be made as soon as possible
+    #   instead of after the whole backlog
+    order = sorted(range(len(downloads)), key=lambda k: newframes[k][2],
+                   reverse=True)
+    downloads = [downloads[k] for k in order]
+    newframes = [newframes[k] for k in order]
+
+    return buck, matches, downloads, newframes
+
+
+def NEXRADAWSgrab(aws_keyid, aws_secretkey, now, outdir,
+                  timedelta=6, forceDown=False, nconcurrent=4,
+                  listcache=True, grace=30., manifest=None,
+                  station="KFSX"):
+    """
+    AWS IAM user key
+    AWS IAM user secret key
+    Time query is relative to (usually datetime.datetime.utcnow)
+    Hours to query back from above
+    Number of files to download at once ('nconcurrent')
+
+    If 'listcache' is True, bucket listings are kept in an index in outdir
+    and prefixes that ended more than 'grace' minutes ago aren't re-listed.
+
+    'manifest' is an open common.manifest database; if given, it's what
+    says what's already been downloaded (instead of listing outdir) and
+    new downloads are added to it.  Their product is the station ID.
+
+    'station' is the (4 letter) ID of the radar to grab volumes from.
+    """
+    listed = NEXRADAWSlist(aws_keyid, aws_secretkey, now, outdir,
+                           timedelta=timedelta, forceDown=forceDown,
+                           nconcurrent=nconcurrent, listcache=listcache,
+                           grace=grace, manifest=manifest, station=station)
+    buck, matches, downloads, newframes = listed
+
+    # Now actually download everything, a few at a time
+    results = com.aws.downloadManyFromS3(buck, downloads,
+                                         nconcurrent=nconcurrent)
+
+    if manifest is not None:
+        for (_, oname), (fname, prod, obstime), ok in zip(downloads,
+                                                          newframes,
+                                                          results):
+            if ok is True:
+                com.manifest.addDownloaded(manifest, fname, prod,
+                                           obstime, oname)
+
     return matches
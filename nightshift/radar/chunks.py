@@ -0,0 +1,463 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Ingest of the real-time (chunked) NEXRAD Level II feed.
+
+The archive bucket only gets a volume once the whole 4-10 minute scan is
+done, but the real-time bucket gets it in pieces as it's being scanned:
+
+    KFSX/582/20261018-181233-001-S
+    KFSX/582/20261018-181233-002-I
+    ...
+    KFSX/582/20261018-181233-056-E
+
+i.e. station / volume number (1-999, and then it wraps) / volume start
+time - chunk number - Start, Intermediate, or End.  The start chunk has
+the volume header and the metadata record, and every chunk after it is
+one or more of the same LDM records that make up an archive volume; so
+the chunks just stuck together, in order, are a perfectly good (if
+unfinished) volume as far as Py-ART is concerned.
+
+The lowest sweep is all we plot, and it's done as soon as a chunk shows
+up with radials from the next elevation cut in it (level2.chunkElevations)
+or the volume ends; that's when the frame is made, usually a minute or so
+after the volume starts instead of several minutes after it ends.
+
+The 'source' everywhere in here is either the bucket (see
+common.aws.connectS3, which can also point at a local S3 stand-in) or
+the path to a local directory that has the same layout as the bucket;
+replayChunks() fills one of those from recorded chunks for testing.
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import os
+import re
+import time
+import shutil
+from datetime import datetime as dt
+
+import matplotlib.pyplot as plt
+
+from . import level2
+from . import plot
+from .. import common as com
+
+
+# AWS real-time chunks bucket location/name
+CHUNK_BUCKET = 'unidata-nexrad-level2-chunks'
+CHUNK_ZONE = 'us-east-1'
+
+# Volume numbers go from 1 to this, and then start over
+MAX_VOLUME = 999
+
+# Sample key:
+# KFSX/582/20261018-181233-001-S
+chunkKey = re.compile(r"^(?P<station>[A-Z]{4})/(?P<volume>\d+)/"
+                      r"(?P<vtime>\d{8}-\d{6})-(?P<chunk>\d{3})-"
+                      r"(?P<kind>[SIE])$")
+
+
+def connectChunks(aws_keyid, aws_secretkey, endpoint=None):
+    """
+    The real-time chunks bucket, to use as a source; 'endpoint' is for
+    using a local S3 stand-in instead (see common.aws.connectS3).
+    """
+    return com.aws.connectS3(CHUNK_BUCKET, CHUNK_ZONE, aws_keyid,
+                             aws_secretkey, endpoint=endpoint)
+
+
+def parseChunkKey(key):
+    """
+    Returns a dict of the station, volume number, volume start time
+    (datetime), chunk number, and kind ('S', 'I', or 'E') of the chunk
+    with the given key, or None if it's not a chunk key.
+    """
+    match = chunkKey.match(key)
+    if match is None:
+        return None
+
+    return {'station': match.group('station'),
+            'volume': int(match.group('volume')),
+            'vtime': dt.strptime(match.group('vtime'), "%Y%m%d-%H%M%S"),
+            'chunk': int(match.group('chunk')),
+            'kind': match.group('kind'),
+            'key': key}
+
+
+def listVolumes(source, station):
+    """
+    Sorted list of the volume numbers that station has in source.
+    """
+    prefix = "%s/" % (station)
+
+    vols = []
+    if isinstance(source, str):
+        sdir = os.path.join(source, station)
+        if os.path.isdir(sdir):
+            vols = [int(v) for v in os.listdir(sdir) if v.isdigit()]
+    else:
+        # Only the "directories", not every chunk in them
+        paginator = source.meta.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=source.name, Prefix=prefix,
+                                       Delimiter="/"):
+            for cpref in page.get('CommonPrefixes', []):
+                vnum = cpref['Prefix'][len(prefix):].strip("/")
+                if vnum.isdigit():
+                    vols.append(int(vnum))
+
+    return sorted(vols)
+
+
+def listChunks(source, station, volume):
+    """
+    Dict of {chunk number: chunk} (see parseChunkKey) of everything
+    that's in the given volume so far.  Each one also has 'ref', which
+    is what fetchChunk() needs to actually get it.
+    """
+    prefix = "%s/%d/" % (station, volume)
+
+    found = []
+    if isinstance(source, str):
+        vdir = os.path.join(source, station, str(volume))
+        if os.path.isdir(vdir):
+            for fname in os.listdir(vdir):
+                found.append((prefix + fname, os.path.join(vdir, fname)))
+    else:
+        for objs in source.objects.filter(Prefix=prefix):
+            found.append((objs.key, objs))
+
+    chunks = {}
+    for key, ref in found:
+        chunk = parseChunkKey(key)
+        if chunk is not None:
+            chunk.update({'ref': ref})
+            chunks.update({chunk['chunk']: chunk})
+
+    return chunks
+
+
+def fetchChunk(source, chunk):
+    """
+    Contents (bytes) of the chunk, or None if it couldn't be gotten.
+    """
+    if isinstance(source, str):
+        try:
+            with open(chunk['ref'], 'rb') as f:
+                data = f.read()
+        except OSError as err:
+            print(str(err))
+            data = None
+    else:
+        data = com.aws.fetchToMemory(source, chunk['ref'])
+
+    return data
+
+
+def volumeStart(source, station, volume, known=None):
+    """
+    Start time (datetime) of the given volume, or None if it's empty.
+    'known' is a dict of ones already looked up, which is added to.
+    """
+    if known is not None and volume in known:
+        return known[volume]
+
+    chunks = listChunks(source, station, volume)
+    if len(chunks) == 0:
+        vtime = None
+    else:
+        vtime = chunks[min(chunks)]['vtime']
+
+    if known is not None:
+        known.update({volume: vtime})
+
+    return vtime
+
+
+def newestVolume(source, station):
+    """
+    Number of the volume that's being scanned right now (or the last one
+    that was).  Since the numbers wrap around, the start times go up
+    with the volume number and then drop back down once, right after the
+    newest one; that's found with a binary search so only a handful of
+    the volumes ever have to be listed.  Returns None if there aren't any.
+    """
+    vols = listVolumes(source, station)
+    if len(vols) == 0:
+        return None
+
+    known = {}
+    first = volumeStart(source, station, vols[0], known=known)
+
+    def newer(idx):
+        vtime = volumeStart(source, station, vols[idx], known=known)
+        return vtime is not None and first is not None and vtime >= first
+
+    # Last one that's at least as new as the first; everything after it
+    #   is from before the numbers wrapped around
+    lo, hi = 0, len(vols) - 1
+    while lo < hi:
+        mid = (lo + hi + 1)//2
+        if newer(mid):
+            lo = mid
+        else:
+            hi = mid - 1
+
+    return vols[lo]
+
+
+def nextVolume(volume):
+    """
+    """
+    return volume % MAX_VOLUME + 1
+
+
+def lowestSweepReady(chunks):
+    """
+    Given the chunks fetched so far as {chunk number: chunk}, each with
+    its 'data', return how many of them (counting up from the first one,
+    with no gaps) are needed for the lowest sweep, or 0 if it isn't
+    done yet.
+    """
+    num = 1
+    while num in chunks and chunks[num].get('data') is not None:
+        chunk = chunks[num]
+        if chunk['kind'] == 'E':
+            return num
+
+        if 'elevation' not in chunk:
+            try:
+                elev = level2.chunkElevations(chunk['data'])
+            except (OSError, ValueError) as err:
+                print("Bad chunk %s!" % (chunk['key']))
+                print(str(err))
+                elev = 0
+            chunk.update({'elevation': elev})
+
+        if chunk['elevation'] > 1:
+            return num
+
+        num += 1
+
+    return 0
+
+
+def contiguousChunks(chunks):
+    """
+    How many of the chunks fetched so far ({chunk number: chunk}) there
+    are counting up from the first one, with no gaps, up to the end.
+    """
+    num = 0
+    while (num + 1) in chunks and chunks[num + 1].get('data') is not None:
+        num += 1
+        if chunks[num]['kind'] == 'E':
+            break
+
+    return num
+
+
+def newIngestState():
+    """
+    What ingestChunks() keeps track of from one poll to the next.
+    """
+    return {'volume': None, 'chunks': {}, 'done': False, 'nready': 0,
+            'failedAt': None, 'complete': False, 'arrived': None}
+
+
+def pollChunks(source, station, state):
+    """
+    Look for new chunks of the current volume in state (see
+    newIngestState), starting with the newest volume if there isn't one
+    yet, and moving on to the next one once it's started.
+
+    Returns (name, obstime, data) of the volume as soon as its lowest
+    sweep is all there, where data is just that much of it (bytes) and
+    the name is like the archive volumes; otherwise returns None.
+
+    If that couldn't be read (state['failedAt'] is the number of chunks
+    it had), it's only returned again once more chunks are in, with all
+    of them; state['complete'] is set once that's the whole volume.
+    """
+    if state['volume'] is None:
+        state['volume'] = newestVolume(source, station)
+        if state['volume'] is None:
+            print("No chunks found for %s!" % (station))
+            return None
+        print("Starting with %s volume %d" % (station, state['volume']))
+
+    # Once the current one is done, only the next one is interesting
+    if state['done'] is True:
+        upcoming = listChunks(source, station, nextVolume(state['volume']))
+        if len(upcoming) == 0:
+            return None
+
+        volume = nextVolume(state['volume'])
+        state.update(newIngestState())
+        state.update({'volume': volume})
+        print("Moving on to %s volume %d" % (station, state['volume']))
+
+    listed = listChunks(source, station, state['volume'])
+
+    # Stale chunks from the last time around the volume numbers
+    held = state['chunks']
+    if len(held) > 0 and len(listed) > 0:
+        if listed[min(listed)]['vtime'] != held[min(held)]['vtime']:
+            held.clear()
+            state.update({'failedAt': None, 'arrived': None})
+
+    for num in sorted(listed):
+        if num not in held:
+            held.update({num: listed[num]})
+        if held[num].get('data') is None:
+            held[num].update({'data': fetchChunk(source, held[num])})
+
+        # Anything past the end of the lowest sweep isn't needed, unless
+        #   that wasn't enough to read it last time
+        if state['failedAt'] is None and lowestSweepReady(held) > 0:
+            break
+
+    if len(held) == 0:
+        return None
+
+    if state['failedAt'] is None:
+        nready = lowestSweepReady(held)
+        if nready == 0:
+            print("%s volume %d: %d chunks, lowest sweep not done yet" %
+                  (station, state['volume'], len(held)))
+            return None
+    else:
+        # Only worth another go with more of it than last time
+        nready = contiguousChunks(held)
+        if nready <= state['failedAt']:
+            upcoming = listChunks(source, station,
+                                  nextVolume(state['volume']))
+            if len(upcoming) == 0:
+                print("%s volume %d: waiting for more than %d chunks" %
+                      (station, state['volume'], state['failedAt']))
+                return None
+            # The next one's started, so this is all there'll ever be
+            state['complete'] = True
+
+    if held[nready]['kind'] == 'E':
+        state['complete'] = True
+    state['nready'] = nready
+
+    vtime = held[1]['vtime']
+    name = "%s%s" % (station, vtime.strftime("%Y%m%d_%H%M%S"))
+    data = b"".join([held[num]['data'] for num in range(1, nready + 1)])
+
+    return name, vtime, data
+
+
+def ingestChunks(source, station, state, rawloc, outloc, mapCenter,
+                 manifest, roads=None, counties=None, cmap=None,
+                 cachedir=None, basemap='vector', quarantine=None,
+                 publish=None, renderer='matplotlib', qcfilters=None,
+                 keepRaws=True):
+    """
+    One poll of the real-time chunks of station (see pollChunks); if the
+    lowest sweep of a new volume is ready, it's read straight from memory
+    and plotted just like plot.streamPlots does, and recorded in the
+    manifest under the same name the archive volume would have.  The
+    partial volume is also saved in 'rawloc' if 'keepRaws' is True.
+
+    One that can't be read is tried again (see pollChunks) each time
+    more of it comes in, and is only recorded in the manifest once it's
+    read or there's no more of it to come; then it's marked bad.
+
+    'state' is from newIngestState(), and is kept between calls.
+    Returns the number of frames made (0 or 1).
+    """
+    plt.switch_backend("Agg")
+
+    if cmap is None:
+        cmap = plot.getCMap()
+
+    ready = pollChunks(source, station, state)
+    if ready is None:
+        return 0
+
+    name, vtime, data = ready
+    if name in com.manifest.knownNames(manifest, [station]):
+        print("%s was already done!" % (name))
+        state['done'] = True
+        return 0
+
+    # When it first showed up, not when it was finally read
+    if state['arrived'] is None:
+        state['arrived'] = time.time()
+    rawpath = "%s/%s" % (rawloc, name)
+    vol, reason = plot.decodeVolume(rawpath, memory=data, qcfilters=qcfilters)
+
+    # Overwritten with more of it each time it's tried again
+    if keepRaws is False or com.aws.saveToDisk(data, rawpath) is False:
+        rawpath = None
+
+    if reason is not None and state['complete'] is False:
+        # Whatever's left of the volume might still fix it, so it isn't
+        #   recorded until there's more of it to try
+        print("%s failed with %d chunks; waiting for more: %s" %
+              (name, state['nready'], reason))
+        state['failedAt'] = state['nready']
+        return 0
+
+    com.manifest.addDownloaded(manifest, name, station, vtime, rawpath,
+                               arrived=state['arrived'])
+
+    if reason is not None:
+        # Nothing else is coming, so it's bad (and the raw is kept)
+        com.manifest.markFailed(manifest, name, reason, retries=0,
+                                quarantine=quarantine)
+        state['done'] = True
+        return 0
+
+    outpname = "%s/%s.png" % (outloc, name)
+    plot.drawVolume(vol, outpname, mapCenter[1], mapCenter[0], roads=roads,
+                    counties=counties, cmap=cmap, cachedir=cachedir,
+                    basemap=basemap, renderer=renderer)
+    com.manifest.markRendered(manifest, name, outpname)
+    state['done'] = True
+
+    if publish is not None:
+        newest = com.manifest.newestRendered(manifest, station)
+        if newest is None or com.manifest.timestamp(vtime) >= newest:
+            print("Publishing the newest frame...")
+            publish(outpname)
+
+    return 1
+
+
+def replayChunks(recorded, destdir, station, interval=10., volumes=None):
+    """
+    Copy recorded chunks (a directory with the same layout as the bucket)
+    into destdir, one every 'interval' seconds in the order they were
+    made, to stand in for the real-time bucket when testing; point
+    ingestChunks at destdir while this is running.  'volumes' is a list
+    of the volume numbers to replay, in order (default is all of them,
+    in order of their start times).
+    """
+    if volumes is None:
+        vols = listVolumes(recorded, station)
+        starts = [(volumeStart(recorded, station, v), v) for v in vols]
+        volumes = [v for vtime, v in sorted(starts) if vtime is not None]
+
+    for volume in volumes:
+        chunks = listChunks(recorded, station, volume)
+        vdir = os.path.join(destdir, station, str(volume))
+        os.makedirs(vdir, exist_ok=True)
+
+        for num in sorted(chunks):
+            fname = os.path.basename(chunks[num]['ref'])
+            # Hidden until it's all there, like common.aws.saveToDisk
+            tmpname = os.path.join(vdir, ".%s.part" % (fname))
+            shutil.copyfile(chunks[num]['ref'], tmpname)
+            os.replace(tmpname, os.path.join(vdir, fname))
+            print("Replayed %s" % (chunks[num]['key']))
+            time.sleep(interval)
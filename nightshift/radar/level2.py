@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Just enough of the NEXRAD Archive II format to only read what we use.
+
+A volume is a 24 byte header followed by a bunch of (separately) bzip2'ed
+LDM records, each with a 4 byte size in front.  The first record is all
+metadata (including the VCP) and the rest are ~120 radials each, in scan
+order, so everything needed for the lowest sweep(s) is right up front.
+Trimming the volume after the last record we need means Py-ART never
+even decompresses the rest of it.
+
+See also:
+    ICD for the RDA/RPG, Build 19.0 (2620002T), Sections 3.2.4.17 & 7.3.5
+    https://www.roc.noaa.gov/wsr88d/BuildInfo/Files.aspx
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import bz2
+import gzip
+import struct
+
+
+# Sizes of the fixed parts, in bytes
+VOLUME_HEADER_SIZE = 24
+CONTROL_WORD_SIZE = 4
+CTM_HEADER_SIZE = 12
+MSG_HEADER_SIZE = 16
+
+# Every message that's not a type 31 takes up exactly this much space
+RECORD_SIZE = 2432
+
+# Where the elevation number is in the body of a type 31 (digital radar
+#   data generic format) message
+MSG31_ELEVATION_OFFSET = 22
+
+
+def recordElevations(record):
+    """
+    Highest elevation number (1 is the lowest cut) of any of the radials
+    in a decompressed LDM record, or 0 if there aren't any (like in the
+    metadata record).
+    """
+    highest = 0
+    pos = CTM_HEADER_SIZE
+    while pos + MSG_HEADER_SIZE + MSG31_ELEVATION_OFFSET < len(record):
+        size, _, mtype = struct.unpack_from(">HBB", record, pos)
+        if mtype == 31:
+            elev = record[pos + MSG_HEADER_SIZE + MSG31_ELEVATION_OFFSET]
+            highest = max(highest, elev)
+            # The size (in halfwords) counts from the message header on,
+            #   and the next message has its own CTM header in front
+            pos += size*2 + CTM_HEADER_SIZE
+        else:
+            pos += RECORD_SIZE
+
+    return highest
+
+
+def ldmRecords(data, pos=VOLUME_HEADER_SIZE):
+    """
+    Walk the LDM records in 'data' starting at 'pos', yielding the end of
+    each one (in data) along with the decompressed record.  Stops at the
+    end of the data or at anything that isn't a whole record; a record
+    that can't be decompressed raises the same as bz2 does.
+    """
+    while pos + CONTROL_WORD_SIZE <= len(data):
+        # Negative sizes just mean it's the last record
+        size = abs(struct.unpack_from(">i", data, pos)[0])
+        end = pos + CONTROL_WORD_SIZE + size
+        if size == 0 or end > len(data):
+            break
+
+        yield end, bz2.decompress(data[pos + CONTROL_WORD_SIZE:end])
+        pos = end
+
+
+def chunkElevations(data):
+    """
+    Highest elevation number of any radial in one chunk of a real-time
+    volume (see radar.chunks), which is one or more LDM records; the
+    first chunk of a volume also has the volume header in front.
+    """
+    if data[:4] in [b'AR2V', b'ARCH']:
+        start = VOLUME_HEADER_SIZE
+    else:
+        start = 0
+
+    highest = 0
+    for _, record in ldmRecords(data, pos=start):
+        highest = max(highest, recordElevations(record))
+
+    return highest
+
+
+def trimVolume(data, maxElevation=1):
+    """
+    Cut the volume 'data' (bytes) down to just the LDM records that are
+    needed for the elevation cuts up to and including maxElevation;
+    the record where the next cut starts is kept too, since the cut
+    before it usually ends partway through it.
+
+    Anything that doesn't look like an Archive II volume comes back
+    as-is, as does the rest of the volume after a record that can't be
+    decompressed (so Py-ART still gets to complain about it).
+    """
+    # Old volumes were gzip'ed as a whole
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+
+    if data[:4] not in [b'AR2V', b'ARCH']:
+        return data
+
+    pos = VOLUME_HEADER_SIZE
+    try:
+        for pos, record in ldmRecords(data):
+            if recordElevations(record) > maxElevation:
+                break
+    except (OSError, ValueError):
+        return data
+
+    return data[:pos]
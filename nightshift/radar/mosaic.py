@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Mosaic of several NEXRAD stations on one shared map.
+
+Each station's volumes are grabbed (all at once, see grabStations) and
+tracked in the manifest just like the single station plots.  The frame
+times come from one reference station; the other stations' volumes that
+are closest to each of those (within a tolerance) are matched up, and the
+lowest sweep of each one is put onto the shared grid with its own cached
+polar lookup (see polar.py) and composited into a single frame.
+"""
+
+from __future__ import division, print_function, absolute_import
+
+from datetime import datetime as dt
+
+import numpy as np
+
+import cartopy.crs as ccrs
+
+from . import aws
+from . import plot
+from . import polar
+from .. import common as com
+
+
+def grabStations(aws_keyid, aws_secretkey, now, outdir, stations,
+                 timedelta=6, forceDown=False, nconcurrent=8,
+                 manifest=None):
+    """
+    Like aws.NEXRADAWSgrab(), but for all of the given stations; they're
+    each listed, and then everything is downloaded in one go, newest
+    first, 'nconcurrent' at a time.
+
+    Returns the number of volumes that were downloaded.
+    """
+    buck = None
+    downloads = []
+    newframes = []
+    for station in stations:
+        listed = aws.NEXRADAWSlist(aws_keyid, aws_secretkey, now, outdir,
+                                   timedelta=timedelta, forceDown=forceDown,
+                                   nconcurrent=nconcurrent,
+                                   manifest=manifest, station=station)
+        buck, _, sdown, sframes = listed
+        downloads += sdown
+        newframes += sframes
+
+    if len(downloads) == 0:
+        return 0
+
+    order = sorted(range(len(downloads)), key=lambda k: newframes[k][2],
+                   reverse=True)
+    downloads = [downloads[k] for k in order]
+    newframes = [newframes[k] for k in order]
+
+    results = com.aws.downloadManyFromS3(buck, downloads,
+                                         nconcurrent=nconcurrent)
+
+    if manifest is not None:
+        for (_, oname), (fname, prod, obstime), ok in zip(downloads,
+                                                          newframes,
+                                                          results):
+            if ok is True:
+                com.manifest.addDownloaded(manifest, fname, prod,
+                                           obstime, oname)
+
+    return results.count(True)
+
+
+def matchVolumes(volumes, reference, tolerance=300.):
+    """
+    'volumes' is a dict of {station: [(name, rawpath, obstime), ...]},
+    with the obstime in seconds since the epoch.  For each volume of the
+    reference station, find the volume of every other station that's
+    closest in time, as long as it's within 'tolerance' seconds.
+
+    Returns a list of (obstime, {station: (name, rawpath)}), newest first.
+    """
+    # Sorted times of each of the others, for searchsorted
+    others = {}
+    for station in volumes:
+        if station != reference and len(volumes[station]) > 0:
+            vols = sorted(volumes[station], key=lambda v: v[2])
+            others.update({station: (np.array([v[2] for v in vols]), vols)})
+
+    frames = []
+    for name, rawpath, obstime in sorted(volumes.get(reference, []),
+                                         key=lambda v: v[2], reverse=True):
+        matched = {reference: (name, rawpath)}
+        for station in others:
+            times, vols = others[station]
+            idx = np.searchsorted(times, obstime)
+
+            # The closest is either just before or just after
+            near = [i for i in [idx - 1, idx] if 0 <= i < times.size]
+            best = min(near, key=lambda i: abs(times[i] - obstime))
+            if abs(times[best] - obstime) <= tolerance:
+                matched.update({station: vols[best][0:2]})
+
+        frames.append((obstime, matched))
+
+    return frames
+
+
+def composite(grids, ranges, method='max'):
+    """
+    Combine the (masked) station images in grids into one.  'max' takes
+    the largest value in each pixel, and 'nearest' takes the one from
+    the station whose gate is closest (by slant range, from ranges).
+    """
+    shape = grids[0].shape
+    if method == 'nearest':
+        out = np.zeros(shape)
+        best = np.full(shape, np.inf)
+        for grid, srange in zip(grids, ranges):
+            use = ~np.ma.getmaskarray(grid) & (srange < best)
+            out[use] = np.ma.getdata(grid)[use]
+            best[use] = srange[use]
+        mask = ~np.isfinite(best)
+    else:
+        out = np.full(shape, -np.inf)
+        for grid in grids:
+            np.fmax(out, np.ma.filled(grid.astype(np.float64), -np.inf),
+                    out=out)
+        mask = ~np.isfinite(out)
+
+    return np.ma.masked_array(out, mask=mask)
+
+
+def mosaicLabels(stations, obstime, tolerance):
+    """
+    """
+    line1 = "%s  Filtered Reflectivity" % ("  ".join(sorted(stations)))
+    line1 = line1.upper()
+
+    tstr = dt.utcfromtimestamp(obstime).strftime("%Y-%m-%d  %H:%M:%SZ")
+    line2 = "MOSAIC  %s  +/-%d MIN" % (tstr, int(round(tolerance/60.)))
+    line2 = line2.upper()
+
+    return line1, line2
+
+
+def rasterMosaic(vols, obstime, outpname, cLat, cLon, roads=None,
+                 counties=None, cmap=None, cachedir=None, method='max',
+                 tolerance=300.):
+    """
+    Make a frame out of the decoded volumes in vols, a dict of
+    {station: vol} (see plot.decodeVolume), in the same way as
+    plot.rasterVolume but on a grid centered on cLat, cLon.
+    """
+    latMin, latMax, lonMin, lonMax = com.maps.set_plot_extent(cLat, cLon)
+    crs = ccrs.LambertConformal(central_latitude=cLat,
+                                central_longitude=cLon)
+    pcrs = ccrs.PlateCarree()
+
+    layer = com.maps.getBasemapLayer(crs, (lonMin, lonMax, latMin, latMax),
+                                     extentcrs=pcrs,
+                                     figsize=(5.80, 5.80), dpi=100,
+                                     counties=counties, roads=roads,
+                                     cachedir=cachedir)
+
+    grids = []
+    ranges = []
+    for station in vols:
+        pdat, srange = polar.sweepImage(vols[station], crs, layer,
+                                        cachedir=cachedir)
+        grids.append(pdat)
+        ranges.append(srange)
+
+    print("Compositing %d stations..." % (len(grids)))
+    mdat = composite(grids, ranges, method=method)
+
+    # The colormap is discrete, so it has to go through its norm first
+    rgba = cmap[0](cmap[1](mdat), bytes=True)
+
+    line1, line2 = mosaicLabels(vols.keys(), obstime, tolerance)
+    img = com.raster.composeFrame(rgba, layer,
+                                  labels=[(line1, 0.990), (line2, 0.960)])
+
+    x0, y0, x1, y1 = layer['bbox']
+    for station in vols:
+        spix = polar.sitePixel(crs, layer, vols[station]['siteLon'],
+                               vols[station]['siteLat'])
+        if 0 <= spix[0] < x1 - x0 and 0 <= spix[1] < y1 - y0:
+            img = com.raster.drawTriangle(img, layer, spix)
+
+    com.raster.savePNG(img, outpname)
+    img.close()
+
+
+def makeMosaics(manifest, stations, outloc, mapCenter, reference=None,
+                tolerance=300., wait=600., method='max', roads=None,
+                counties=None, cmap=None, cachedir=None, quarantine=None,
+                qcfilters=None, forceRegen=False, publish=None,
+                product="MOSAIC", now=None):
+    """
+    Make the mosaic frames that aren't already in 'manifest', newest
+    first, out of the volumes of 'stations' that are in there.  Frame
+    times are those of the 'reference' station (default is the first
+    one), and the frames are named like the volumes with 'product' in
+    place of the station ID; that's also their product in the manifest.
+
+    A frame that's missing some of the stations isn't made until it's
+    'wait' seconds old (relative to 'now', in seconds since the epoch),
+    in case the others are just running late.  Volumes that can't be
+    read are marked as failed, just like in plot.makePlots; a frame with
+    one that's going to be downloaded again isn't made (or marked as
+    done) until that's settled one way or the other.
+
+    'method' is how the stations are combined; see composite().
+    The newest frame is handed to 'publish' if it's the newest one yet.
+
+    Returns the number of frames made.
+    """
+    if reference is None:
+        reference = stations[0]
+    if cmap is None:
+        cmap = plot.getCMap()
+    if now is None:
+        now = com.manifest.timestamp(dt.utcnow())
+
+    cLon = mapCenter[0]
+    cLat = mapCenter[1]
+
+    volumes = {}
+    for station in stations:
+        volumes.update({station: com.manifest.toRender(manifest, station,
+                                                       force=True)})
+
+    frames = matchVolumes(volumes, reference, tolerance=tolerance)
+
+    if forceRegen is True:
+        done = set()
+    else:
+        done = com.manifest.knownNames(manifest, [product])
+    newest = com.manifest.newestRendered(manifest, product)
+
+    # (decoded volume, settled) of each volume name, kept around since
+    #   neighbouring frames usually share some of the slower stations'
+    #   volumes.  Ones that failed but will be retried aren't settled.
+    decoded = {}
+
+    i = 0
+    for obstime, matched in frames:
+        tstamp = dt.utcfromtimestamp(obstime)
+        name = "%s%s" % (product, tstamp.strftime("%Y%m%d_%H%M%S"))
+        if name in done:
+            continue
+
+        if len(matched) < len(stations) and (now - obstime) < wait:
+            print("%s is still missing stations; waiting." % (name))
+            continue
+
+        vols = {}
+        retrying = []
+        for station in matched:
+            vname, rawpath = matched[station]
+            if vname not in decoded:
+                vol, reason = plot.decodeVolume(rawpath, qcfilters=qcfilters)
+                settled = True
+                if reason is not None:
+                    fstate = com.manifest.markFailed(manifest, vname, reason,
+                                                     quarantine=quarantine)
+                    settled = fstate != 'retry'
+                decoded.update({vname: (vol, settled)})
+
+            vol, settled = decoded[vname]
+            if settled is False:
+                retrying.append(station)
+            elif vol is not None:
+                vols.update({station: vol})
+
+        # Only hang on to what the next (older) frame might use again
+        decoded = {matched[s][0]: decoded[matched[s][0]] for s in matched}
+
+        # Same as a missing station, except that it's definitely coming;
+        #   once it's back, it's either good or bad for good
+        if len(retrying) > 0:
+            print("%s is waiting on %s to be downloaded again." %
+                  (name, ", ".join(sorted(retrying))))
+            continue
+
+        if len(vols) == 0:
+            continue
+
+        outpname = "%s/%s.png" % (outloc, name)
+        rasterMosaic(vols, obstime, outpname, cLat, cLon, roads=roads,
+                     counties=counties, cmap=cmap, cachedir=cachedir,
+                     method=method, tolerance=tolerance)
+
+        com.manifest.addDownloaded(manifest, name, product, tstamp, None)
+        com.manifest.markRendered(manifest, name, outpname)
+        i += 1
+
+        if publish is not None:
+            if newest is None or obstime > newest:
+                print("Publishing the newest frame early...")
+                publish(outpname)
+                newest = obstime
+
+    return i
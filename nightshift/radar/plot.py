@@ -13,13 +13,15 @@
 
 from __future__ import division, print_function, absolute_import
 
+import io
+import re
 import glob
 
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime as dt
 
-import numpy as np
-
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
 import matplotlib.patches as mpatches
@@ -29,18 +31,53 @@ import cartopy.crs as ccrs
 from pyart.io import read_nexrad_archive
 from pyart.graph import RadarMapDisplay
 
+from . import level2
+from . import polar
+from . import qc
 from .. import common as com
 
 
-def readNEXRAD(filename):
+# What the volumes are saved as, like KFSX20211209_162944
+volumeName = re.compile(r"^[A-Z]{4}\d{8}_\d{6}$")
+
+# The only fields that literallyDeBug (and so the plots) actually use
+qcFields = ['reflectivity', 'cross_correlation_ratio',
+            'differential_reflectivity']
+
+
+def readNEXRAD(filename, memory=None, fast=True, fields=None):
     """
-    x
+    If 'memory' is given it's the contents of the file (bytes), which are
+    read directly instead of the file; filename is then just a label.
+
+    If 'fast' is True, only the lowest sweep of the given 'fields' (default
+    is qcFields) is decoded, and the volume is trimmed down to just the
+    records for that sweep before Py-ART even sees it (level2.trimVolume).
     """
     print("Reading: %s" % (filename))
     try:
-        dat = read_nexrad_archive(filename, linear_interp=False)
+        if fast is True:
+            if memory is None:
+                with open(filename, 'rb') as f:
+                    memory = f.read()
+            memory = level2.trimVolume(memory, maxElevation=1)
+
+            if fields is None:
+                fields = qcFields
+            subset = {'scans': [0], 'include_fields': fields}
+        else:
+            subset = {}
+
+        if memory is not None:
+            # Py-ART is happy with any file-like object
+            source = io.BytesIO(memory)
+        else:
+            source = filename
+
+        dat = read_nexrad_archive(source, linear_interp=False, **subset)
         print("Done reading!")
-    except (ValueError, IndexError) as e:
+    except (ValueError, IndexError, OSError, EOFError) as e:
+        # OSError/EOFError are what truncated bz2 blocks end up as
         print("%s is likely a bad file!" % (filename))
         print(str(e))
         dat = None
@@ -64,10 +101,11 @@ def getCMap():
     return nwsref
 
 
-def literallyDeBug(radar, vcpmode):
+def literallyDeBug(radar, vcpmode, filters=None):
     """
     Apply rudimentary quality control, as done in the example by
-    Valliappa Lakshmanan.
+    Valliappa Lakshmanan; those are the default 'filters', but any list of
+    them (like from a config file) can be used instead.  See qc.py.
 
     See the full notebook at:
     https://github.com/lakshmanok/nexradaws/blob/master/nexrad_sample.ipynb
@@ -95,51 +133,311 @@ def literallyDeBug(radar, vcpmode):
     cause very different behaviors between the pulses, resulting in values
     less than 0.9 (and often less than 0.7).
     """
-    refl_grid = radar.get_field(0, 'reflectivity')
-    rhohv_grid = radar.get_field(0, 'cross_correlation_ratio')
-    zdr_grid = radar.get_field(0, 'differential_reflectivity')
-
-    # Reflectivity values less than some cutoff point
-    #   value originally was 20
-    # The logic below attempts to account for the radar scan operating
-    #   in "Clear Air Mode" which can result in valid values < 0.  If that's
-    #   the scan type, we set a super low bar for reflectivity filtering
-    #   otherwise we choose a low-ish value to try to eliminate fuzziness
-    if vcpmode in [31, 32, 35]:
-        refCutVal = -35
+    if filters is None:
+        filters = qc.defaultFilters
+
+    # Reflectivity flagged where it's (probably) not weather; for the
+    #   clear air VCPs, the bar for reflectivity is set super low since
+    #   they can have valid values < 0
+    qcrefl_grid, counts = qc.applyFilters(radar, filters, vcpmode)
+    print("QC rejections: %s" % (", ".join(["%s %d" % (k, counts[k])
+                                            for k in counts])))
+
+    # No need for another copy if it's already just the one sweep
+    if radar.nsweeps == 1:
+        qced = radar
     else:
-        refCutVal = -15
-    refLow = np.less(refl_grid, refCutVal)
+        qced = radar.extract_sweeps([0])
+    qced.add_field_like('reflectivity', 'reflectivity_masked', qcrefl_grid)
 
-    # Differential reflectivity greater than some cutoff point
-    #   Note that this is doing abs() first, so it's filtering out both ends.
-    #   This could be a natural point of improvement to filter both ends
-    #   explicitly rather than trying to combine both in one shot.
-    #   value originally was 2.3
-    zdrCut = np.greater(np.abs(zdr_grid), 2.3)
+    return qced
 
-    # Cross correlation values below a threshold
-    #   value originally was 0.95
-    rhohvLow = np.less(rhohv_grid, 0.925)
 
-    # Combine all of the above into a master mask array. Flag values where:
-    #   Reflectivity < cutoff OR (DifferentialReflectivity is high OR
-    #                             CrossCorrelationRatio is low)
-    notweather = np.logical_or(refLow, np.logical_or(zdrCut, rhohvLow))
+def decodeVolume(filename, memory=None, qcfilters=None):
+    """
+    The read and QC half of plotting a volume; see readNEXRAD for 'memory'
+    and literallyDeBug for 'qcfilters'.
+    Nothing in here touches matplotlib, so it's fine to do in a different
+    thread than drawVolume().
 
-    # Generate the masked array from the above
-    qcrefl_grid = np.ma.masked_where(notweather, refl_grid)
+    Returns a dict of the QC'ed radar object and its identifiers (or None),
+    and the reason it can't be plotted (a string) or None if it can.
+    """
+    if qcfilters is None:
+        qcfilters = qc.defaultFilters
 
-    qced = radar.extract_sweeps([0])
-    qced.add_field_like('reflectivity', 'reflectivity_masked', qcrefl_grid)
+    # Only what the filters need is decoded
+    radar = readNEXRAD(filename, memory=memory,
+                       fields=qc.neededFields(qcfilters))
 
-    return qced
+    try:
+        # Pull out the identifiers
+        site = radar.metadata['instrument_name']
+        siteLat = radar.latitude['data'][0]
+        siteLon = radar.longitude['data'][0]
+
+        dprod = radar.metadata['original_container']
+
+        # Get the VCP mode (specific radar scan mode); see also:
+        # https://www.weather.gov/jetstream/vcp_max
+        vcpmode = radar.metadata['vcp_pattern']
+    except (KeyError, AttributeError) as ke:
+        # This usually means a bad file
+        print(str(ke))
+        if radar is None:
+            reason = "Unreadable volume"
+        else:
+            reason = "Missing metadata: %s" % (str(ke))
+        return None, reason
+
+    # Pull out the time stamp; skip the site name
+    fullts = os.path.basename(filename)[4:]
+    try:
+        tend = dt.strptime(fullts, "%Y%m%d_%H%M%S")
+    except ValueError as err:
+        print(str(err))
+        return None, "Bad timestamp in name: %s" % (str(err))
+
+    # Filter out crud that is probably bugs and stuff,
+    #   good enough for what we're doing
+    print("Debugging...")
+    qcradar = literallyDeBug(radar, vcpmode, filters=qcfilters)
+    print("Debugging complete!")
+
+    vol = {'radar': qcradar, 'site': site, 'siteLat': siteLat,
+           'siteLon': siteLon, 'dprod': dprod, 'vcpmode': vcpmode,
+           'tend': tend}
+
+    return vol, None
+
+
+def volumeLabels(vol):
+    """
+    The two lines of the informational bar at the top, using info
+    directly from the original datafile.
+    """
+    line1 = "%s  %s  Filtered Reflectivity" % (vol['site'], vol['dprod'])
+    line1 = line1.upper()
+
+    # We don't need microseconds shown on this plot
+    tendstr = vol['tend'].strftime("%Y-%m-%d  %H:%M:%SZ")
+    line2 = "VCP MODE %03d  %s" % (vol['vcpmode'], tendstr)
+    line2 = line2.upper()
+
+    return line1, line2
+
+
+def rasterVolume(vol, outpname, cLat, cLon, roads=None, counties=None,
+                 cmap=None, cachedir=None):
+    """
+    Make the same frame as the matplotlib path in drawVolume, but build it
+    directly as an image (see common.raster) by gathering the lowest sweep
+    straight into the output pixels with a cached lookup (see polar).
+    """
+    siteLat = vol['siteLat']
+    siteLon = vol['siteLon']
+
+    latMin, latMax, lonMin, lonMax = com.maps.set_plot_extent(cLat, cLon)
+    crs = ccrs.LambertConformal(central_latitude=siteLat,
+                                central_longitude=siteLon)
+    pcrs = ccrs.PlateCarree()
+
+    layer = com.maps.getBasemapLayer(crs, (lonMin, lonMax, latMin, latMax),
+                                     extentcrs=pcrs,
+                                     figsize=(5.80, 5.80), dpi=100,
+                                     counties=counties, roads=roads,
+                                     cachedir=cachedir)
+
+    print("Rasterizing radar data...")
+    pdat, _ = polar.sweepImage(vol, crs, layer, cachedir=cachedir)
+
+    # The colormap is discrete, so it has to go through its norm first
+    rgba = cmap[0](cmap[1](pdat), bytes=True)
+
+    line1, line2 = volumeLabels(vol)
+    img = com.raster.composeFrame(rgba, layer,
+                                  labels=[(line1, 0.990), (line2, 0.960)])
+
+    # Mark the radar itself, like plot_point does
+    img = com.raster.drawTriangle(img, layer,
+                                  polar.sitePixel(crs, layer,
+                                                  siteLon, siteLat))
+
+    com.raster.savePNG(img, outpname)
+    img.close()
+
+
+def drawVolume(vol, outpname, cLat, cLon, roads=None, counties=None,
+               cmap=None, cachedir=None, basemap='vector',
+               renderer='matplotlib'):
+    """
+    The plotting half, taking what decodeVolume() gave back; see
+    makePlots() for the rest of the arguments.
+    """
+    if renderer == 'raster':
+        rasterVolume(vol, outpname, cLat, cLon, roads=roads,
+                     counties=counties, cmap=cmap, cachedir=cachedir)
+        return
+
+    siteLat = vol['siteLat']
+    siteLon = vol['siteLon']
+
+    display = RadarMapDisplay(vol['radar'], )
+
+    latMin, latMax, lonMin, lonMax = com.maps.set_plot_extent(cLat, cLon)
+
+    # Set the projection info for the plot axes
+    crs = ccrs.LambertConformal(central_latitude=siteLat,
+                                central_longitude=siteLon)
+
+    # Get the proper plot extents so we have no whitespace
+    prlon = (crs.x_limits[1] - crs.x_limits[0])
+    prlat = (crs.y_limits[1] - crs.y_limits[0])
+
+    # Natural aspect ratio based on coordinates
+    paspect = prlon/prlat
+
+    figsize = (5.80, 5.80)
+
+    # print(prlon, prlat, paspect)
+    # print(figsize)
+
+    # Grab this before making our figure, since it might need to
+    #   make (and close) its own figure to render the layer.
+    #   The extent is the same one plot_ppi_map uses below.
+    if basemap == 'raster':
+        pExt = (lonMin, lonMax, latMin, latMax)
+        pcrs = ccrs.PlateCarree()
+        layer = com.maps.getBasemapLayer(crs, pExt,
+                                         extentcrs=pcrs,
+                                         figsize=figsize, dpi=100,
+                                         counties=counties,
+                                         roads=roads,
+                                         cachedir=cachedir)
+    else:
+        layer = None
+
+    # Figure creation
+    fig = plt.figure(figsize=figsize, dpi=100, facecolor='#262629')
+
+    # Needed to remove any whitespace/padding around the imshow()
+    plt.subplots_adjust(left=0., right=1., top=1., bottom=0.)
+
+    # Tell matplotlib we're using a map projection so cartopy
+    #   takes over and overloades Axes() with GeoAxes()
+    ax = plt.axes(projection=crs)
+
+    ax.set(facecolor='#262629')
+    # ax.patch.set_facecolor('#262629')
+
+    # Some custom stuff
+    if layer is None:
+        ax = com.maps.add_map_features(ax,
+                                       counties=counties,
+                                       roads=roads)
+        ax = com.maps.add_AZObs(ax)
+
+    # Clear out the crap on the edges
+    ax.set_xlabel("")
+    ax.set_ylabel("")
+    ax.set_xticklabels([])
+    ax.set_yticklabels([])
+
+    print("Plotting radar data...")
+    display.plot_ppi_map('reflectivity_masked',
+                         mask_outside=True,
+                         min_lon=lonMin, max_lon=lonMax,
+                         min_lat=latMin, max_lat=latMax,
+                         ax=ax,
+                         projection=crs,
+                         fig=fig,
+                         cmap=cmap[0],
+                         norm=cmap[1],
+                         lat_0=siteLat,
+                         lon_0=siteLon,
+                        #  embellish=False,
+                         colorbar_flag=False,
+                         title_flag=False,
+                         ticklabs=[],
+                         ticks=[],
+                         lat_lines=[],
+                         lon_lines=[],
+                         raster=True,
+                         edgecolor=None)
+
+    # Now that the extent is set, put the map features on top
+    if layer is not None:
+        ax = com.maps.add_basemap_layer(ax, layer)
+
+    display.plot_point(siteLon, siteLat,
+                       symbol='^', color='orange')
+    print("Plotting complete! Finishing up...")
+
+    # plt.colorbar()
+
+    # Add the informational bar at the top, using info directly
+    #   from the original datafiles that we opened at the top
+    line1, line2 = volumeLabels(vol)
+
+    # Black background for top label text
+    #   NOTE: Z order is important! Text should be > than trect
+    trect = mpatches.Rectangle((0.0, 0.940), width=1.0,
+                               height=0.060, edgecolor=None,
+                               facecolor='black',
+                               fill=True, alpha=1.0, zorder=100,
+                               transform=ax.transAxes)
+    ax.add_patch(trect)
+
+    # Line 1
+    plt.annotate(line1, (0.5, 0.990), xycoords='axes fraction',
+                 fontfamily='monospace',
+                 horizontalalignment='center',
+                 verticalalignment='center',
+                 color='white', fontweight='bold', zorder=200)
+    # Line 2
+    plt.annotate(line2, (0.5, 0.960), xycoords='axes fraction',
+                 fontfamily='monospace',
+                 horizontalalignment='center',
+                 verticalalignment='center',
+                 color='white', fontweight='bold', zorder=200)
+
+    # Useful for testing getCmap changes
+    # plt.colorbar()
+
+    plt.savefig(outpname, dpi=100, facecolor='black')
+    print("Saved as %s." % (outpname))
+    plt.close()
 
 
 def makePlots(inloc, outloc, mapCenter, roads=None, counties=None,
-              cmap=None, forceRegen=False):
+              cmap=None, forceRegen=False, cachedir=None, basemap='vector',
+              manifest=None, station="KFSX", quarantine=None,
+              newestFirst=False, publish=None, renderer='matplotlib',
+              qcfilters=None):
     """
-    x
+    'basemap' is either 'vector', which draws all the map features every
+    time, or 'raster' which pastes a pre-rendered layer of them on top
+    instead; that layer is cached in 'cachedir' (if given) as well as in
+    memory.  See common.maps.getBasemapLayer.
+
+    'renderer' is either 'matplotlib' (Py-ART's plot_ppi_map, the original
+    way) or 'raster', which maps the sweep straight into the image with a
+    cached lookup and always uses the raster basemap; see rasterVolume().
+
+    'qcfilters' is the list of QC filters (see qc.py) to use instead of
+    the default ones; see literallyDeBug().
+
+    'manifest' is an open common.manifest database; if given, it says
+    which of the 'station' files still need plotting instead of looking
+    at what's in inloc and outloc, and each new one is marked as
+    rendered in it.  Files that can't be read are marked as failed, so
+    they're downloaded again once and then skipped (see
+    common.manifest.markFailed) with the bad file moved to 'quarantine'.
+
+    If 'newestFirst' is True, the newest file is plotted first and, if
+    it's newer than everything already plotted, handed straight to
+    'publish' (a function that takes the output filename) so the "latest"
+    image is fresh right away; the rest are backfilled newest to oldest.
     """
     # Warning, you may explode
     #  https://matplotlib.org/api/pyplot_api.html#matplotlib.pyplot.switch_backend
@@ -148,18 +446,33 @@ def makePlots(inloc, outloc, mapCenter, roads=None, counties=None,
     cLon = mapCenter[0]
     cLat = mapCenter[1]
 
-    flist = sorted(glob.glob(inloc + "/*"))
+    # The manifest already knows exactly what's left to do
+    publishFirst = newestFirst is True and publish is not None
+    if manifest is not None:
+        todo = com.manifest.toRender(manifest, station, force=forceRegen,
+                                     newestFirst=newestFirst)
+        flist = [rawpath for _, rawpath, _ in todo]
+
+        # Only publish the first one if it's really the newest thing
+        #   around; it might be an old file that's being retried
+        newest = com.manifest.newestRendered(manifest, station)
+        if len(todo) > 0 and newest is not None:
+            publishFirst &= todo[0][2] > newest
+    else:
+        flist = sorted(glob.glob(inloc + "/*"))
+        if newestFirst is True:
+            flist.reverse()
 
     if cmap is None:
         cmap = getCMap()
 
     # i is the number-of-images processed counter
     i = 0
-    for each in flist:
+    for j, each in enumerate(flist):
         outpname = "%s/%s.png" % (outloc, os.path.basename(each))
 
         # Logic to skip stuff already completed, or just redo everything
-        if forceRegen is True:
+        if forceRegen is True or manifest is not None:
             save = True
         else:
             # Check to see if we're already done with this image
@@ -172,156 +485,172 @@ def makePlots(inloc, outloc, mapCenter, roads=None, counties=None,
                 save = True
 
         # Check to make sure the filename is what's expected
-        if len(os.path.basename(each)) != len("KFSX20211209_162944"):
+        if volumeName.match(os.path.basename(each)) is None:
             print("Likely invalid file: %s. Skipping." % each)
             save = False
 
         if save is True:
-            radar = readNEXRAD(each)
+            vol, reason = decodeVolume(each, qcfilters=qcfilters)
 
-            # Pull out the identifiers
-            plotable = False
-            try:
-                # Pull out the identifiers
-                site = radar.metadata['instrument_name']
-                siteLat = radar.latitude['data'][0]
-                siteLon = radar.longitude['data'][0]
-
-                dprod = radar.metadata['original_container']
-
-                # Get the VCP mode (specific radar scan mode); see also:
-                # https://www.weather.gov/jetstream/vcp_max
-                vcpmode = radar.metadata['vcp_pattern']
-                plotable = True
-            except (KeyError, AttributeError) as ke:
-                # This usually means a bad file
-                print(str(ke))
-                plotable = False
-
-            if plotable is True:
-                # Pull out the time stamp; skip the site name
-                fullts = os.path.basename(each)[4:]
-                tend = dt.strptime(fullts, "%Y%m%d_%H%M%S")
-
-                # Filter out crud that is probably bugs and stuff,
-                #   good enough for what we're doing
-                print("Debugging...")
-                qcradar = literallyDeBug(radar, vcpmode)
-                print("Debugging complete!")
-                display = RadarMapDisplay(qcradar, )
-
-                latMin, latMax, lonMin, lonMax = com.maps.set_plot_extent(cLat,
-                                                                          cLon)
-
-                # Set the projection info for the plot axes
-                crs = ccrs.LambertConformal(central_latitude=siteLat,
-                                            central_longitude=siteLon)
-
-                # Get the proper plot extents so we have no whitespace
-                prlon = (crs.x_limits[1] - crs.x_limits[0])
-                prlat = (crs.y_limits[1] - crs.y_limits[0])
-
-                # Natural aspect ratio based on coordinates
-                paspect = prlon/prlat
-
-                figsize = (5.80, 5.80)
-
-                # print(prlon, prlat, paspect)
-                # print(figsize)
-
-                # Figure creation
-                fig = plt.figure(figsize=figsize, dpi=100, facecolor='#262629')
-
-                # Needed to remove any whitespace/padding around the imshow()
-                plt.subplots_adjust(left=0., right=1., top=1., bottom=0.)
-
-                # Tell matplotlib we're using a map projection so cartopy
-                #   takes over and overloades Axes() with GeoAxes()
-                ax = plt.axes(projection=crs)
-
-                ax.set(facecolor='#262629')
-                # ax.patch.set_facecolor('#262629')
-
-                # Some custom stuff
-                ax = com.maps.add_map_features(ax,
-                                               counties=counties,
-                                               roads=roads)
-                ax = com.maps.add_AZObs(ax)
-
-                # Clear out the crap on the edges
-                ax.set_xlabel("")
-                ax.set_ylabel("")
-                ax.set_xticklabels([])
-                ax.set_yticklabels([])
-
-                print("Plotting radar data...")
-                display.plot_ppi_map('reflectivity_masked',
-                                     mask_outside=True,
-                                     min_lon=lonMin, max_lon=lonMax,
-                                     min_lat=latMin, max_lat=latMax,
-                                     ax=ax,
-                                     projection=crs,
-                                     fig=fig,
-                                     cmap=cmap[0],
-                                     norm=cmap[1],
-                                     lat_0=siteLat,
-                                     lon_0=siteLon,
-                                    #  embellish=False,
-                                     colorbar_flag=False,
-                                     title_flag=False,
-                                     ticklabs=[],
-                                     ticks=[],
-                                     lat_lines=[],
-                                     lon_lines=[],
-                                     raster=True,
-                                     edgecolor=None)
-
-                display.plot_point(siteLon, siteLat,
-                                   symbol='^', color='orange')
-                print("Plotting complete! Finishing up...")
-
-                # plt.colorbar()
-
-                # Add the informational bar at the top, using info directly
-                #   from the original datafiles that we opened at the top
-                line1 = "%s  %s  Filtered Reflectivity" % (site, dprod)
-                line1 = line1.upper()
-
-                # We don't need microseconds shown on this plot
-                tendstr = tend.strftime("%Y-%m-%d  %H:%M:%SZ")
-                line2 = "VCP MODE %03d  %s" % (vcpmode, tendstr)
-                line2 = line2.upper()
-
-                # Black background for top label text
-                #   NOTE: Z order is important! Text should be > than trect
-                trect = mpatches.Rectangle((0.0, 0.940), width=1.0,
-                                           height=0.060, edgecolor=None,
-                                           facecolor='black',
-                                           fill=True, alpha=1.0, zorder=100,
-                                           transform=ax.transAxes)
-                ax.add_patch(trect)
-
-                # Line 1
-                plt.annotate(line1, (0.5, 0.990), xycoords='axes fraction',
-                             fontfamily='monospace',
-                             horizontalalignment='center',
-                             verticalalignment='center',
-                             color='white', fontweight='bold', zorder=200)
-                # Line 2
-                plt.annotate(line2, (0.5, 0.960), xycoords='axes fraction',
-                             fontfamily='monospace',
-                             horizontalalignment='center',
-                             verticalalignment='center',
-                             color='white', fontweight='bold', zorder=200)
-
-                # Useful for testing getCmap changes
-                # plt.colorbar()
-
-                plt.savefig(outpname, dpi=100, facecolor='black')
-                print("Saved as %s." % (outpname))
-                plt.close()
+            if reason is None:
+                drawVolume(vol, outpname, cLat, cLon, roads=roads,
+                           counties=counties, cmap=cmap, cachedir=cachedir,
+                           basemap=basemap, renderer=renderer)
 
                 i += 1
                 print("%d plots complete" % (i))
 
+                if j == 0 and publishFirst is True:
+                    print("Publishing the newest frame early...")
+                    publish(outpname)
+
+                if manifest is not None:
+                    com.manifest.markRendered(manifest,
+                                              os.path.basename(each),
+                                              outpname)
+            elif manifest is not None:
+                com.manifest.markFailed(manifest, os.path.basename(each),
+                                        reason, quarantine=quarantine)
+
+    return i
+
+
+def streamPlots(buck, downloads, newframes, outloc, mapCenter, manifest,
+                roads=None, counties=None, cmap=None, cachedir=None,
+                basemap='vector', station="KFSX", quarantine=None,
+                forceRegen=False, publish=None, nconcurrent=4, qsize=4,
+                inMemory=True, keepRaws=True, renderer='matplotlib',
+                qcfilters=None):
+    """
+    Like makePlots(), but downloading, reading/QC, and plotting are done
+    as a pipeline (see common.pipeline) so that each volume is plotted as
+    soon as it lands rather than after everything is down.  Downloads run
+    on 'nconcurrent' threads, decoding on one more, and plotting happens
+    right here; at most 'qsize' items are waiting between any two.
+
+    'buck', 'downloads', and 'newframes' are from aws.NEXRADAWSlist(),
+    and anything 'manifest' says was already downloaded but not plotted
+    is done too.  Everything goes newest first, and each frame that's
+    newer than anything plotted before is handed to 'publish'.
+
+    If 'inMemory' is True, new volumes are fetched into memory and read
+    straight from there.  They're then only written to disk (in the
+    background, off of the critical path) if 'keepRaws' is True, which
+    is needed for re-plotting or quarantining them later.
+
+    'renderer' and 'qcfilters' are the same as in makePlots().
+
+    Returns the number of frames processed.
+    """
+    plt.switch_backend("Agg")
+
+    cLon = mapCenter[0]
+    cLat = mapCenter[1]
+
+    if cmap is None:
+        cmap = getCMap()
+
+    # 'objs' is None if it's already downloaded; obstime is in seconds
+    items = []
+    for (objs, oname), (name, prod, obstime) in zip(downloads, newframes):
+        if prod == station:
+            items.append({'objs': objs, 'rawpath': oname, 'name': name,
+                          'obstime': com.manifest.timestamp(obstime)})
+
+    for name, rawpath, obstime in com.manifest.toRender(manifest, station,
+                                                        force=forceRegen):
+        items.append({'objs': None, 'rawpath': rawpath, 'name': name,
+                      'obstime': obstime})
+
+    items.sort(key=lambda item: item['obstime'], reverse=True)
+    newest = com.manifest.newestRendered(manifest, station)
+
+    # Only one, since this is just keeping the raw files around
+    writer = ThreadPoolExecutor(max_workers=1)
+
+    def fetch(item):
+        if item['objs'] is not None:
+            if inMemory is True:
+                data = com.aws.fetchToMemory(buck, item['objs'])
+                if data is None:
+                    return None
+                item['memory'] = data
+                if keepRaws is True:
+                    item['saved'] = writer.submit(com.aws.saveToDisk, data,
+                                                  item['rawpath'])
+                else:
+                    item['saved'] = None
+            elif com.aws.downloadFromS3(buck, item['objs'],
+                                        item['rawpath']) is False:
+                # Not in the manifest, so it'll be tried again next time
+                return None
+
+        # When it landed, for common.cadence
+        item['arrived'] = time.time()
+
+        return item
+
+    def decode(item):
+        vol, reason = decodeVolume(item['rawpath'],
+                                   memory=item.pop('memory', None),
+                                   qcfilters=qcfilters)
+
+        return item, vol, reason
+
+    stages = [(fetch, nconcurrent), (decode, 1)]
+
+    i = 0
+    for result in com.pipeline.runPipeline(items, stages, qsize=qsize):
+        if isinstance(result, com.pipeline.failedItem):
+            item, vol, reason = result.item, None, result.reason
+        else:
+            item, vol, reason = result
+
+        name = item['name']
+        obstime = item['obstime']
+
+        # All of the manifest stuff has to happen in this thread
+        if item['objs'] is not None:
+            rawpath = item['rawpath']
+            if 'saved' in item:
+                # It has to actually be there before the manifest (or
+                #   markFailed) can do anything with it
+                if item['saved'] is None or item['saved'].result() is False:
+                    rawpath = None
+            elif 'arrived' not in item:
+                # Never made it down at all
+                rawpath = None
+            com.manifest.addDownloaded(manifest, name, station,
+                                       dt.utcfromtimestamp(obstime),
+                                       rawpath, arrived=item.get('arrived'))
+
+        outpname = "%s/%s.png" % (outloc, name)
+        if reason is None:
+            try:
+                drawVolume(vol, outpname, cLat, cLon, roads=roads,
+                           counties=counties, cmap=cmap, cachedir=cachedir,
+                           basemap=basemap, renderer=renderer)
+            except Exception as err:
+                # Anything at all, like in common.pipeline, so that it
+                #   goes through markFailed instead of the whole loop dying
+                reason = "drawVolume failed: %s: %s" % (type(err).__name__,
+                                                        str(err))
+                print(reason)
+
+        if reason is None:
+            com.manifest.markRendered(manifest, name, outpname)
+
+            if publish is not None:
+                if newest is None or obstime > newest:
+                    print("Publishing the newest frame early...")
+                    publish(outpname)
+                    newest = obstime
+        else:
+            com.manifest.markFailed(manifest, name, reason,
+                                    quarantine=quarantine)
+
+        i += 1
+
+    writer.shutdown(wait=True)
+
     return i
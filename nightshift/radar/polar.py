@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Direct polar-to-raster mapping of a single radar sweep.
+
+For a fixed site and output image, which (azimuth, gate) lands in each
+pixel depends only on the beam geometry, not on the data.  So that's
+worked out once (and cached), and each frame is then just one gather from
+the sweep into the image instead of a pcolormesh of every gate.
+
+The beam height uses the same 4/3 effective earth radius model as Py-ART
+(pyart.core.antenna_to_cartesian), so things land where they would in
+RadarMapDisplay.plot_ppi_map.
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import numpy as np
+
+import cartopy.crs as ccrs
+
+from .. import common as com
+
+
+# Same earth radius that Py-ART uses, and the 4/3 model radius from it
+EARTH_RADIUS = 6371000.
+EFFECTIVE_RADIUS = EARTH_RADIUS*4./3.
+
+# Lookups we've already made, keyed by their fingerprint
+_lookups = {}
+
+
+def azimuthDistance(lons, lats, siteLon, siteLat):
+    """
+    Azimuth (degrees clockwise from north) and great circle distance
+    (meters) from the site to each of the given points.
+    """
+    phi1 = np.deg2rad(siteLat)
+    phi2 = np.deg2rad(lats)
+    dlam = np.deg2rad(lons - siteLon)
+
+    azimuth = np.arctan2(np.sin(dlam)*np.cos(phi2),
+                         np.cos(phi1)*np.sin(phi2) -
+                         np.sin(phi1)*np.cos(phi2)*np.cos(dlam))
+    azimuth = np.mod(np.rad2deg(azimuth), 360.)
+
+    # Haversine, since it behaves right next to the site
+    hav = np.sin((phi2 - phi1)/2.)**2 + \
+        np.cos(phi1)*np.cos(phi2)*np.sin(dlam/2.)**2
+    dist = 2.*EARTH_RADIUS*np.arcsin(np.sqrt(np.clip(hav, 0., 1.)))
+
+    return azimuth, dist
+
+
+def groundToSlant(dist, elevation):
+    """
+    Slant range (meters) along a beam at 'elevation' degrees to a point
+    that's 'dist' meters away along the ground; the inverse of what
+    pyart.core.antenna_to_cartesian does.  Points the beam never gets to
+    come back as inf.
+    """
+    theta = dist/EFFECTIVE_RADIUS
+    el = np.deg2rad(elevation)
+
+    with np.errstate(divide='ignore'):
+        denom = np.cos(el + theta)
+        srange = np.where(denom > 0., EFFECTIVE_RADIUS*np.sin(theta)/denom,
+                          np.inf)
+
+    return srange
+
+
+def azimuthResolution(nrays):
+    """
+    Super resolution sweeps are 720 rays (0.5 deg), the rest are 360.
+    """
+    if nrays >= 540:
+        return 0.5
+    else:
+        return 1.0
+
+
+def polarLookup(crs, extent, shape, site, siteLat, siteLon, elevation,
+                firstGate, gateSpacing, ngates, azres=0.5, cachedir=None):
+    """
+    For each pixel of an image of 'shape' (rows, cols) that covers
+    'extent' = (x0, x1, y0, y1) in 'crs' coordinates, find the azimuth bin
+    (of width azres degrees) and the gate of the sweep that lands there.
+    The gates are given by the range of the first one, the spacing, and
+    how many of them there are, all in meters.
+
+    Returns a dict of 'azbin' and 'gate' arrays of that shape, where a gate
+    of -1 means that the sweep doesn't cover that pixel at all.  They're
+    kept in memory and in 'cachedir' (if given) for next time.
+    """
+    # Fixed angles wander a little bit from volume to volume
+    key = com.cache.fingerprint("polar", site, round(float(siteLat), 4),
+                                round(float(siteLon), 4),
+                                round(float(elevation), 1),
+                                float(firstGate), float(gateSpacing),
+                                int(ngates), azres, crs.proj4_init,
+                                tuple(np.round(extent, decimals=3)),
+                                tuple(shape))
+
+    if key in _lookups:
+        return _lookups[key]
+
+    cached = com.cache.loadArrays(cachedir, key, ['azbin', 'gate'])
+    if cached is not None:
+        print("Loaded cached polar lookup %s" % (key))
+        _lookups.update({key: cached})
+        return cached
+
+    print("Calculating polar lookup...")
+    nrows, ncols = shape
+    x0, x1, y0, y1 = extent
+
+    # Pixel centers; image rows go from the top down
+    xs = x0 + (np.arange(ncols) + 0.5)*(x1 - x0)/ncols
+    ys = y1 - (np.arange(nrows) + 0.5)*(y1 - y0)/nrows
+    xx, yy = np.meshgrid(xs, ys)
+
+    lonlat = ccrs.PlateCarree().transform_points(crs, xx, yy)
+    azimuth, dist = azimuthDistance(lonlat[..., 0], lonlat[..., 1],
+                                    siteLon, siteLat)
+
+    srange = groundToSlant(dist, elevation)
+    with np.errstate(invalid='ignore'):
+        gate = np.round((srange - firstGate)/gateSpacing)
+    gate = np.where(np.isfinite(gate) & (gate >= 0) & (gate < ngates),
+                    gate, -1).astype(np.int32)
+
+    nbins = int(round(360./azres))
+    azbin = np.floor(azimuth/azres).astype(np.int32) % nbins
+
+    lookup = {'azbin': azbin, 'gate': gate}
+    if cachedir is not None:
+        com.cache.saveArrays(cachedir, key, lookup)
+    _lookups.update({key: lookup})
+
+    return lookup
+
+
+def raysForBins(azimuths, azres):
+    """
+    Index of the ray nearest to the center of each azimuth bin, or -1 if
+    there isn't one within a bin width (like in a sector scan).
+    The azimuths are different in every volume, but there are only a few
+    hundred of them so this is cheap.
+    """
+    azimuths = np.mod(np.asarray(azimuths, dtype=np.float64), 360.)
+    nbins = int(round(360./azres))
+    centers = (np.arange(nbins) + 0.5)*azres
+
+    # Wrapped around on both ends, so it works right across north
+    order = np.argsort(azimuths)
+    saz = azimuths[order]
+    wrapped = np.concatenate([saz[-1:] - 360., saz, saz[:1] + 360.])
+    windex = np.concatenate([order[-1:], order, order[:1]])
+
+    pos = np.searchsorted(wrapped, centers)
+    left = centers - wrapped[pos - 1]
+    right = wrapped[pos] - centers
+    nearest = np.where(left <= right, pos - 1, pos)
+
+    rays = windex[nearest]
+    rays[np.minimum(left, right) > azres] = -1
+
+    return rays
+
+
+def gatherSweep(field, azimuths, lookup, azres):
+    """
+    Pull the (masked, rays by gates) sweep 'field' into the image given
+    by lookup (from polarLookup).  Returns a masked array that's masked
+    wherever the field is, or where there's no data at all.
+    """
+    rays = raysForBins(azimuths, azres)
+    ray = rays[lookup['azbin']]
+    gate = lookup['gate']
+
+    nodata = (ray < 0) | (gate < 0)
+    ray = np.where(nodata, 0, ray)
+    gate = np.where(nodata, 0, gate)
+
+    data = np.ma.getdata(field)[ray, gate]
+    mask = np.ma.getmaskarray(field)[ray, gate] | nodata
+
+    return np.ma.masked_array(data, mask=mask)
+
+
+def sweepImage(vol, crs, layer, field='reflectivity_masked', cachedir=None):
+    """
+    Put the lowest sweep of 'field' from a decoded volume (see
+    plot.decodeVolume) into the axes of the basemap 'layer', which is in
+    'crs' coordinates.  Returns the masked image and the slant range (m)
+    of the gate in each pixel, which is inf wherever there isn't one.
+    """
+    radar = vol['radar']
+
+    x0, y0, x1, y1 = layer['bbox']
+    shape = (y1 - y0, x1 - x0)
+
+    ranges = radar.range['data']
+    spacing = ranges[1] - ranges[0]
+    azimuths = radar.get_azimuth(0)
+    azres = azimuthResolution(azimuths.size)
+    lookup = polarLookup(crs, layer['extent'], shape, vol['site'],
+                         vol['siteLat'], vol['siteLon'],
+                         radar.fixed_angle['data'][0],
+                         ranges[0], spacing, ranges.size,
+                         azres=azres, cachedir=cachedir)
+
+    pdat = gatherSweep(radar.get_field(0, field), azimuths, lookup, azres)
+    srange = np.where(lookup['gate'] >= 0,
+                      ranges[0] + lookup['gate']*spacing, np.inf)
+
+    return pdat, srange
+
+
+def sitePixel(crs, layer, siteLon, siteLat):
+    """
+    (column, row) of the given lon/lat within the axes of the basemap
+    'layer', which is in 'crs' coordinates.
+    """
+    x0, y0, x1, y1 = layer['bbox']
+    ext = layer['extent']
+    sx, sy = crs.transform_point(siteLon, siteLat, ccrs.PlateCarree())
+
+    return ((sx - ext[0])/(ext[1] - ext[0])*(x1 - x0),
+            (ext[3] - sy)/(ext[3] - ext[2])*(y1 - y0))
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Configurable quality control of a radar sweep.
+
+Each filter is a dict (usually one section of a config file, see
+config/radarqc.conf-TEMPLATE) that flags gates as not-weather:
+    threshold: the 'field' is 'below', 'above', or 'absabove' a value
+    range: the gate is closer than 'min' or farther than 'max' (meters)
+    speckle: fewer than 'minneighbours' of the 8 surrounding gates
+             survived all of the filters before it
+
+Filters can be limited to (or skip) certain VCPs with 'vcps' or
+'skipvcps', like the clear air ones.  Everything is done into a single
+mask, one filter after another, with one scratch array that's reused the
+whole way through; how many gates each filter threw out (that weren't
+already gone) is counted along the way, which is handy for tuning.
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import numpy as np
+
+
+# Clear air mode VCPs, which can have perfectly good returns < 0 dBZ; see
+#   https://www.weather.gov/jetstream/vcp_max
+clearAirVCPs = [31, 32, 35]
+
+# Same as the original hardcoded filtering, as done in the example by
+#   Valliappa Lakshmanan; see literallyDeBug in plot.py
+defaultFilters = [{'name': 'refLowClearAir', 'type': 'threshold',
+                   'field': 'reflectivity', 'below': -35.,
+                   'vcps': clearAirVCPs},
+                  {'name': 'refLow', 'type': 'threshold',
+                   'field': 'reflectivity', 'below': -15.,
+                   'skipvcps': clearAirVCPs},
+                  {'name': 'zdrCut', 'type': 'threshold',
+                   'field': 'differential_reflectivity', 'absabove': 2.3},
+                  {'name': 'rhohvLow', 'type': 'threshold',
+                   'field': 'cross_correlation_ratio', 'below': 0.925}]
+
+
+def parseFilters(conf):
+    """
+    Turn a parsed config (like from ligmos' confparsers.rawParser), with
+    one section per filter in the order they should be done, into the
+    list of filter dicts that applyFilters wants.  Sections with
+    'enabled = False' are left out.
+    """
+    floats = ['below', 'above', 'absabove', 'min', 'max']
+    ints = ['minneighbours']
+    lists = ['vcps', 'skipvcps']
+
+    filters = []
+    for name in conf.sections():
+        sect = conf[name]
+        if sect.get('enabled', 'True').lower() == 'false':
+            continue
+
+        filt = {'name': name}
+        for key in sect:
+            val = sect[key]
+            if key in floats:
+                filt.update({key: float(val)})
+            elif key in ints:
+                filt.update({key: int(val)})
+            elif key in lists:
+                filt.update({key: [int(v) for v in val.split(",")]})
+            elif key != 'enabled':
+                filt.update({key: val.strip()})
+        filters.append(filt)
+
+    return filters
+
+
+def neededFields(filters):
+    """
+    Every field that the filters look at, plus reflectivity itself.
+    """
+    fields = ['reflectivity']
+    for filt in filters:
+        if 'field' in filt and filt['field'] not in fields:
+            fields.append(filt['field'])
+
+    return fields
+
+
+def _threshold(filt, radar, sweep, scratch):
+    """
+    Flag (in scratch) the gates that fail the test, and those where the
+    field itself is missing like masked_where would have.
+    """
+    fdat = radar.get_field(sweep, filt['field'])
+    vals = np.ma.getdata(fdat)
+
+    with np.errstate(invalid='ignore'):
+        if 'below' in filt:
+            np.less(vals, filt['below'], out=scratch)
+        elif 'above' in filt:
+            np.greater(vals, filt['above'], out=scratch)
+        elif 'absabove' in filt:
+            np.greater(np.abs(vals), filt['absabove'], out=scratch)
+        else:
+            scratch[:] = False
+
+    scratch |= np.ma.getmaskarray(fdat)
+
+
+def _range(filt, radar, sweep, scratch):
+    """
+    """
+    ranges = radar.range['data']
+    scratch[:] = False
+    if 'min' in filt:
+        scratch[:, ranges < filt['min']] = True
+    if 'max' in filt:
+        scratch[:, ranges > filt['max']] = True
+
+
+def _speckle(filt, mask, scratch):
+    """
+    Flag gates with fewer than 'minneighbours' good neighbours, counting
+    the rays around in a circle but not past either end of the gates.
+    """
+    good = ~mask
+    padded = np.zeros((good.shape[0] + 2, good.shape[1] + 2), dtype=np.uint8)
+    padded[1:-1, 1:-1] = good
+    padded[0, 1:-1] = good[-1]
+    padded[-1, 1:-1] = good[0]
+
+    nrays, ngates = good.shape
+    count = np.zeros(good.shape, dtype=np.uint8)
+    for di in range(3):
+        for dj in range(3):
+            if di != 1 or dj != 1:
+                count += padded[di:di + nrays, dj:dj + ngates]
+
+    np.less(count, filt.get('minneighbours', 2), out=scratch)
+
+
+def applyFilters(radar, filters, vcpmode, sweep=0, field='reflectivity'):
+    """
+    Run the filters over the given sweep of radar, and return 'field'
+    masked wherever any of them flagged it along with a dict of how many
+    gates each filter threw out that weren't already.
+
+    Filters that need a field the radar doesn't have are skipped.
+    """
+    fdat = radar.get_field(sweep, field)
+
+    # The only full-size arrays made in here: the answer, and scratch
+    mask = np.ma.getmaskarray(fdat).copy()
+    scratch = np.empty(mask.shape, dtype=bool)
+
+    counts = {}
+    for filt in filters:
+        if 'vcps' in filt and vcpmode not in filt['vcps']:
+            continue
+        if 'skipvcps' in filt and vcpmode in filt['skipvcps']:
+            continue
+
+        try:
+            if filt['type'] == 'threshold':
+                _threshold(filt, radar, sweep, scratch)
+            elif filt['type'] == 'range':
+                _range(filt, radar, sweep, scratch)
+            elif filt['type'] == 'speckle':
+                _speckle(filt, mask, scratch)
+            else:
+                print("Unknown QC filter type %s!" % (filt['type']))
+                continue
+        except KeyError as err:
+            print("Skipping QC filter %s; missing %s" % (filt['name'],
+                                                         str(err)))
+            continue
+
+        # Only the ones that are new count against this filter
+        np.greater(scratch, mask, out=scratch)
+        counts.update({filt['name']: int(np.count_nonzero(scratch))})
+        mask |= scratch
+
+    return np.ma.masked_array(np.ma.getdata(fdat), mask=mask), counts
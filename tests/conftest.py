@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Bits of fake NEXRAD Archive II data, for the radar tests.
+
+Just enough of the real layout (see nightshift.radar.level2) for the
+record walking to work; none of it would get past Py-ART.
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import bz2
+import struct
+from types import SimpleNamespace
+
+import pytest
+
+
+def metadataRecord():
+    """
+    Like the first record of a volume; one non-type 31 message.
+    """
+    return b'\0'*12 + struct.pack(">HBB", 1208, 0, 15) + b'\0'*(2432 - 16)
+
+
+def radialRecord(elevation, nradials=3):
+    """
+    'nradials' type 31 messages, all from the given elevation number.
+    """
+    record = b''
+    for _ in range(nradials):
+        body = bytearray(40)
+        body[22] = elevation
+        size = (16 + len(body))//2
+        record += b'\0'*12 + struct.pack(">HBB", size, 0, 31) + \
+            b'\0'*12 + bytes(body)
+
+    return record
+
+
+def ldmRecord(record, last=False):
+    """
+    Compressed, with the control word (size) in front.
+    """
+    packed = bz2.compress(record)
+    size = len(packed)
+    if last is True:
+        size = -size
+
+    return struct.pack(">i", size) + packed
+
+
+def volumeHeader():
+    """
+    """
+    return b'AR2V0006.123' + b'\0'*12
+
+
+def volume(elevations):
+    """
+    Whole volume with one record for each elevation number given.
+    """
+    data = volumeHeader() + ldmRecord(metadataRecord())
+    for i, elev in enumerate(elevations):
+        data += ldmRecord(radialRecord(elev),
+                          last=(i == len(elevations) - 1))
+
+    return data
+
+
+@pytest.fixture
+def archive():
+    return SimpleNamespace(metadataRecord=metadataRecord,
+                           radialRecord=radialRecord,
+                           ldmRecord=ldmRecord,
+                           volumeHeader=volumeHeader,
+                           volume=volume)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Tests for nightshift.common.animate
+"""
+
+from __future__ import division, print_function, absolute_import
+
+from PIL import Image
+
+from nightshift.common import animate
+
+
+def quietFrame():
+    """
+    Like a clear air radar frame; just the background and a gray road.
+    """
+    img = Image.new("RGB", (32, 32), (38, 38, 41))
+    img.paste((128, 128, 128), (0, 15, 32, 17))
+
+    return img
+
+
+def stormFrame():
+    """
+    Same as quietFrame, but with colors that one never had in it.
+    """
+    img = quietFrame()
+    img.paste((160, 0, 0), (4, 4, 12, 12))
+    img.paste((0, 200, 90), (20, 20, 28, 28))
+
+    return img
+
+
+def test_laterFrameColors():
+    anim = animate.rollingAnimation(4)
+    anim.addFrame("a.png", quietFrame())
+    anim.addFrame("b.png", stormFrame())
+
+    pimg = anim.frames[-1][1].convert("RGB")
+    assert pimg.getpixel((8, 8)) == (160, 0, 0)
+    assert pimg.getpixel((24, 24)) == (0, 200, 90)
+    assert pimg.getpixel((0, 0)) == (38, 38, 41)
+
+
+def test_laterFrameColorsInGIF(tmp_path):
+    anim = animate.rollingAnimation(4)
+    anim.addFrame("a.png", quietFrame())
+    anim.addFrame("b.png", stormFrame())
+
+    outname = str(tmp_path / "anim.gif")
+    anim.write(outname)
+
+    with Image.open(outname) as gif:
+        assert gif.n_frames == 2
+        gif.seek(1)
+        rgb = gif.convert("RGB")
+        assert rgb.getpixel((8, 8)) == (160, 0, 0)
+        assert rgb.getpixel((24, 24)) == (0, 200, 90)
+
+
+def test_rolling(tmp_path):
+    names = []
+    for i in range(6):
+        fname = str(tmp_path / ("frame%02d.png" % (i)))
+        quietFrame().save(fname)
+        names.append(fname)
+
+    anim = animate.rollingAnimation(4)
+    assert anim.update(names[:3]) == 3
+
+    # Three new ones, and the two oldest fall off
+    assert anim.update(names) == 5
+    assert len(anim.frames) == 4
+    assert anim.newest() == "frame05.png"
+
+
+def test_lateFrame(tmp_path):
+    names = []
+    for i in range(5):
+        fname = str(tmp_path / ("frame%02d.png" % (i)))
+        quietFrame().save(fname)
+        names.append(fname)
+
+    anim = animate.rollingAnimation(4)
+    late = names.pop(2)
+    assert anim.update(names) == 4
+
+    # Rendered after a retry, so it's older than the newest one
+    stormFrame().save(late)
+    names.insert(2, late)
+    assert anim.update(names) == 2
+    assert [f[0] for f in anim.frames] == ["frame01.png", "frame02.png",
+                                           "frame03.png", "frame04.png"]
+    assert anim.frames[1][1].convert("RGB").getpixel((8, 8)) == (160, 0, 0)
+
+    # Nothing new means nothing to write
+    assert anim.update(names) == 0
+
+
+def test_expiredFrame(tmp_path):
+    names = []
+    for i in range(3):
+        fname = str(tmp_path / ("frame%02d.png" % (i)))
+        quietFrame().save(fname)
+        names.append(fname)
+
+    anim = animate.rollingAnimation(4)
+    assert anim.update(names) == 3
+    assert anim.update(names[1:]) == 1
+    assert [f[0] for f in anim.frames] == ["frame01.png", "frame02.png"]
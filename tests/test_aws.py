@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Tests for nightshift.common.aws, without actually talking to S3
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import os
+import threading
+from types import SimpleNamespace
+
+import botocore
+
+from nightshift.common import aws
+
+
+class barrierClient():
+    """
+    Just enough of an S3 client for downloadFromS3.  Every download waits
+    for 'nconcurrent' of them to be going at once, so doing them one at a
+    time breaks the barrier instead of hanging.
+    """
+    def __init__(self, nconcurrent, missing=()):
+        self.barrier = threading.Barrier(nconcurrent, timeout=5)
+        self.missing = missing
+
+    def download_file(self, bucket, key, oname, Config=None):
+        self.barrier.wait()
+        if key in self.missing:
+            raise botocore.exceptions.ClientError({'Error': {'Code': "404"}},
+                                                  "HeadObject")
+        with open(oname, 'w') as f:
+            f.write(key)
+
+
+def test_downloadMany(tmp_path):
+    client = barrierClient(3, missing=("b",))
+    buck = SimpleNamespace(name="noaa-nexrad-level2",
+                           meta=SimpleNamespace(client=client))
+    jobs = [(SimpleNamespace(key=k), str(tmp_path / k)) for k in "abc"]
+
+    results = aws.downloadManyFromS3(buck, jobs, nconcurrent=3)
+    assert results == [True, False, True]
+    assert sorted(os.listdir(str(tmp_path))) == ["a", "c"]
+
+
+def test_connectCached():
+    first = aws.connectS3("noaa-goes16", "us-east-1", "key", "secret")
+    assert aws.connectS3("noaa-goes16", "us-east-1", "key", "secret") is first
+    assert aws.connectS3("noaa-nexrad-level2", "us-east-1",
+                         "key", "secret") is not first
+
+
+def test_saveToDisk(tmp_path):
+    oname = str(tmp_path / "KFSX20261018_180000")
+    assert aws.saveToDisk(b"AR2V0006.", oname) is True
+    assert os.listdir(str(tmp_path)) == ["KFSX20261018_180000"]
+    with open(oname, 'rb') as f:
+        assert f.read() == b"AR2V0006."
+
+    # Nowhere to put it
+    assert aws.saveToDisk(b"AR2V0006.", str(tmp_path / "no" / "x")) is False
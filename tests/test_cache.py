@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Tests for nightshift.common.cache, and the coefficient cache on top of it
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import os
+
+import numpy as np
+import pyresample as pr
+
+from nightshift.common import cache
+from nightshift.goes import plot
+
+
+def test_fingerprint():
+    key = cache.fingerprint("coeffs", (1, 2), 5000.)
+    assert key == cache.fingerprint("coeffs", (1, 2), 5000.)
+    assert key != cache.fingerprint("coeffs", (1, 2), 5001.)
+    assert key != cache.fingerprint("coeffs", (2, 1), 5000.)
+
+
+def test_arrays(tmp_path):
+    arrs = {'index': np.arange(10), 'dist': np.linspace(0., 1., 10)}
+    cache.saveArrays(str(tmp_path), "abc", arrs)
+
+    # Nothing half-written left lying around
+    assert os.listdir(str(tmp_path)) == ["abc"]
+
+    loaded = cache.loadArrays(str(tmp_path), "abc", ['index', 'dist'])
+    assert isinstance(loaded['index'], np.memmap)
+    assert (loaded['index'] == arrs['index']).all()
+    assert np.allclose(loaded['dist'], arrs['dist'])
+
+    # Any one missing means the whole thing is
+    assert cache.loadArrays(str(tmp_path), "abc", ['index', 'foo']) is None
+    assert cache.loadArrays(str(tmp_path), "xyz", ['index']) is None
+    assert cache.loadArrays(None, "abc", ['index']) is None
+
+
+def test_params(tmp_path):
+    params = {'width': 1000, 'extent': [-1.5, -2., 1.5, 2.]}
+    cache.saveParams(str(tmp_path), "area", params)
+
+    assert cache.loadParams(str(tmp_path), "area") == params
+    assert cache.loadParams(str(tmp_path), "other") is None
+
+    # Truncated JSON is the same as not being there
+    with open(os.path.join(str(tmp_path), "area.json"), 'w') as f:
+        f.write('{"width": 10')
+    assert cache.loadParams(str(tmp_path), "area") is None
+
+
+def test_cachedCoeffs(tmp_path, monkeypatch):
+    src = pr.geometry.AreaDefinition('src', 'src', 'src',
+                                     {'proj': 'eqc', 'units': 'm'},
+                                     40, 40, (-40e3, -40e3, 40e3, 40e3))
+    tgt = pr.geometry.AreaDefinition('tgt', 'tgt', 'tgt',
+                                     {'proj': 'eqc', 'units': 'm'},
+                                     30, 30, (-15e3, -15e3, 15e3, 15e3))
+
+    pCoeff, pKey = plot.getCoeffs(src, tgt, cachedir=str(tmp_path))
+
+    # From now on they have to come from somewhere other than the KD-tree
+    def noTree(*args, **kwargs):
+        raise AssertionError("Recalculated the coefficients!")
+    monkeypatch.setattr(pr.kd_tree, "get_neighbour_info", noTree)
+
+    reused, rKey = plot.getCoeffs(src, tgt, pCoeff=pCoeff, pKey=pKey)
+    assert reused is pCoeff and rKey == pKey
+
+    loaded, lKey = plot.getCoeffs(src, tgt, cachedir=str(tmp_path))
+    assert lKey == pKey
+    for got, want in zip(loaded, pCoeff):
+        assert (np.asarray(got) == np.asarray(want)).all()
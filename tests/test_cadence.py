@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Tests for nightshift.common.cadence
+"""
+
+from __future__ import division, print_function, absolute_import
+
+from datetime import datetime as dt
+
+import pytest
+
+from nightshift.common import cadence, manifest
+
+
+# Newest frame of the history below, in seconds since the epoch
+LATEST = manifest.timestamp(dt(2026, 10, 18, 18, 0, 0))
+
+
+@pytest.fixture
+def mdb(tmp_path):
+    db = manifest.openManifest(str(tmp_path / "manifest.sqlite"))
+
+    # Every 5 minutes, showing up 60-90 s later; one is missing
+    for i in range(10):
+        if i == 4:
+            continue
+        obstime = LATEST - i*300.
+        manifest.addDownloaded(db, "C13_%02d" % (i), "C13",
+                               dt.utcfromtimestamp(obstime), None,
+                               arrived=obstime + 60. + (i % 3)*15.)
+
+    yield db
+    db.close()
+
+
+def test_learnCadence(mdb):
+    latest, interval, latency = cadence.learnCadence(mdb, "C13")
+    assert latest == LATEST
+    assert interval == 300.
+    assert latency == 60.
+
+
+def test_notEnoughHistory(mdb):
+    assert cadence.learnCadence(mdb, "C02") is None
+    assert cadence.nextPoll(mdb, ["C02"], now=LATEST, default=90.) == 90.
+
+
+def test_nextPoll(mdb):
+    # Next one is due at LATEST + 360; wake up 15 s before that
+    assert cadence.nextPoll(mdb, ["C13"], now=LATEST + 100.) == 245.
+
+    # Due, but not in yet; keep checking
+    assert cadence.nextPoll(mdb, ["C13"], now=LATEST + 400.) == 20.
+
+    # More than half an interval late, so wait for the one after it
+    assert cadence.nextPoll(mdb, ["C13"], now=LATEST + 520.) == \
+        LATEST + 660. - 15. - (LATEST + 520.)
+
+
+def test_nextPollLimits(mdb):
+    assert cadence.nextPoll(mdb, ["C13"], now=LATEST + 355.,
+                            retry=1.) == 10.
+    assert cadence.nextPoll(mdb, ["C13"], now=LATEST + 100.,
+                            maxSleep=60.) == 60.
+
+    # The soonest of several products wins
+    assert cadence.nextPoll(mdb, ["C13", "C02"], now=LATEST + 100.,
+                            default=90.) == 90.
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Tests for nightshift.radar.chunks, against a local chunk directory
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import os
+from datetime import datetime as dt
+from datetime import timedelta as td
+
+import pytest
+
+from nightshift.common import manifest
+from nightshift.radar import chunks
+
+
+def addChunk(root, volume, vtime, num, kind, data):
+    vdir = os.path.join(str(root), "KFSX", str(volume))
+    os.makedirs(vdir, exist_ok=True)
+    fname = "%s-%03d-%s" % (vtime.strftime("%Y%m%d-%H%M%S"), num, kind)
+    with open(os.path.join(vdir, fname), 'wb') as f:
+        f.write(data)
+
+
+def startChunk(archive):
+    return archive.volumeHeader() + \
+        archive.ldmRecord(archive.metadataRecord())
+
+
+def test_parseChunkKey():
+    chunk = chunks.parseChunkKey("KFSX/582/20261018-181233-007-I")
+    assert chunk == {'station': 'KFSX', 'volume': 582,
+                     'vtime': dt(2026, 10, 18, 18, 12, 33),
+                     'chunk': 7, 'kind': 'I',
+                     'key': "KFSX/582/20261018-181233-007-I"}
+
+    assert chunks.parseChunkKey("KFSX/582/20261018-181233-001-S")['kind'] \
+        == 'S'
+    assert chunks.parseChunkKey("KFSX/582/.20261018-181233-007-I.part") \
+        is None
+    assert chunks.parseChunkKey("2026/10/18/KFSX/KFSX20261018_181233_V06") \
+        is None
+
+
+def test_nextVolume():
+    assert chunks.nextVolume(1) == 2
+    assert chunks.nextVolume(998) == 999
+    assert chunks.nextVolume(999) == 1
+
+
+@pytest.mark.parametrize("newest", [1, 2, 5, 996, 999])
+def test_newestVolumeWraps(tmp_path, archive, newest):
+    # Eight volumes, six minutes apart, ending at 'newest'
+    start = dt(2026, 10, 18, 18, 0, 0)
+    vol = newest
+    for i in range(8):
+        addChunk(tmp_path, vol, start - td(minutes=6*i), 1, 'S',
+                 startChunk(archive))
+        vol = (vol - 2) % chunks.MAX_VOLUME + 1
+
+    assert chunks.newestVolume(str(tmp_path), "KFSX") == newest
+
+
+def test_newestVolumeEmpty(tmp_path):
+    assert chunks.newestVolume(str(tmp_path), "KFSX") is None
+
+
+def test_lowestSweepReady(archive):
+    held = {1: {'kind': 'S', 'key': '1', 'data': startChunk(archive)},
+            2: {'kind': 'I', 'key': '2',
+                'data': archive.ldmRecord(archive.radialRecord(1))}}
+    assert chunks.lowestSweepReady(held) == 0
+
+    # A gap means it isn't ready, even with the next cut in there
+    held[4] = {'kind': 'I', 'key': '4',
+               'data': archive.ldmRecord(archive.radialRecord(2))}
+    assert chunks.lowestSweepReady(held) == 0
+
+    held[3] = {'kind': 'I', 'key': '3',
+               'data': archive.ldmRecord(archive.radialRecord(1)) +
+               archive.ldmRecord(archive.radialRecord(2))}
+    assert chunks.lowestSweepReady(held) == 3
+
+
+def test_pollChunks(tmp_path, archive):
+    vtime = dt(2026, 10, 18, 18, 0, 0)
+    addChunk(tmp_path, 998, vtime - td(minutes=6), 1, 'S',
+             startChunk(archive))
+    addChunk(tmp_path, 999, vtime, 1, 'S', startChunk(archive))
+
+    state = chunks.newIngestState()
+    assert chunks.pollChunks(str(tmp_path), "KFSX", state) is None
+    assert state['volume'] == 999
+
+    lowest = archive.ldmRecord(archive.radialRecord(1))
+    nextcut = archive.ldmRecord(archive.radialRecord(2))
+    addChunk(tmp_path, 999, vtime, 2, 'I', lowest)
+    assert chunks.pollChunks(str(tmp_path), "KFSX", state) is None
+
+    addChunk(tmp_path, 999, vtime, 3, 'I', lowest + nextcut)
+    addChunk(tmp_path, 999, vtime, 4, 'I', nextcut)
+    name, obstime, data = chunks.pollChunks(str(tmp_path), "KFSX", state)
+    assert name == "KFSX20261018_180000"
+    assert obstime == vtime
+    assert data == startChunk(archive) + lowest + lowest + nextcut
+
+    # Chunks past the lowest sweep are never even fetched
+    assert 4 not in state['chunks']
+
+    # Once it's done, the next volume (wrapped around) is up
+    state['done'] = True
+    assert chunks.pollChunks(str(tmp_path), "KFSX", state) is None
+    assert state['volume'] == 999
+
+    later = vtime + td(minutes=6)
+    addChunk(tmp_path, 1, later, 1, 'S', startChunk(archive))
+    addChunk(tmp_path, 1, later, 2, 'E', lowest)
+    name, obstime, data = chunks.pollChunks(str(tmp_path), "KFSX", state)
+    assert state['volume'] == 1
+    assert name == "KFSX20261018_180600"
+
+
+def test_replayChunks(tmp_path, archive):
+    recorded = tmp_path / "recorded"
+    replayed = tmp_path / "replayed"
+    vtime = dt(2026, 10, 18, 18, 0, 0)
+    addChunk(recorded, 999, vtime, 1, 'S', startChunk(archive))
+    addChunk(recorded, 999, vtime, 2, 'E', b'x')
+    addChunk(recorded, 1, vtime + td(minutes=6), 1, 'S',
+             startChunk(archive))
+
+    chunks.replayChunks(str(recorded), str(replayed), "KFSX", interval=0.)
+
+    assert chunks.listChunks(str(replayed), "KFSX", 999).keys() == {1, 2}
+    assert chunks.listChunks(str(replayed), "KFSX", 1).keys() == {1}
+    assert chunks.newestVolume(str(replayed), "KFSX") == 1
+
+
+def test_contiguousChunks():
+    held = {1: {'kind': 'S', 'data': b'a'}, 2: {'kind': 'I', 'data': b'b'},
+            4: {'kind': 'I', 'data': b'd'}}
+    assert chunks.contiguousChunks(held) == 2
+
+    held[3] = {'kind': 'E', 'data': b'c'}
+    assert chunks.contiguousChunks(held) == 3
+    assert chunks.contiguousChunks({}) == 0
+
+
+def test_retryWaitsForChunks(tmp_path, archive, monkeypatch):
+    vtime = dt(2026, 10, 18, 18, 0, 0)
+    lowest = archive.ldmRecord(archive.radialRecord(1))
+    nextcut = archive.ldmRecord(archive.radialRecord(2))
+    addChunk(tmp_path, 5, vtime, 1, 'S', startChunk(archive))
+    addChunk(tmp_path, 5, vtime, 2, 'I', lowest + nextcut)
+
+    tried = []
+
+    def decodeVolume(rawpath, memory=None, qcfilters=None):
+        tried.append(memory)
+        return None, "Truncated volume"
+
+    monkeypatch.setattr(chunks.plot, "decodeVolume", decodeVolume)
+
+    mdb = manifest.openManifest(str(tmp_path / "manifest.sqlite"))
+    rawloc = tmp_path / "raw"
+    rawloc.mkdir()
+    rawpath = str(rawloc / "KFSX20261018_180000")
+    args = (str(tmp_path), "KFSX", chunks.newIngestState(), str(rawloc),
+            str(tmp_path), [-111.4, 34.7], mdb)
+    state = args[2]
+
+    assert chunks.ingestChunks(*args, cmap=(None, None)) == 0
+    assert state['failedAt'] == 2
+    assert state['done'] is False
+    assert len(tried) == 1
+
+    # Not recorded yet, but the raw is kept for the next go
+    assert "KFSX20261018_180000" not in manifest.knownNames(mdb)
+    assert os.path.exists(rawpath)
+
+    # Nothing new, so it isn't even tried
+    assert chunks.ingestChunks(*args, cmap=(None, None)) == 0
+    assert len(tried) == 1
+
+    addChunk(tmp_path, 5, vtime, 3, 'I', nextcut)
+    assert chunks.ingestChunks(*args, cmap=(None, None)) == 0
+    assert len(tried) == 2
+    assert tried[-1] == startChunk(archive) + lowest + nextcut + nextcut
+    assert state['failedAt'] == 3
+
+    # Still no good with the whole thing, so it's bad for good
+    addChunk(tmp_path, 5, vtime, 4, 'E', nextcut)
+    assert chunks.ingestChunks(*args, cmap=(None, None)) == 0
+    assert len(tried) == 3
+    assert state['done'] is True
+
+    row = mdb.execute("SELECT state, rawpath FROM frames WHERE name = ?",
+                      ("KFSX20261018_180000",)).fetchone()
+    assert row == ('bad', rawpath)
+    assert os.path.exists(rawpath)
+    mdb.close()
+
+
+def test_retryGivesUpOnNextVolume(tmp_path, archive):
+    vtime = dt(2026, 10, 18, 18, 0, 0)
+    lowest = archive.ldmRecord(archive.radialRecord(1))
+    nextcut = archive.ldmRecord(archive.radialRecord(2))
+    addChunk(tmp_path, 5, vtime, 1, 'S', startChunk(archive))
+    addChunk(tmp_path, 5, vtime, 2, 'I', lowest + nextcut)
+
+    state = chunks.newIngestState()
+    assert chunks.pollChunks(str(tmp_path), "KFSX", state) is not None
+    state['failedAt'] = state['nready']
+    assert chunks.pollChunks(str(tmp_path), "KFSX", state) is None
+    assert state['complete'] is False
+
+    # It never ended, but the next one's started anyways
+    addChunk(tmp_path, 6, vtime + td(minutes=6), 1, 'S',
+             startChunk(archive))
+    assert chunks.pollChunks(str(tmp_path), "KFSX", state) is not None
+    assert state['complete'] is True
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Tests for nightshift.goes.geos, against pyresample's KD-tree
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import numpy as np
+import pyresample as pr
+
+from nightshift.goes import geos
+
+
+# GOES-16, like in goes_imager_projection
+GEOS = {'proj': 'geos', 'h': 35786023., 'a': 6378137., 'b': 6356752.31414,
+        'lon_0': -75., 'sweep': 'x', 'units': 'm'}
+
+# 2 km ABI pixels, in projection coordinates
+PIXEL = 56e-6*GEOS['h']
+
+
+def sourceArea(clat, clon, npix=80):
+    """
+    A small piece of the ABI fixed grid, npix on a side, centered on the
+    pixel that clat, clon falls in.
+    """
+    x, y, _ = geos.lonlat2geos(np.array([clon]), np.array([clat]),
+                               GEOS['h'], GEOS['a'], GEOS['b'],
+                               GEOS['lon_0'], sweep=GEOS['sweep'])
+    x0 = np.round(x[0]/PIXEL)*PIXEL - npix/2*PIXEL
+    y0 = np.round(y[0]/PIXEL)*PIXEL - npix/2*PIXEL
+    extent = (x0, y0, x0 + npix*PIXEL, y0 + npix*PIXEL)
+
+    return pr.geometry.AreaDefinition('geos', 'abi', 'geos', GEOS,
+                                      npix, npix, extent)
+
+
+def targetArea(clat, clon, npix=120):
+    """
+    Lambert conformal grid (about 1 km) sitting inside sourceArea.
+    """
+    half = npix/2*1000.
+    return pr.geometry.AreaDefinition('lcc', 'target', 'lcc',
+                                      {'proj': 'lcc', 'lat_0': clat,
+                                       'lat_1': clat, 'lat_2': clat,
+                                       'lon_0': clon, 'units': 'm'},
+                                      npix, npix, (-half, -half, half, half))
+
+
+def resample(coeffs, shape, data):
+    return pr.kd_tree.get_sample_from_neighbour_info('nn', shape, data,
+                                                     coeffs[0], coeffs[1],
+                                                     coeffs[2],
+                                                     fill_value=-1)
+
+
+def test_matchesKDTree():
+    src = sourceArea(34.7, -111.4)
+    tgt = targetArea(34.7, -111.4)
+
+    # Every source pixel different, so any mismatch shows
+    data = np.arange(src.width*src.height).reshape(src.shape)
+
+    kdtree = pr.kd_tree.get_neighbour_info(src, tgt, 5000., neighbours=1,
+                                           epsilon=0., nprocs=1)
+    analytic = geos.get_neighbour_info(src, tgt, 5000.)
+
+    expected = resample(kdtree, tgt.shape, data)
+    found = resample(analytic, tgt.shape, data)
+    assert (found == expected).all()
+
+    # Same distances too, for the ones that are there
+    kdist = kdtree[3].reshape(tgt.shape)
+    gdist = analytic[3].reshape(tgt.shape)
+    assert np.allclose(gdist, kdist)
+
+
+def test_offTheEdge():
+    # Target hanging off the east edge; the KD-tree hands the edge pixels
+    #   to whatever's within the radius, and nothing to the rest
+    src = sourceArea(34.7, -111.4, npix=40)
+    tgt = targetArea(34.7, -111.4 + 0.5, npix=120)
+    data = np.arange(src.width*src.height).reshape(src.shape)
+
+    kdtree = pr.kd_tree.get_neighbour_info(src, tgt, 5000., neighbours=1,
+                                           epsilon=0., nprocs=1)
+    analytic = geos.get_neighbour_info(src, tgt, 5000.)
+
+    expected = resample(kdtree, tgt.shape, data)
+    found = resample(analytic, tgt.shape, data)
+    assert (expected == -1).any()
+    assert (found == expected).all()
+
+
+def test_windowInfo():
+    src = sourceArea(34.7, -111.4)
+    tgt = targetArea(34.7, -111.4, npix=40)
+    data = np.arange(src.width*src.height).reshape(src.shape)
+
+    full = geos.get_neighbour_info(src, tgt, 5000.)
+    window, winindex, voi, ia, dist = geos.get_window_info(src, tgt, 5000.)
+
+    # Just the window of the source gives the same answer
+    part = data[window[0]:window[1], window[2]:window[3]]
+    assert window[1] - window[0] < src.height
+    assert (resample((winindex, voi, ia), tgt.shape, part) ==
+            resample(full, tgt.shape, data)).all()
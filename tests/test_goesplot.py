@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Tests for nightshift.goes.plot
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import netCDF4
+import numpy as np
+import matplotlib.pyplot as plt
+import pytest
+import pyresample as pr
+
+from nightshift import common as com
+from nightshift.goes import geos, plot
+
+
+def fakeRender(infile, outpname, *args, **kwargs):
+    """
+    Stands in for renderFrame; just leaves an empty image behind.
+    """
+    open(outpname, 'w').close()
+    return None, None, None
+
+
+@pytest.fixture
+def dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(plot, "renderFrame", fakeRender)
+    inloc = tmp_path / "raws"
+    outloc = tmp_path / "pngs"
+    inloc.mkdir()
+    outloc.mkdir()
+    return inloc, outloc
+
+
+def makeFrames(where, stamps, ext):
+    for stamp in stamps:
+        (where / ("%s_C13.%s" % (stamp, ext))).touch()
+
+
+def plotNewest(inloc, outloc, forceRegen=False):
+    published = []
+    plot.makePlots(str(inloc) + "/", str(outloc), (-111.4, 34.7), cmap='x',
+                   band=13, forceRegen=forceRegen, newestFirst=True,
+                   publish=published.append)
+    return published
+
+
+def test_publishNewest(dirs):
+    inloc, outloc = dirs
+    makeFrames(inloc, ["20262911801000", "20262911806000"], "nc")
+    makeFrames(outloc, ["20262911801000"], "png")
+
+    published = plotNewest(inloc, outloc)
+    assert published == ["%s/20262911806000_C13.png" % (outloc)]
+
+
+def test_skipOlderRetry(dirs):
+    # An old frame being redone can't become the latest image
+    inloc, outloc = dirs
+    makeFrames(inloc, ["20262911801000", "20262911806000"], "nc")
+    makeFrames(outloc, ["20262911806000", "20262911811000"], "png")
+
+    assert plotNewest(inloc, outloc) == []
+
+
+def coeffRender(infile, outpname, *args, **kwargs):
+    """
+    Like fakeRender, but the image says which coefficients it was handed.
+    """
+    with open(outpname, 'w') as f:
+        f.write(str(kwargs['pCoeff']))
+    return "coeffs", "key", None
+
+
+def test_processPool(dirs, monkeypatch):
+    # Pool workers are forked, so they get the stand-in renderFrame too
+    monkeypatch.setattr(plot, "renderFrame", coeffRender)
+    inloc, outloc = dirs
+    stamps = ["2026291180%d000" % (i) for i in range(5)]
+    makeFrames(inloc, stamps, "nc")
+
+    nframes = plot.makePlots(str(inloc) + "/", str(outloc), (-111.4, 34.7),
+                             cmap='x', band=13, nprocs=2)
+    assert nframes == 5
+
+    # The first one made the coefficients and everything after reused them
+    made = []
+    for stamp in stamps:
+        with open("%s/%s_C13.png" % (outloc, stamp)) as f:
+            made.append(f.read())
+    assert made == ["None"] + ["coeffs"]*4
+
+
+def cmiFile(fname, ny=20, nx=30):
+    """
+    Just the bits of an ABI L2 CMI file that the readers look at, with
+    the counts stored the same (unsigned in a short) way.  Returns the
+    counts that are in there, with one filled in pixel.
+    """
+    counts = (np.arange(ny*nx) % 4000).reshape(ny, nx).astype(np.uint16)
+    counts[2, 3] = 4095
+
+    with netCDF4.Dataset(fname, 'w') as nc:
+        nc.createDimension('y', ny)
+        nc.createDimension('x', nx)
+        xvar = nc.createVariable('x', 'f8', ('x',))
+        yvar = nc.createVariable('y', 'f8', ('y',))
+        xvar[:] = -0.03 + 56e-6*np.arange(nx)
+        yvar[:] = 0.09 - 56e-6*np.arange(ny)
+
+        proj = nc.createVariable('goes_imager_projection', 'i4')
+        proj.perspective_point_height = 35786023.
+        proj.latitude_of_projection_origin = 0.
+        proj.longitude_of_projection_origin = -75.
+        proj.sweep_angle_axis = 'x'
+        proj.semi_major_axis = 6378137.
+        proj.semi_minor_axis = 6356752.31414
+
+        cmi = nc.createVariable('CMI', 'i2', ('y', 'x'), fill_value=4095)
+        cmi._Unsigned = "true"
+        cmi.scale_factor = np.float32(0.04)
+        cmi.add_offset = np.float32(150.)
+        cmi.valid_range = np.array([0, 4094], dtype=np.int16)
+        cmi.set_auto_maskandscale(False)
+        cmi[:] = counts.view(np.int16)
+
+    return counts
+
+
+def test_coeffWindow():
+    used = np.zeros((10, 12), dtype=bool)
+    used[3:6, 2:8] = True
+    used[4, 5] = False
+
+    window, winindex = plot.coeffWindow(used.ravel(), used.shape)
+    assert list(window) == [3, 6, 2, 8]
+    assert (winindex == used[3:6, 2:8].ravel()).all()
+
+    # Nothing used at all means everything, just to be safe
+    window, winindex = plot.coeffWindow(np.zeros(120, dtype=bool), (10, 12))
+    assert list(window) == [0, 10, 0, 12]
+    assert winindex.size == 120
+
+
+def test_readCMI(tmp_path):
+    fname = str(tmp_path / "cmi.nc")
+    counts = cmiFile(fname)
+    window = (1, 6, 2, 9)
+
+    with netCDF4.Dataset(fname) as nc:
+        full = plot.readCMI(nc)
+        part = plot.readCMI(nc, window=window)
+        raw = plot.readCMI(nc, window=window, raw=True)
+        pack = plot.cmiPacking(nc)
+
+        # Raw reads can't leave the variable unscaled for the next one
+        assert plot.readCMI(nc).mask[2, 3]
+
+    assert raw.dtype == np.uint16
+    assert (raw == counts[1:6, 2:9]).all()
+    assert (part == full[1:6, 2:9]).all()
+    assert (part.mask == full.mask[1:6, 2:9]).all()
+
+    assert pack['fill'] == 4095 and pack['valid'] == (0, 4094)
+    good = raw != pack['fill']
+    assert np.allclose(part[good], raw[good]*pack['scale'] + pack['offset'])
+
+
+def test_projDefEnds(tmp_path):
+    fname = str(tmp_path / "cmi.nc")
+    cmiFile(fname)
+
+    # Extents from just the ends of x/y are the same as from all of them
+    with netCDF4.Dataset(fname) as nc:
+        old_grid, imgdata = plot.G16_ABI_L2_ProjDef(nc, readData=False)
+        x = nc['x'][:]*35786023.
+        y = nc['y'][:]*35786023.
+
+    assert imgdata is None
+    assert old_grid.shape == (20, 30)
+    halfx = (x.max() - x.min())/x.size/2.
+    halfy = (y.max() - y.min())/y.size/2.
+    assert np.allclose(old_grid.area_extent,
+                       (x.min() - halfx, y.min() - halfy,
+                        x.max() + halfx, y.max() + halfy))
+
+
+def test_rawCountsColors(tmp_path):
+    fname = str(tmp_path / "cmi.nc")
+    cmiFile(fname)
+    cmap = plt.get_cmap('Greys_r').with_extremes(bad='red')
+
+    with netCDF4.Dataset(fname) as nc:
+        vals = plot.readCMI(nc)
+        raw = plot.readCMI(nc, raw=True)
+        plut = plot.getCountsLUT(cmap, plot.cmiPacking(nc))
+
+    lut = com.raster.colormapLUT(cmap)
+    expected = com.raster.applyColormap(vals, lut, 160., 330.)
+    assert (np.take(plut, raw, axis=0) == expected).all()
+
+
+def cmiTarget(old_grid, npix=100):
+    """
+    Lambert conformal grid (about 1 km) around the middle of old_grid,
+    a little bigger than it so some of it is off the edge.
+    """
+    lons, lats = old_grid.get_lonlats()
+    clat = float(lats.mean())
+    clon = float(lons.mean())
+    half = npix/2*1000.
+    return pr.geometry.AreaDefinition('lcc', 'target', 'lcc',
+                                      {'proj': 'lcc', 'lat_0': clat,
+                                       'lat_1': clat, 'lat_2': clat,
+                                       'lon_0': clon, 'units': 'm'},
+                                      npix, npix, (-half, -half, half, half))
+
+
+def test_tileAreas():
+    area = pr.geometry.AreaDefinition('lcc', 'target', 'lcc',
+                                      {'proj': 'lcc', 'lat_0': 34.7,
+                                       'lat_1': 34.7, 'lat_2': 34.7,
+                                       'lon_0': -111.4, 'units': 'm'},
+                                      50, 40, (-25e3, -20e3, 25e3, 20e3))
+
+    covered = np.zeros(area.shape, dtype=int)
+    for (r0, r1, c0, c1), tdef in plot.tileAreas(area, 16):
+        covered[r0:r1, c0:c1] += 1
+        assert tdef.shape == (r1 - r0, c1 - c0)
+        assert np.allclose(tdef.area_extent,
+                           area[r0:r1, c0:c1].area_extent)
+
+    # Every pixel in exactly one tile
+    assert (covered == 1).all()
+
+
+@pytest.mark.parametrize("rawcounts", [False, True])
+def test_tiledSameAsWhole(tmp_path, rawcounts):
+    fname = str(tmp_path / "cmi.nc")
+    cmiFile(fname)
+
+    with netCDF4.Dataset(fname) as nc:
+        old_grid, _ = plot.G16_ABI_L2_ProjDef(nc, readData=False)
+        area_def = cmiTarget(old_grid)
+        fillval = plot.cmiPacking(nc)['fill'] if rawcounts else None
+
+        # All in one go, from the whole image
+        coeffs = geos.get_neighbour_info(old_grid, area_def, 5000.)
+        whole = pr.kd_tree.get_sample_from_neighbour_info(
+            'nn', area_def.shape, plot.readCMI(nc, raw=rawcounts),
+            coeffs[0], coeffs[1], coeffs[2], fill_value=fillval)
+
+        tiled, tCoeffs = plot.resampleTiled(nc, old_grid, area_def,
+                                            tilesize=16, nthreads=3,
+                                            rawcounts=rawcounts,
+                                            fillval=fillval)
+
+        # Reusing the coefficients gives the same thing again
+        again, _ = plot.resampleTiled(nc, old_grid, area_def,
+                                      tCoeffs=tCoeffs, tilesize=16,
+                                      rawcounts=rawcounts, fillval=fillval)
+
+    assert len(tCoeffs) == 49
+    if rawcounts is True:
+        missing = whole == fillval
+    else:
+        missing = np.ma.getmaskarray(whole)
+    assert missing.any() and not missing.all()
+    assert (np.ma.getmaskarray(whole) == np.ma.getmaskarray(tiled)).all()
+    assert (np.ma.filled(whole, 0) == np.ma.filled(tiled, 0)).all()
+    assert (np.ma.filled(again, 0) == np.ma.filled(tiled, 0)).all()
+
+
+def test_targetArea(tmp_path, monkeypatch):
+    monkeypatch.setattr(plot, "_targetAreas", {})
+    monkeypatch.setattr(plot, "_targetCRSs", {})
+    cachedir = str(tmp_path)
+
+    area = plot.getTargetArea(34.7, -111.4, radius=50., cachedir=cachedir)
+    assert plot.getTargetArea(34.7, -111.4, radius=50.) is area
+
+    # A restart (or a pool worker) gets the exact same grid from the cache
+    plot._targetAreas.clear()
+    loaded = plot.getTargetArea(34.7, -111.4, radius=50., cachedir=cachedir)
+    assert loaded is not area
+    assert loaded.shape == area.shape
+    assert np.allclose(loaded.area_extent, area.area_extent)
+    assert loaded.crs == area.crs
+
+    other = plot.getTargetArea(34.7, -111., radius=50., cachedir=cachedir)
+    assert other.crs != area.crs
+
+    crs = plot.getTargetCRS(loaded)
+    assert plot.getTargetCRS(area) is crs
+    assert plot.getTargetCRS(other) is not crs
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Tests for nightshift.radar.level2
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import gzip
+
+from nightshift.radar import level2
+
+
+def test_recordElevations(archive):
+    assert level2.recordElevations(archive.metadataRecord()) == 0
+    assert level2.recordElevations(archive.radialRecord(1)) == 1
+    assert level2.recordElevations(archive.radialRecord(3)) == 3
+
+
+def test_trimVolume(archive):
+    data = archive.volume([1, 1, 2, 2, 3])
+
+    # Up to and including the first record of elevation 2
+    expected = archive.volumeHeader() + \
+        archive.ldmRecord(archive.metadataRecord()) + \
+        archive.ldmRecord(archive.radialRecord(1)) + \
+        archive.ldmRecord(archive.radialRecord(1)) + \
+        archive.ldmRecord(archive.radialRecord(2))
+    assert level2.trimVolume(data) == expected
+
+    # Nothing past the last cut, so it's all kept
+    assert level2.trimVolume(data, maxElevation=3) == data
+
+
+def test_trimGzipped(archive):
+    data = archive.volume([1, 2, 3])
+    assert level2.trimVolume(gzip.compress(data)) == \
+        level2.trimVolume(data)
+
+
+def test_trimNotArchive():
+    assert level2.trimVolume(b"CDF\x01 not a radar volume") == \
+        b"CDF\x01 not a radar volume"
+
+
+def test_trimBadRecords(archive):
+    good = archive.volume([1, 1, 2])
+
+    # Truncated partway through a record; everything whole is kept
+    cut = len(good) - 10
+    trimmed = level2.trimVolume(good[:cut])
+    assert good.startswith(trimmed)
+    assert len(trimmed) < cut
+
+    # Garbage instead of bzip2; left for Py-ART to complain about
+    bad = archive.volumeHeader() + b'\0\0\0\x10' + b'x'*16
+    assert level2.trimVolume(bad) == bad
+
+
+def test_chunkElevations(archive):
+    start = archive.volumeHeader() + \
+        archive.ldmRecord(archive.metadataRecord())
+    assert level2.chunkElevations(start) == 0
+
+    chunk = archive.ldmRecord(archive.radialRecord(1)) + \
+        archive.ldmRecord(archive.radialRecord(2))
+    assert level2.chunkElevations(chunk) == 2
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Tests for nightshift.common.listings, against an in-memory bucket
+"""
+
+from __future__ import division, print_function, absolute_import
+
+from types import SimpleNamespace
+
+import pytest
+
+from nightshift.common import listings
+
+
+class listedBucket():
+    """
+    Just enough of a boto3 Bucket for listPrefix; 'keys' can be added to
+    between listings, and every list_objects_v2 query is kept in 'queries'.
+    """
+    def __init__(self, keys):
+        self.name = "noaa-goes16"
+        self.keys = list(keys)
+        self.queries = []
+        self.meta = SimpleNamespace(client=self)
+
+    def get_paginator(self, operation):
+        return self
+
+    def paginate(self, Bucket=None, Prefix="", StartAfter=""):
+        self.queries.append({'Prefix': Prefix, 'StartAfter': StartAfter})
+        keys = sorted([k for k in self.keys
+                       if k.startswith(Prefix) and k > StartAfter])
+        yield {'Contents': [{'Key': k, 'Size': 1} for k in keys]}
+
+    def Object(self, key):
+        return SimpleNamespace(key=key)
+
+
+def goesKey(band, start):
+    times = (start, start, start)
+    return "ABI-L2-CMIPC/2026/291/18/OR_ABI-L2-CMIPC-M6C%02d_G16_" % \
+        (band) + "s2026291%s0_e2026291%s0_c2026291%s0.nc" % times
+
+
+@pytest.fixture
+def ldb(tmp_path):
+    db = listings.openListingIndex(str(tmp_path / "listings.sqlite"))
+    yield db
+    db.close()
+
+
+def test_lateLowerKey(ldb):
+    prefix = "ABI-L2-CMIPC/2026/291/18/"
+    buck = listedBucket([goesKey(13, "1801"), goesKey(16, "1801"),
+                         goesKey(16, "1806")])
+
+    first = listings.listPrefix(buck, ldb, prefix)
+    assert len(first) == 3
+
+    # Newer, but sorts before the last (C16) key seen
+    buck.keys.append(goesKey(13, "1806"))
+    final = listings.listPrefix(buck, ldb, prefix, complete=True)
+    assert goesKey(13, "1806") in [o.key for o in final]
+    assert len(final) == 4
+
+    # Complete now, so it's never asked for again
+    nqueries = len(buck.queries)
+    buck.keys.append(goesKey(13, "1811"))
+    assert len(listings.listPrefix(buck, ldb, prefix)) == 4
+    assert len(buck.queries) == nqueries
+
+
+def test_keysByTime(ldb):
+    prefix = "2026/10/18/KFSX/"
+    buck = listedBucket([prefix + "KFSX20261018_180000_V06",
+                         prefix + "KFSX20261018_180600_V06"])
+
+    assert len(listings.listPrefix(buck, ldb, prefix, keysByTime=True)) == 2
+    assert buck.queries[-1]['StartAfter'] == ""
+
+    buck.keys.append(prefix + "KFSX20261018_181200_V06")
+    keys = [o.key for o in listings.listPrefix(buck, ldb, prefix,
+                                               keysByTime=True)]
+    assert buck.queries[-1]['StartAfter'] == \
+        prefix + "KFSX20261018_180600_V06"
+    assert keys == sorted(buck.keys)
+
+
+def test_pruneListings(ldb):
+    buck = listedBucket(["a/1", "b/1"])
+    listings.listPrefix(buck, ldb, "a/")
+    listings.listPrefix(buck, ldb, "b/")
+
+    listings.pruneListings(ldb, ["b/"])
+    assert ldb.execute("SELECT prefix FROM prefixes").fetchall() == \
+        [("b/",)]
+    assert ldb.execute("SELECT key FROM objects").fetchall() == [("b/1",)]
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Tests for nightshift.common.manifest
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import os
+import sqlite3
+from datetime import datetime as dt
+from datetime import timedelta as td
+
+import pytest
+
+from nightshift.common import manifest
+
+
+@pytest.fixture
+def mdb(tmp_path):
+    db = manifest.openManifest(str(tmp_path / "manifest.sqlite"))
+    yield db
+    db.close()
+
+
+def state(db, name):
+    row = db.execute("SELECT state, rawpath FROM frames WHERE name = ?",
+                     (name,)).fetchone()
+    return row
+
+
+def rawFile(tmp_path, name):
+    rawpath = str(tmp_path / name)
+    with open(rawpath, 'wb') as f:
+        f.write(b"not really a volume")
+
+    return rawpath
+
+
+def test_downloadedToRendered(tmp_path, mdb):
+    obstime = dt(2026, 10, 18, 18, 0, 0)
+    rawpath = rawFile(tmp_path, "KFSX20261018_180000")
+    manifest.addDownloaded(mdb, "KFSX20261018_180000", "KFSX", obstime,
+                           rawpath)
+
+    rows = manifest.toRender(mdb, "KFSX")
+    assert rows == [("KFSX20261018_180000", rawpath,
+                     manifest.timestamp(obstime))]
+    assert "KFSX20261018_180000" in manifest.knownNames(mdb, ["KFSX"])
+
+    manifest.markRendered(mdb, "KFSX20261018_180000", "out.png")
+    assert manifest.toRender(mdb, "KFSX") == []
+    assert len(manifest.toRender(mdb, "KFSX", force=True)) == 1
+    assert manifest.newestRendered(mdb, "KFSX") == \
+        manifest.timestamp(obstime)
+
+
+def test_toRenderNeedsRaws(tmp_path, mdb):
+    obstime = dt(2026, 10, 18, 18, 0, 0)
+    rawpath = rawFile(tmp_path, "KFSX20261018_180000")
+    manifest.addDownloaded(mdb, "KFSX20261018_180000", "KFSX", obstime,
+                           rawpath)
+    manifest.markRendered(mdb, "KFSX20261018_180000", "a.png")
+
+    # Streamed straight from memory, so there's nothing to redo it from
+    manifest.addDownloaded(mdb, "KFSX20261018_180600", "KFSX",
+                           obstime + td(minutes=6), None)
+    manifest.markRendered(mdb, "KFSX20261018_180600", "b.png")
+    manifest.addDownloaded(mdb, "KFSX20261018_181200", "KFSX",
+                           obstime + td(minutes=12), None)
+
+    assert manifest.toRender(mdb, "KFSX") == []
+    assert [r[0] for r in manifest.toRender(mdb, "KFSX", force=True)] == \
+        ["KFSX20261018_180000"]
+
+
+def test_retryThenBad(tmp_path, mdb):
+    name = "KFSX20261018_180000"
+    obstime = dt(2026, 10, 18, 18, 0, 0)
+    qdir = str(tmp_path / "quarantine")
+
+    rawpath = rawFile(tmp_path, name)
+    manifest.addDownloaded(mdb, name, "KFSX", obstime, rawpath)
+
+    # First failure deletes it and lets the grabber get it again
+    assert manifest.markFailed(mdb, name, "Unreadable volume",
+                               quarantine=qdir) == 'retry'
+    assert state(mdb, name) == ('retry', None)
+    assert not os.path.exists(rawpath)
+    assert name not in manifest.knownNames(mdb, ["KFSX"])
+
+    rawpath = rawFile(tmp_path, name)
+    manifest.addDownloaded(mdb, name, "KFSX", obstime, rawpath)
+    assert state(mdb, name) == ('downloaded', rawpath)
+
+    # Second one is it; it's quarantined and skipped from then on
+    assert manifest.markFailed(mdb, name, "Unreadable volume",
+                               quarantine=qdir) == 'bad'
+    qpath = os.path.join(qdir, name)
+    assert state(mdb, name) == ('bad', qpath)
+    assert os.path.isfile(qpath)
+    assert not os.path.exists(rawpath)
+    assert name in manifest.knownNames(mdb, ["KFSX"])
+    assert manifest.toRender(mdb, "KFSX", force=True) == []
+
+
+def test_expireAndCurrent(tmp_path, mdb):
+    now = dt(2026, 10, 18, 18, 0, 0)
+
+    pngs = []
+    for i in range(6):
+        obstime = now - td(hours=i)
+        name = "KFSX%s" % (obstime.strftime("%Y%m%d_%H%M%S"))
+        rawpath = rawFile(tmp_path, name)
+        pngpath = rawFile(tmp_path, name + ".png")
+        manifest.addDownloaded(mdb, name, "KFSX", obstime, rawpath)
+        manifest.markRendered(mdb, name, pngpath)
+        pngs.append(pngpath)
+
+    # Newest 3, oldest first, with their ages
+    cur = manifest.currentFrames(mdb, "KFSX", now, limit=3)
+    assert list(cur.keys()) == [pngs[2], pngs[1], pngs[0]]
+    assert list(cur.values()) == [7200., 3600., 0.]
+
+    # Anything more than 3.5 hours old goes, files and all
+    assert manifest.expireOld(mdb, "KFSX", now, 3.5) == 2
+    assert not os.path.exists(pngs[4])
+    assert not os.path.exists(pngs[5])
+    assert os.path.exists(pngs[3])
+    assert len(manifest.currentFrames(mdb, "KFSX", now)) == 4
+
+    # Expired ones still count as known until they're forgotten
+    known = manifest.knownNames(mdb, ["KFSX"])
+    assert len(known) == 6
+    manifest.forgetOld(mdb, "KFSX", now, 3.5)
+    assert len(manifest.knownNames(mdb, ["KFSX"])) == 4
+
+
+def test_arrivedMigration(tmp_path):
+    # A manifest from before arrival times were kept
+    dbfile = str(tmp_path / "old.sqlite")
+    db = sqlite3.connect(dbfile)
+    db.execute("CREATE TABLE frames (name TEXT PRIMARY KEY, "
+               "product TEXT NOT NULL, obstime REAL NOT NULL, "
+               "rawpath TEXT, pngpath TEXT, state TEXT NOT NULL, "
+               "reason TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+               "updated REAL)")
+    db.commit()
+    db.close()
+
+    db = manifest.openManifest(dbfile)
+    manifest.addDownloaded(db, "a", "KFSX", dt(2026, 10, 18), None,
+                           arrived=10.)
+    assert manifest.arrivals(db, "KFSX") == \
+        [(manifest.timestamp(dt(2026, 10, 18)), 10.)]
+    db.close()
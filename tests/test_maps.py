@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Tests for the geometry and basemap caches in nightshift.common.maps
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import os
+
+import numpy as np
+import matplotlib.pyplot as plt
+import cartopy.crs as ccrs
+from shapely.geometry import LineString, Point
+
+from nightshift.common import maps
+
+
+def someGeoms():
+    return [Point(-111.4, 34.7),
+            LineString([(-112., 35.), (-111., 35.2), (-110.5, 34.9)])]
+
+
+def test_roundTrip(tmp_path):
+    geoms = someGeoms()
+    maps.saveGeoms(str(tmp_path), "roads", geoms, [0, 1])
+
+    loaded, labels = maps.loadGeoms(str(tmp_path), "roads")
+    assert [g.equals(h) for g, h in zip(loaded, geoms)] == [True, True]
+    assert list(labels) == [0, 1]
+
+
+def test_missing(tmp_path):
+    assert maps.loadGeoms(str(tmp_path), "roads") is None
+    assert maps.loadGeoms(None, "roads") is None
+
+
+def test_corrupt(tmp_path):
+    maps.saveGeoms(str(tmp_path), "roads", someGeoms(), [0, 1])
+
+    # Same size, but not WKB anymore
+    wkbfile = os.path.join(str(tmp_path), "roads", "wkb.npy")
+    packed = np.load(wkbfile)
+    np.save(wkbfile, np.full(packed.shape, 0xAB, dtype=np.uint8))
+
+    assert maps.loadGeoms(str(tmp_path), "roads") is None
+
+
+def test_cachedRoads(tmp_path, monkeypatch):
+    shpfile = tmp_path / "roads.shp"
+    shpfile.touch()
+    monkeypatch.setattr(maps.cshape, "natural_earth",
+                        lambda **kwargs: str(shpfile))
+
+    rclasses = ["Interstate", "Federal", "State"]
+    ckey = maps.geomCacheKey(str(shpfile), None, 7., classes=rclasses)
+    maps.saveGeoms(str(tmp_path), ckey, someGeoms(), [0, 2])
+
+    # Nothing Federal was kept, but it still needs to be there
+    roads = maps.parseRoads(rclasses, cachedir=str(tmp_path))
+    assert sorted(roads) == sorted(rclasses)
+    assert roads["Federal"] == []
+    assert len(roads["Interstate"]) == len(roads["State"]) == 1
+
+
+def test_basemapLayer(tmp_path, monkeypatch):
+    plt.switch_backend("Agg")
+    monkeypatch.setattr(maps, "_basemaps", {})
+
+    # Stand-ins for the real (Natural Earth) map features; a line straight
+    #   across the middle, and a count of how many times it was drawn
+    drawn = []
+
+    def fakeFeatures(ax, counties=None, roads=None):
+        drawn.append(1)
+        ax.plot([0., 1.], [0.5, 0.5], color='k', linewidth=2.,
+                transform=ax.transAxes)
+        return ax
+    monkeypatch.setattr(maps, "add_map_features", fakeFeatures)
+    monkeypatch.setattr(maps, "add_AZObs", lambda ax: ax)
+
+    crs = ccrs.LambertConformal(central_longitude=-111.4,
+                                central_latitude=34.7)
+    extent = (-113., -110., 33., 36.5)
+    args = (crs, extent)
+    kwargs = {'extentcrs': ccrs.PlateCarree(), 'figsize': (2., 2.),
+              'dpi': 50, 'cachedir': str(tmp_path)}
+
+    layer = maps.getBasemapLayer(*args, **kwargs)
+    assert len(drawn) == 1
+    assert layer['size'] == (100, 100)
+    image = np.asarray(layer['image'])
+    assert image.shape[2] == 4
+
+    # Only the line is there, everything else is see-through
+    alpha = image[:, :, 3]
+    assert (alpha[image.shape[0]//2, :] > 0).all()
+    assert (alpha[0:10, :] == 0).all()
+
+    # Same map again is just handed back, from memory and then from disk
+    assert maps.getBasemapLayer(*args, **kwargs) is layer
+    maps._basemaps.clear()
+    loaded = maps.getBasemapLayer(*args, **kwargs)
+    assert len(drawn) == 1
+    assert (np.asarray(loaded['image']) == image).all()
+    assert loaded['bbox'] == layer['bbox']
+    assert np.allclose(loaded['extent'], layer['extent'])
+
+    # Anything else about the map is a different layer
+    maps.getBasemapLayer(crs, (-113., -110., 33., 36.), **kwargs)
+    assert len(drawn) == 2
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Tests for nightshift.radar.mosaic
+"""
+
+from __future__ import division, print_function, absolute_import
+
+from datetime import datetime as dt
+
+import numpy as np
+import pytest
+
+from nightshift.common import manifest
+from nightshift.radar import mosaic
+
+
+def test_matchVolumes():
+    volumes = {'KFSX': [('a1', 'p', 100.), ('a2', 'p', 400.)],
+               'KIWA': [('b1', 'q', 90.), ('b2', 'q', 1000.)],
+               'KEMX': []}
+
+    frames = mosaic.matchVolumes(volumes, 'KFSX', tolerance=200.)
+    assert frames == [(400., {'KFSX': ('a2', 'p')}),
+                      (100., {'KFSX': ('a1', 'p'), 'KIWA': ('b1', 'q')})]
+
+
+def test_composite():
+    g1 = np.ma.masked_array([1., 5., 0., 2.], mask=[0, 0, 1, 0])
+    g2 = np.ma.masked_array([3., 2., 0., 9.], mask=[0, 1, 1, 0])
+    r1 = np.array([10., 10., np.inf, 5.])
+    r2 = np.array([5., np.inf, np.inf, 10.])
+
+    most = mosaic.composite([g1, g2], [r1, r2])
+    assert most.tolist() == [3., 5., None, 9.]
+
+    nearest = mosaic.composite([g1, g2], [r1, r2], method='nearest')
+    assert nearest.tolist() == [3., 5., None, 2.]
+
+
+@pytest.fixture
+def mdb(tmp_path):
+    db = manifest.openManifest(str(tmp_path / "manifest.sqlite"))
+    yield db
+    db.close()
+
+
+def addVolume(tmp_path, db, station, obstime):
+    name = "%s%s" % (station, obstime.strftime("%Y%m%d_%H%M%S"))
+    rawpath = str(tmp_path / name)
+    with open(rawpath, 'wb') as f:
+        f.write(b"volume")
+    manifest.addDownloaded(db, name, station, obstime, rawpath)
+
+    return name
+
+
+def test_retriedStationHoldsFrame(tmp_path, mdb, monkeypatch):
+    obstime = dt(2026, 10, 18, 18, 0, 0)
+    addVolume(tmp_path, mdb, "KFSX", obstime)
+    bad = addVolume(tmp_path, mdb, "KIWA", dt(2026, 10, 18, 18, 1, 0))
+
+    broken = {bad}
+
+    def decodeVolume(rawpath, qcfilters=None):
+        if rawpath.endswith(tuple(broken)):
+            return None, "Unreadable volume"
+        return {'rawpath': rawpath}, None
+
+    made = []
+
+    def rasterMosaic(vols, obstime, outpname, *args, **kwargs):
+        made.append(sorted(vols.keys()))
+
+    monkeypatch.setattr(mosaic.plot, "decodeVolume", decodeVolume)
+    monkeypatch.setattr(mosaic, "rasterMosaic", rasterMosaic)
+
+    # Long past the wait, but KIWA is going to be downloaded again
+    now = manifest.timestamp(obstime) + 3600.
+    args = (mdb, ["KFSX", "KIWA"], str(tmp_path), [-111.4, 34.7])
+    assert mosaic.makeMosaics(*args, cmap=(None, None), now=now) == 0
+    assert made == []
+    assert "MOSAIC20261018_180000" not in \
+        manifest.knownNames(mdb, ["MOSAIC"])
+
+    # Back again, and fine this time
+    broken.clear()
+    addVolume(tmp_path, mdb, "KIWA", dt(2026, 10, 18, 18, 1, 0))
+    assert mosaic.makeMosaics(*args, cmap=(None, None), now=now) == 1
+    assert made == [["KFSX", "KIWA"]]
+    assert "MOSAIC20261018_180000" in manifest.knownNames(mdb, ["MOSAIC"])
+
+
+def test_badStationIsSettled(tmp_path, mdb, monkeypatch):
+    obstime = dt(2026, 10, 18, 18, 0, 0)
+    addVolume(tmp_path, mdb, "KFSX", obstime)
+    bad = addVolume(tmp_path, mdb, "KIWA", dt(2026, 10, 18, 18, 1, 0))
+
+    def decodeVolume(rawpath, qcfilters=None):
+        if rawpath.endswith(bad):
+            return None, "Unreadable volume"
+        return {'rawpath': rawpath}, None
+
+    made = []
+
+    def rasterMosaic(vols, obstime, outpname, *args, **kwargs):
+        made.append(sorted(vols.keys()))
+
+    monkeypatch.setattr(mosaic.plot, "decodeVolume", decodeVolume)
+    monkeypatch.setattr(mosaic, "rasterMosaic", rasterMosaic)
+
+    now = manifest.timestamp(obstime) + 60.
+    args = (mdb, ["KFSX", "KIWA"], str(tmp_path), [-111.4, 34.7])
+
+    # First failure, then it comes back just as broken
+    assert mosaic.makeMosaics(*args, cmap=(None, None), now=now) == 0
+    addVolume(tmp_path, mdb, "KIWA", dt(2026, 10, 18, 18, 1, 0))
+    assert mosaic.makeMosaics(*args, cmap=(None, None), now=now) == 1
+    assert made == [["KFSX"]]
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Tests for nightshift.common.pipeline
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import threading
+
+import pytest
+
+from nightshift.common import pipeline
+
+
+def double(item):
+    return item*2
+
+
+def pickyDecode(item):
+    if item == 6:
+        raise KeyError("no such field")
+    return item + 1
+
+
+def test_inOrder():
+    results = list(pipeline.runPipeline(range(10), [(double, 1),
+                                                    (pickyDecode, 1)]))
+    assert results[:3] == [1, 3, 5]
+    assert len(results) == 10
+
+
+def test_failuresComeThrough():
+    results = list(pipeline.runPipeline(range(10), [(double, 3),
+                                                    (pickyDecode, 1)],
+                                        qsize=2))
+
+    failed = [r for r in results if isinstance(r, pipeline.failedItem)]
+    assert len(failed) == 1
+    assert failed[0].item == 6
+    assert "pickyDecode" in failed[0].reason
+    assert "no such field" in failed[0].reason
+
+    good = sorted([r for r in results if not isinstance(r,
+                                                        pipeline.failedItem)])
+    assert good == [1, 3, 5, 9, 11, 13, 15, 17, 19]
+
+
+def test_failuresSkipLaterStages():
+    seen = []
+
+    def fragile(item):
+        if item == 3:
+            raise OSError("truncated")
+        return item
+
+    def record(item):
+        seen.append(item)
+        return item
+
+    results = list(pipeline.runPipeline(range(5), [(fragile, 1),
+                                                   (record, 1)]))
+    assert 3 not in seen
+    assert [r.item for r in results
+            if isinstance(r, pipeline.failedItem)] == [3]
+
+
+def test_droppedItems():
+    results = list(pipeline.runPipeline(range(6),
+                                        [(lambda i: i if i % 2 else None,
+                                          2)]))
+    assert sorted(results) == [1, 3, 5]
+
+
+@pytest.mark.parametrize("how", ["break", "raise"])
+def test_stopsEarly(how):
+    before = threading.active_count()
+
+    gen = pipeline.runPipeline(range(1000), [(double, 4), (double, 2)],
+                               qsize=2)
+    if how == "break":
+        for result in gen:
+            break
+        gen.close()
+    else:
+        with pytest.raises(RuntimeError):
+            for result in gen:
+                raise RuntimeError("consumer fell over")
+        gen.close()
+
+    # Everything's joined by the time close() comes back
+    assert threading.active_count() == before
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Tests for nightshift.radar.polar, against Py-ART's beam model
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import numpy as np
+import cartopy.crs as ccrs
+from pyart.core import antenna_to_cartesian
+
+from nightshift.radar import polar
+
+
+# KFSX, more or less
+SITE = ('KFSX', 34.574, -111.198)
+
+
+def siteCRS():
+    """
+    Azimuthal equidistant on the same sphere as polar.azimuthDistance,
+    so x, y give the azimuth and ground distance straight from the site.
+    """
+    globe = ccrs.Globe(ellipse=None, semimajor_axis=polar.EARTH_RADIUS,
+                       semiminor_axis=polar.EARTH_RADIUS)
+    return ccrs.AzimuthalEquidistant(central_longitude=SITE[2],
+                                     central_latitude=SITE[1], globe=globe)
+
+
+def test_groundToSlant():
+    srange = np.linspace(2125., 460000., 200)
+    for elevation in [0.5, 1.5, 19.5]:
+        # Py-ART wants the ranges in km, but gives back meters
+        x, y, z = antenna_to_cartesian(srange/1000., 0., elevation)
+        dist = np.hypot(x, y)
+        assert np.allclose(polar.groundToSlant(dist, elevation), srange,
+                           rtol=0., atol=0.01)
+
+    # Steep enough beams never come back down to the ground far away
+    assert np.isinf(polar.groundToSlant(2e7, 60.))
+
+
+def test_polarLookup(tmp_path, monkeypatch):
+    monkeypatch.setattr(polar, "_lookups", {})
+    crs = siteCRS()
+    extent = (-150e3, 150e3, -100e3, 100e3)
+    shape = (80, 120)
+    gates = (2125., 250., 460)
+    args = (crs, extent, shape) + SITE + (0.5,) + gates
+
+    lookup = polar.polarLookup(*args, azres=0.5, cachedir=str(tmp_path))
+
+    # What it should be, straight from the projection coordinates
+    xs = np.linspace(-150e3, 150e3, 121)[:-1] + 1250.
+    ys = np.linspace(100e3, -100e3, 81)[:-1] - 1250.
+    xx, yy = np.meshgrid(xs, ys)
+    azimuth = np.mod(np.rad2deg(np.arctan2(xx, yy)), 360.)
+    gate = np.round((polar.groundToSlant(np.hypot(xx, yy), 0.5) -
+                     gates[0])/gates[1])
+    gate[(gate < 0) | (gate >= gates[2])] = -1
+
+    # Right on the edge of a bin (the diagonals) could round either way
+    edge = np.isclose(azimuth/0.5, np.round(azimuth/0.5))
+    azbin = np.floor(azimuth/0.5).astype(int)
+    assert (lookup['azbin'] == azbin)[~edge].all()
+    assert (lookup['gate'] == gate).all()
+    assert (lookup['gate'] == -1).any()
+
+    # Kept around, and on disk for a restart
+    assert polar.polarLookup(*args, azres=0.5) is lookup
+    polar._lookups.clear()
+    loaded = polar.polarLookup(*args, azres=0.5, cachedir=str(tmp_path))
+    assert loaded is not lookup
+    assert (loaded['azbin'] == lookup['azbin']).all()
+    assert (loaded['gate'] == lookup['gate']).all()
+
+
+def test_raysForBins():
+    # A little off of the bin centers, and out of order across north
+    azimuths = np.mod(np.arange(360) + 0.3 + 180., 360.)
+    rays = polar.raysForBins(azimuths, 1.0)
+    assert (np.round(azimuths[rays] - 0.3) == np.arange(360)).all()
+
+    # A sector scan leaves the rest of the bins empty
+    rays = polar.raysForBins(np.arange(90.5, 180.), 1.0)
+    assert (rays[90:180] == np.arange(90)).all()
+    assert (rays[0:89] == -1).all() and (rays[181:] == -1).all()
+
+
+def test_gatherSweep():
+    azimuths = np.arange(360) + 0.5
+    values = np.arange(360*10).reshape(360, 10)
+    field = np.ma.masked_array(values, mask=(values % 7 == 0))
+
+    lookup = {'azbin': np.array([[0, 45], [359, 200]]),
+              'gate': np.array([[3, -1], [9, 2]])}
+    image = polar.gatherSweep(field, azimuths, lookup, 1.0)
+
+    assert image.mask[0, 1]
+    assert image[0, 0] == 3
+    assert image[1, 0] == 3599
+    assert image.mask[1, 1]
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Tests for nightshift.radar.qc
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import os
+import configparser
+
+import numpy as np
+import pytest
+
+from nightshift.radar import qc
+
+
+class sweepRadar():
+    """
+    Only what applyFilters uses of a Py-ART radar; one sweep of fields.
+    """
+    def __init__(self, fields, ranges):
+        self.fields = fields
+        self.range = {'data': ranges}
+
+    def get_field(self, sweep, name):
+        return self.fields[name]
+
+
+@pytest.fixture
+def radar():
+    rng = np.random.default_rng(42)
+    shape = (72, 100)
+
+    refl = np.ma.masked_array(rng.uniform(-40., 60., shape),
+                              mask=rng.uniform(size=shape) < 0.05)
+    zdr = np.ma.masked_array(rng.uniform(-4., 4., shape),
+                             mask=rng.uniform(size=shape) < 0.02)
+    rhohv = np.ma.masked_array(rng.uniform(0.7, 1.0, shape),
+                               mask=rng.uniform(size=shape) < 0.02)
+
+    return sweepRadar({'reflectivity': refl,
+                       'differential_reflectivity': zdr,
+                       'cross_correlation_ratio': rhohv},
+                      np.arange(shape[1])*250. + 2125.)
+
+
+def oldQC(radar, vcpmode):
+    """
+    The original hardcoded filtering, straight from the old literallyDeBug
+    """
+    refl_grid = radar.get_field(0, 'reflectivity')
+    rhohv_grid = radar.get_field(0, 'cross_correlation_ratio')
+    zdr_grid = radar.get_field(0, 'differential_reflectivity')
+
+    if vcpmode in [31, 32, 35]:
+        refCutVal = -35
+    else:
+        refCutVal = -15
+    refLow = np.less(refl_grid, refCutVal)
+    zdrCut = np.greater(np.abs(zdr_grid), 2.3)
+    rhohvLow = np.less(rhohv_grid, 0.925)
+    notweather = np.logical_or(refLow, np.logical_or(zdrCut, rhohvLow))
+
+    return np.ma.masked_where(notweather, refl_grid)
+
+
+@pytest.mark.parametrize("vcpmode", [212, 35])
+def test_sameAsOld(radar, vcpmode):
+    old = oldQC(radar, vcpmode)
+    new, counts = qc.applyFilters(radar, qc.defaultFilters, vcpmode)
+
+    assert np.array_equal(np.ma.getmaskarray(new), np.ma.getmaskarray(old))
+    assert np.array_equal(new.compressed(), old.compressed())
+
+    # Only the new ones count against each filter
+    nmasked = np.count_nonzero(np.ma.getmaskarray(new))
+    nstart = np.count_nonzero(np.ma.getmaskarray(
+        radar.get_field(0, 'reflectivity')))
+    assert sum(counts.values()) == nmasked - nstart
+    if vcpmode == 35:
+        assert 'refLowClearAir' in counts and 'refLow' not in counts
+    else:
+        assert 'refLow' in counts and 'refLowClearAir' not in counts
+
+
+def test_parseFilters():
+    conf = configparser.ConfigParser()
+    conf.read_string("[refLow]\n"
+                     "type = threshold\n"
+                     "field = reflectivity\n"
+                     "below = -15\n"
+                     "skipvcps = 31, 32, 35\n"
+                     "[rangeGate]\n"
+                     "type = range\n"
+                     "max = 300000\n"
+                     "enabled = False\n"
+                     "[speckle]\n"
+                     "type = speckle\n"
+                     "minneighbours = 3\n"
+                     "[zdrCut]\n"
+                     "type = threshold\n"
+                     "field = differential_reflectivity\n"
+                     "absabove = 2.3\n")
+
+    filters = qc.parseFilters(conf)
+    assert filters == [{'name': 'refLow', 'type': 'threshold',
+                        'field': 'reflectivity', 'below': -15.,
+                        'skipvcps': [31, 32, 35]},
+                       {'name': 'speckle', 'type': 'speckle',
+                        'minneighbours': 3},
+                       {'name': 'zdrCut', 'type': 'threshold',
+                        'field': 'differential_reflectivity',
+                        'absabove': 2.3}]
+    assert qc.neededFields(filters) == ['reflectivity',
+                                        'differential_reflectivity']
+
+
+def test_templateIsDefault():
+    conf = configparser.ConfigParser()
+    conf.read(os.path.join(os.path.dirname(__file__), "..", "config",
+                           "radarqc.conf-TEMPLATE"))
+    assert qc.parseFilters(conf) == qc.defaultFilters
+
+
+def test_rangeAndSpeckle(radar):
+    filters = [{'name': 'near', 'type': 'range', 'min': 3000.},
+               {'name': 'speckle', 'type': 'speckle', 'minneighbours': 8}]
+    new, counts = qc.applyFilters(radar, filters, 212)
+
+    mask = np.ma.getmaskarray(new)
+    assert mask[:, radar.range['data'] < 3000.].all()
+    assert counts['near'] > 0
+
+    # Isolated gate in an otherwise empty sweep
+    refl = np.ma.masked_all((10, 10))
+    refl[5, 5] = 20.
+    lonely = sweepRadar({'reflectivity': refl}, np.arange(10)*250.)
+    new, counts = qc.applyFilters(lonely, filters[1:], 212)
+    assert new.count() == 0
+    assert counts == {'speckle': 1}
+
+
+def test_missingField(radar):
+    filters = [{'name': 'kdp', 'type': 'threshold',
+                'field': 'specific_differential_phase', 'above': 5.}]
+    new, counts = qc.applyFilters(radar, filters, 212)
+    assert counts == {}
+    assert np.array_equal(np.ma.getmaskarray(new), np.ma.getmaskarray(
+        radar.get_field(0, 'reflectivity')))
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Tests for nightshift.radar.plot
+"""
+
+from __future__ import division, print_function, absolute_import
+
+from types import SimpleNamespace
+
+from nightshift.radar import plot
+
+
+def fakeRadar(filename, memory=None, fields=None):
+    """
+    Stands in for readNEXRAD; just the bits decodeVolume looks at first.
+    """
+    return SimpleNamespace(metadata={'instrument_name': 'KFSX',
+                                     'original_container': 'NEXRAD Level II',
+                                     'vcp_pattern': 35},
+                           latitude={'data': [34.574]},
+                           longitude={'data': [-111.198]})
+
+
+def test_badTimestamp(monkeypatch):
+    monkeypatch.setattr(plot, "readNEXRAD", fakeRadar)
+
+    vol, reason = plot.decodeVolume("/tmp/KFSX20261018_18000_V06")
+    assert vol is None
+    assert reason.startswith("Bad timestamp in name")
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Tests for nightshift.common.raster, against what matplotlib does
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.colors import Normalize
+
+from nightshift.common import raster
+
+
+def someCMap():
+    return plt.get_cmap('viridis').with_extremes(under='blue', over='red',
+                                                 bad='gray')
+
+
+def someData(vmin, vmax):
+    """
+    Everything across (and past) the range, plus the edge cases.
+    """
+    vals = np.concatenate([np.linspace(vmin - 10., vmax + 10., 1001),
+                           [vmin, vmax, np.nan, np.inf, -np.inf]])
+    mask = np.zeros(vals.size, dtype=bool)
+    mask[::97] = True
+
+    return np.ma.masked_array(vals, mask=mask)
+
+
+def test_applyColormap():
+    cmap = someCMap()
+    vmin, vmax = 160., 330.
+    data = someData(vmin, vmax)
+
+    expected = cmap(Normalize(vmin=vmin, vmax=vmax)(data), bytes=True)
+    found = raster.applyColormap(data, raster.colormapLUT(cmap), vmin, vmax)
+    assert found.dtype == np.uint8
+
+    # matplotlib only believes the mask for masked arrays, and so colors
+    #   NaN/inf with whatever they happen to turn into; they're bad here
+    finite = np.isfinite(np.ma.getdata(data))
+    assert (found[finite] == expected[finite]).all()
+    assert (found[~finite] == cmap(np.ma.masked, bytes=True)).all()
+
+
+def test_composeFrame():
+    # 20x10 figure, with the axes in the lower 16x8 of it
+    overlay = np.zeros((8, 16, 4), dtype=np.uint8)
+    overlay[:, 5] = (255, 0, 0, 255)
+    layer = {'image': overlay, 'bbox': (2, 2, 18, 10),
+             'extent': (0., 1., 0., 1.), 'size': (20, 10)}
+
+    # Half the size of the axes, so it's doubled up; clear at the right
+    rgba = np.zeros((4, 8, 4), dtype=np.uint8)
+    rgba[:, 0:6] = (0, 255, 0, 255)
+
+    frame = np.asarray(raster.composeFrame(rgba, layer, axcolor='#0000ff'))
+    assert frame.shape == (10, 20, 4)
+
+    # Outside the axes is just the figure
+    assert (frame[0:2] == (0, 0, 0, 255)).all()
+    assert (frame[:, 0:2] == (0, 0, 0, 255)).all()
+
+    axes = frame[2:10, 2:18]
+    assert (axes[:, 0:5] == (0, 255, 0, 255)).all()
+    assert (axes[:, 5] == (255, 0, 0, 255)).all()
+    assert (axes[:, 12:] == (0, 0, 255, 255)).all()
+
+
+def test_packedLUT():
+    cmap = someCMap()
+    vmin, vmax = 160., 330.
+    scale, offset = 0.04, 150.
+
+    plut = raster.packedLUT(raster.colormapLUT(cmap), scale, offset,
+                            vmin, vmax, fill=4095, validRange=(0, 4000))
+    assert plut.shape == (2**16, 4)
+
+    # Same as unpacking the (valid) counts and then coloring them
+    counts = np.arange(4001)
+    norm = Normalize(vmin=vmin, vmax=vmax)
+    expected = cmap(norm(counts*scale + offset), bytes=True)
+    assert (plut[counts] == expected).all()
+
+    bad = cmap(np.ma.masked, bytes=True)
+    assert (plut[4095] == bad).all()
+    assert (plut[4001:] == bad).all()
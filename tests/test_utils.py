@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+#
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+#  Created on 18 Oct 2026
+#
+#  @author: rhamilton
+
+"""Tests for nightshift.common.utils
+"""
+
+from __future__ import division, print_function, absolute_import
+
+from nightshift.common import utils
+
+
+def test_migrateFrames(tmp_path):
+    pout = tmp_path / "pngs"
+    dout = tmp_path / "raws"
+    bpout = pout / "C13"
+    for d in [pout, dout, bpout]:
+        d.mkdir(exist_ok=True)
+
+    # One that still has its raw file, one that doesn't, another band
+    (dout / "20262911800000_C13.nc").write_bytes(b"raw")
+    (pout / "20262911800000_C13.png").write_bytes(b"png")
+    (pout / "20262911700000_C13.png").write_bytes(b"png")
+    (pout / "20262911800000_C02.png").write_bytes(b"png")
+
+    nmoved, nremoved = utils.migrateFrames(str(pout) + "/*_C13.png",
+                                           str(dout), str(bpout))
+
+    assert (nmoved, nremoved) == (1, 1)
+    assert (bpout / "20262911800000_C13.png").is_file()
+    assert not (pout / "20262911800000_C13.png").exists()
+    assert not (pout / "20262911700000_C13.png").exists()
+    assert (pout / "20262911800000_C02.png").is_file()